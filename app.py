@@ -1,54 +1,135 @@
 #!/usr/bin/env python3
 import datetime
 import os
+import time
 
-import yaml
 from aws_cdk import core as cdk
 
+from stacks.cache_stack import CacheStack
 from stacks.ec2_stack import EC2Stack
 from stacks.kms_stack import KMSStack
+from stacks.monitoring_stack import MonitoringStack
 from stacks.rds_stack import RDSStack
 from stacks.s3_bucket_stack import S3BucketStack
+from stacks.schedule_stack import ScheduleStack
 from stacks.vpc_stack import VPCStack
-from utils.keypair import Keypair
-
-with open(os.path.join(os.path.dirname(__file__), 'config.yaml'), 'r', encoding='UTF-8') as file:
-    config = yaml.load(file, Loader=yaml.SafeLoader)
-project = config['project'].lower().replace(' ', '-')
-environment = config['environment']
-vpc_cidr = config['vpc_cidr']
-aws_region = config['aws_region']
-aws_environment = cdk.Environment(account=os.getenv("CDK_DEFAULT_ACCOUNT"), region=aws_region)
-aws_tags_list = []
-for k, v in config['aws_tags'].items():
-    aws_tags_list.append({'Key': k, 'Value': v or ' '})
-
-app = cdk.App()
-vpc_stack = VPCStack(app, '-'.join([project, environment, 'vpc']), cidr=vpc_cidr, env=aws_environment)
-date_now = datetime.datetime.now().strftime("%Y%m%d")
-ec2_stack = EC2Stack(app, '-'.join([project, environment, 'ec2']),
-                     vpc=vpc_stack.vpc,
-                     key_name=Keypair.create_keypair(
-                         keypair_name='-'.join([project, environment, date_now, 'key']), aws_tags=aws_tags_list),
-                     env=aws_environment)
-kms_stack = KMSStack(app, '-'.join([project, environment, 'kms']),
-                     key_name='-'.join([project, environment, 'key']),
-                     account_id=os.getenv("CDK_DEFAULT_ACCOUNT"),
-                     env=aws_environment)
-rds_stack = RDSStack(app, '-'.join([project, environment, 'rds']),
-                     vpc=vpc_stack.vpc,
-                     key=kms_stack.key,
-                     rds_name='-'.join([project, environment, 'rds']),
-                     env=aws_environment)
-s3_bucket_stack = S3BucketStack(app, '-'.join([project, environment, 's3']),
-                                bucket_name='-'.join([project, environment, 's3']),
-                                env=aws_environment)
-
-for key, value in config['aws_tags'].items():
-    cdk.Tags.of(app).add(key, value or " ")
-cdk.Tags.of(vpc_stack).add("application", "VPC")
-cdk.Tags.of(kms_stack).add("application", "KMS")
-cdk.Tags.of(ec2_stack).add("application", "EC2")
-cdk.Tags.of(rds_stack).add("application", "RDS")
-cdk.Tags.of(s3_bucket_stack).add("application", "S3")
-app.synth()
+from utils.config import Config, load_config
+from utils.keypair import KeypairResolver
+
+STACK_NAMES = ['vpc', 'ec2', 'kms', 'rds', 's3', 'cache', 'monitoring', 'schedule']
+# Stacks whose constructs are passed into another stack and so must be built alongside it.
+STACK_REFERENCES = {'vpc': [], 'ec2': ['vpc', 'kms'], 'kms': [], 'rds': ['vpc', 'kms'], 's3': [], 'cache': ['vpc'],
+                    'monitoring': [], 'schedule': ['kms']}
+# Stacks whose exports another stack reads through Fn.import_value; they only order the deployment.
+STACK_IMPORTS = {'vpc': [], 'ec2': ['s3'], 'kms': [], 'rds': ['ec2', 's3'], 's3': [], 'cache': ['ec2'],
+                 'monitoring': ['ec2', 'rds'], 'schedule': ['ec2', 'rds']}
+
+
+def is_offline(app: cdk.App) -> bool:
+    return str(app.node.try_get_context('offline') or os.getenv('CDK_OFFLINE') or '').lower() in ('1', 'true', 'yes')
+
+
+def requested_stacks(app: cdk.App) -> list:
+    value = app.node.try_get_context('stacks') or os.getenv('CDK_STACKS')
+    if not value:
+        return list(STACK_NAMES)
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip().rsplit('-', 1)[-1].lower() for name in value if name.strip()]
+
+
+def select_stacks(names: list) -> set:
+    unknown = set(names) - set(STACK_NAMES)
+    if unknown:
+        raise ValueError('Unknown stacks {}, expected some of {}'.format(sorted(unknown), STACK_NAMES))
+    selected = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(STACK_REFERENCES[name])
+    return selected
+
+
+def build_app(config: Config, app: cdk.App = None, keypair_resolver: KeypairResolver = None,
+              timings: dict = None) -> cdk.App:
+    app = app or cdk.App()
+    project = config.app.project
+    environment = config.app.environment
+    vpc_cidr = config.app.vpc_cidr
+    aws_region = config.app.aws_region
+    aws_environment = cdk.Environment(account=os.getenv("CDK_DEFAULT_ACCOUNT"), region=aws_region)
+    aws_tags_list = []
+    for k, v in config.app.aws_tags.items():
+        aws_tags_list.append({'Key': k, 'Value': v or ' '})
+
+    selected = select_stacks(requested_stacks(app))
+    timings = timings if timings is not None else {}
+    stacks = {}
+
+    def timed(name, stack_class, **kwargs):
+        start = time.perf_counter()
+        construct_id = '-'.join([project, environment, name])
+        stacks[name] = stack_class(app, construct_id, env=aws_environment, **kwargs)
+        timings[construct_id] = time.perf_counter() - start
+
+    if 'vpc' in selected:
+        timed('vpc', VPCStack, cidr=vpc_cidr, vpc_config=config.app.vpc)
+    if 'kms' in selected:
+        timed('kms', KMSStack,
+              key_name='-'.join([project, environment, 'key']),
+              account_id=os.getenv("CDK_DEFAULT_ACCOUNT"))
+    if 'ec2' in selected:
+        keypair_resolver = keypair_resolver or KeypairResolver(account=os.getenv("CDK_DEFAULT_ACCOUNT"),
+                                                               region=aws_region, offline=is_offline(app))
+        date_now = datetime.datetime.now().strftime("%Y%m%d")
+        timed('ec2', EC2Stack,
+              vpc=stacks['vpc'].vpc,
+              ec2_config=config.ec2,
+              key=stacks['kms'].key,
+              monitoring_config=config.app.monitoring,
+              key_name=keypair_resolver.resolve(
+                  keypair_name='-'.join([project, environment, date_now, 'key']), aws_tags=aws_tags_list,
+                  environment='-'.join([project, environment])))
+    if 'rds' in selected:
+        timed('rds', RDSStack,
+              vpc=stacks['vpc'].vpc,
+              key=stacks['kms'].key,
+              rds_config=config.rds,
+              rds_name='-'.join([project, environment, 'rds']))
+    if 's3' in selected:
+        timed('s3', S3BucketStack,
+              bucket_name='-'.join([project, environment, 's3']))
+    if 'cache' in selected and config.app.cache.enabled:
+        timed('cache', CacheStack,
+              vpc=stacks['vpc'].vpc,
+              cache_config=config.app.cache)
+    if 'monitoring' in selected and config.app.monitoring.enabled:
+        timed('monitoring', MonitoringStack,
+              monitoring_config=config.app.monitoring,
+              ec2_config=config.ec2,
+              rds_config=config.rds,
+              rds_name='-'.join([project, environment, 'rds']))
+    if 'schedule' in selected and config.app.schedule.enabled:
+        timed('schedule', ScheduleStack,
+              schedule_config=config.app.schedule,
+              ec2_config=config.ec2,
+              rds_config=config.rds,
+              rds_name='-'.join([project, environment, 'rds']),
+              key=stacks['kms'].key)
+
+    for name, stack in stacks.items():
+        for dependency in STACK_IMPORTS[name]:
+            if dependency in stacks:
+                stack.add_dependency(stacks[dependency])
+
+    for key, value in config.app.aws_tags.items():
+        cdk.Tags.of(app).add(key, value or " ")
+    for name, stack in stacks.items():
+        cdk.Tags.of(stack).add("application", name.upper())
+    return app
+
+
+if __name__ == '__main__':
+    build_app(load_config()).synth()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STUB_ACCOUNT = '123456789012'
+IMPORTED_MODULES = [
+    'jsii',
+    'aws_cdk.core',
+    'aws_cdk.aws_ec2',
+    'aws_cdk.aws_iam',
+    'aws_cdk.aws_kms',
+    'aws_cdk.aws_rds',
+    'aws_cdk.aws_s3',
+    'aws_cdk.aws_autoscaling',
+    'aws_cdk.aws_elasticloadbalancingv2',
+    'aws_cdk.aws_elasticloadbalancingv2_targets',
+    'aws_cdk.aws_elasticache',
+    'aws_cdk.aws_cloudwatch',
+    'aws_cdk.aws_sns',
+    'aws_cdk.aws_ssm',
+    'aws_cdk.aws_events',
+    'aws_cdk.aws_events_targets',
+    'aws_cdk.aws_lambda',
+    'app'
+]
+
+
+def measure_imports() -> dict:
+    timings = {}
+    for module_name in IMPORTED_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(module_name)
+        timings[module_name] = time.perf_counter() - start
+    return timings
+
+
+def run_once(config, workdir: str) -> dict:
+    from aws_cdk import core as cdk
+
+    from app import build_app
+    from utils.cache import JsonFileCache
+    from utils.keypair import KeypairResolver
+
+    keypair_resolver = KeypairResolver(account=STUB_ACCOUNT, region=config.app.aws_region, offline=True,
+                                       cache=JsonFileCache(os.path.join(workdir, 'keypairs.json')))
+    construct_timings = {}
+    start = time.perf_counter()
+    app = build_app(config, cdk.App(outdir=os.path.join(workdir, 'cdk.out'), context={'offline': 'true'}),
+                    keypair_resolver=keypair_resolver, timings=construct_timings)
+    construct_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    assembly = app.synth()
+    synth_seconds = time.perf_counter() - start
+    template_bytes = {
+        stack.stack_name: os.path.getsize(os.path.join(assembly.directory, stack.template_file))
+        for stack in assembly.stacks
+    }
+    return {
+        'construct': construct_timings,
+        'construct_total': construct_seconds,
+        'synth': synth_seconds,
+        'template_bytes': template_bytes
+    }
+
+
+def summarize(runs: list) -> dict:
+    return {
+        'construct': {
+            name: statistics.median(run['construct'][name] for run in runs) for name in runs[0]['construct']
+        },
+        'construct_total': statistics.median(run['construct_total'] for run in runs),
+        'synth': statistics.median(run['synth'] for run in runs),
+        'template_bytes': runs[-1]['template_bytes']
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    metrics = [('imports.' + name, value) for name, value in report['imports'].items()]
+    metrics += [('construct.' + name, value) for name, value in report['construct'].items()]
+    metrics += [('construct_total', report['construct_total']), ('synth', report['synth'])]
+    for metric, value in metrics:
+        section, _, name = metric.partition('.')
+        previous = baseline.get(section, {}).get(name) if name else baseline.get(section)
+        if previous and value > previous * (1 + threshold):
+            regressions.append((metric, previous, value))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Measure import, construct and synth time of the CDK app offline.')
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yaml'))
+    parser.add_argument('--repeat', type=int, default=3, help='construct and synth runs, the median is reported')
+    parser.add_argument('--output', default='benchmark.json', help='path of the JSON report')
+    parser.add_argument('--baseline', help='previous JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative slowdown before failing')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('CDK_DEFAULT_ACCOUNT', STUB_ACCOUNT)
+    os.environ['CDK_OFFLINE'] = '1'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import_timings = measure_imports()
+
+    from utils.config import load_config
+    config = load_config(args.config)
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = [run_once(config, os.path.join(workdir, str(index))) for index in range(args.repeat)]
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'repeat': args.repeat,
+        'imports': import_timings,
+        'import_total': sum(import_timings.values())
+    }
+    report.update(summarize(runs))
+    with open(args.output, 'w', encoding='UTF-8') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+    for name, seconds in report['imports'].items():
+        print('import    {:<48} {:>8.3f}s'.format(name, seconds))
+    for name, seconds in report['construct'].items():
+        print('construct {:<48} {:>8.3f}s'.format(name, seconds))
+    print('synth     {:<48} {:>8.3f}s'.format('app', report['synth']))
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='UTF-8') as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold)
+        for metric, previous, value in regressions:
+            print('regression {:<47} {:>8.3f}s -> {:.3f}s'.format(metric, previous, value), file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
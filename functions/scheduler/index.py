@@ -0,0 +1,77 @@
+import json
+
+import boto3
+
+ec2 = boto3.client('ec2')
+rds = boto3.client('rds')
+
+
+def _instances(instance_ids: list) -> dict:
+    instances = {}
+    for reservation in ec2.describe_instances(InstanceIds=instance_ids)['Reservations']:
+        for instance in reservation['Instances']:
+            instances[instance['InstanceId']] = instance
+    return instances
+
+
+def scale_ec2(target: dict, phase: str) -> dict:
+    instances = _instances(target['instance_ids'])
+    states = {instance_id: instance['State']['Name'] for instance_id, instance in instances.items()}
+    results = dict(states)
+    if target['action'] == 'stop':
+        from_state, to_state = ('running', 'stopping') if phase == 'down' else ('stopped', 'starting')
+        change = [instance_id for instance_id, state in states.items() if state == from_state]
+        if change:
+            (ec2.stop_instances if phase == 'down' else ec2.start_instances)(InstanceIds=change)
+        results.update((instance_id, to_state) for instance_id in change)
+        return results
+
+    instance_type = target['scaled_down_type'] if phase == 'down' else target['type']
+    # Instances in a transitional state are left for the next run.
+    resize = [instance_id for instance_id, instance in instances.items()
+              if instance['InstanceType'] != instance_type and states[instance_id] in ('running', 'stopped')]
+    running = [instance_id for instance_id in resize if states[instance_id] == 'running']
+    if running:
+        ec2.stop_instances(InstanceIds=running)
+        ec2.get_waiter('instance_stopped').wait(InstanceIds=running)
+    for instance_id in resize:
+        ec2.modify_instance_attribute(InstanceId=instance_id, InstanceType={'Value': instance_type})
+        results[instance_id] = 'resized to ' + instance_type
+    # Scaling down keeps stopped instances stopped, scaling up starts them.
+    start = [instance_id for instance_id, state in states.items()
+             if instance_id in running or (phase == 'up' and state == 'stopped')]
+    if start:
+        ec2.start_instances(InstanceIds=start)
+    return results
+
+
+def scale_rds(target: dict, phase: str) -> dict:
+    db_instance = rds.describe_db_instances(DBInstanceIdentifier=target['db_instance_id'])['DBInstances'][0]
+    status = db_instance['DBInstanceStatus']
+    if target['action'] == 'stop':
+        if phase == 'down' and status == 'available':
+            rds.stop_db_instance(DBInstanceIdentifier=target['db_instance_id'])
+            return {target['db_instance_id']: 'stopping'}
+        if phase == 'up' and status == 'stopped':
+            rds.start_db_instance(DBInstanceIdentifier=target['db_instance_id'])
+            return {target['db_instance_id']: 'starting'}
+        return {target['db_instance_id']: status}
+
+    db_instance_class = target['scaled_down_type'] if phase == 'down' else target['type']
+    if db_instance['DBInstanceClass'] == db_instance_class:
+        return {target['db_instance_id']: db_instance_class}
+    if status != 'available':
+        return {target['db_instance_id']: 'skipped while ' + status}
+    rds.modify_db_instance(DBInstanceIdentifier=target['db_instance_id'], DBInstanceClass=db_instance_class,
+                           ApplyImmediately=True)
+    return {target['db_instance_id']: 'resizing to ' + db_instance_class}
+
+
+def handler(event, context):
+    results = {}
+    if event.get('ec2'):
+        results['ec2'] = scale_ec2(event['ec2'], event['phase'])
+    if event.get('rds'):
+        results['rds'] = scale_rds(event['rds'], event['phase'])
+    print(json.dumps({'phase': event['phase'], 'results': results}, sort_keys=True))
+    return results
@@ -0,0 +1,65 @@
+from aws_cdk import (
+    aws_ec2 as ec2,
+    aws_elasticache as elasticache,
+    core as cdk
+)
+
+from utils.config import CacheConfig
+
+SUBNET_TYPES = {
+    'private': ec2.SubnetType.PRIVATE,
+    'isolated': ec2.SubnetType.ISOLATED
+}
+
+
+class CacheStack(cdk.Stack):
+    def __init__(self, scope: cdk.Construct, construct_id: str, vpc: ec2.Vpc, cache_config: CacheConfig,
+                 **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        cache_security_group = ec2.SecurityGroup(
+            self, 'CacheSecurityGroup', vpc=vpc, description='Security group for cache.',
+            security_group_name='-'.join([construct_id, 'sg'.replace(' ', '-')])
+        )
+        cache_security_group.add_ingress_rule(
+            peer=ec2.SecurityGroup.from_security_group_id(
+                self, "AppSG",
+                security_group_id=cdk.Fn.import_value(
+                    construct_id.rsplit('-', 1)[0].title().replace('-', '') + 'Ec2SecurityGroupId'
+                )
+            ),
+            connection=ec2.Port.tcp(cache_config.port),
+            description='from app servers'
+        )
+
+        cache_subnet_group = elasticache.CfnSubnetGroup(
+            self, 'CacheSubnetGroup',
+            description='Subnet group for cache.',
+            cache_subnet_group_name='-'.join([construct_id, 'subnet group'.replace(' ', '-')]),
+            subnet_ids=vpc.select_subnets(subnet_type=SUBNET_TYPES[cache_config.subnets]).subnet_ids
+        )
+        replicated = cache_config.replicas > 0
+        cache_replication_group = elasticache.CfnReplicationGroup(
+            self, 'CacheReplicationGroup',
+            replication_group_description='Redis cache for app servers.',
+            engine='redis',
+            engine_version=cache_config.engine_version,
+            cache_node_type=cache_config.node_type,
+            num_cache_clusters=1 + cache_config.replicas,
+            automatic_failover_enabled=replicated,
+            multi_az_enabled=replicated,
+            port=cache_config.port,
+            cache_subnet_group_name=cache_subnet_group.ref,
+            security_group_ids=[cache_security_group.security_group_id],
+            at_rest_encryption_enabled=cache_config.at_rest_encryption,
+            transit_encryption_enabled=cache_config.transit_encryption
+        )
+
+        cdk.CfnOutput(
+            self, 'OutputCacheEndpointAddress',
+            export_name=construct_id.title().replace('-', '') + 'EndpointAddress',
+            value=cache_replication_group.attr_primary_end_point_address)
+        cdk.CfnOutput(
+            self, 'OutputCacheEndpointPort',
+            export_name=construct_id.title().replace('-', '') + 'EndpointPort',
+            value=cache_replication_group.attr_primary_end_point_port)
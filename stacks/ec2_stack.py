@@ -1,25 +1,45 @@
 import os
 
-import yaml
 from aws_cdk import (
+    aws_autoscaling as autoscaling,
     aws_ec2 as ec2,
+    aws_elasticloadbalancingv2 as elbv2,
+    aws_elasticloadbalancingv2_targets as elbv2_targets,
     aws_iam as iam,
+    aws_kms as kms,
+    aws_ssm as ssm,
     core as cdk
 )
 
+from utils.cloudwatch_agent import parameter_name, windows_agent_config_json, windows_agent_install_commands
+from utils.config import BlockDeviceConfig, EC2Config, LoadBalancerConfig, MonitoringConfig
+from utils.security_group_rules import apply_ingress_plan, plan_ingress
+
+SUBNET_TYPES = {
+    'public': ec2.SubnetType.PUBLIC,
+    'private': ec2.SubnetType.PRIVATE,
+    'isolated': ec2.SubnetType.ISOLATED
+}
+EBS_VOLUME_TYPES = {
+    'gp2': ec2.EbsDeviceVolumeType.GP2,
+    'gp3': ec2.EbsDeviceVolumeType.GP3,
+    'io1': ec2.EbsDeviceVolumeType.IO1,
+    'io2': ec2.EbsDeviceVolumeType.IO2,
+    'st1': ec2.EbsDeviceVolumeType.ST1
+}
+
 
 class EC2Stack(cdk.Stack):
     def __init__(self, scope: cdk.Construct, construct_id: str, vpc: ec2.Vpc, key_name: str,
+                 ec2_config: EC2Config, key: kms.Key = None, monitoring_config: MonitoringConfig = None,
                  **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
         s3_bucket_name = cdk.Fn.import_value(
             construct_id.rsplit('-', 1)[0].title().replace('-', '') + 'S3BucketName'
         )
-        with open(os.path.join(os.path.dirname(__file__), 'ec2_config.yaml'), 'r', encoding='UTF-8') as file:
-            ec2_config = yaml.load(file, Loader=yaml.SafeLoader)
 
         app_windows_image = ec2.MachineImage.generic_windows(
-            ami_map={os.getenv('AWS_DEFAULT_REGION'): ec2_config['ami']})
+            ami_map={os.getenv('AWS_DEFAULT_REGION'): ec2_config.ami})
         app_security_group = ec2.SecurityGroup(self, 'AppSecurityGroup', vpc=vpc,
                                                description='Security group for app servers.',
                                                security_group_name='-'.join([construct_id, 'sg'.replace(' ', '-')])
@@ -32,24 +52,8 @@ class EC2Stack(cdk.Stack):
             description='Policy to operate S3 bucket',
             statements=[
                 iam.PolicyStatement(
-                    sid='AllowListOfSpecificBucket',
-                    actions=['s3:ListBucket'],
-                    resources=[
-                        'arn:aws-cn:s3:::' + s3_bucket_name,
-                        'arn:aws-cn:s3:::' + s3_bucket_name + '/*'
-                    ]
-                ),
-                iam.PolicyStatement(
-                    sid='AllowGetObjectOfSpecificBucket',
-                    actions=['s3:GetObject'],
-                    resources=[
-                        'arn:aws-cn:s3:::' + s3_bucket_name,
-                        'arn:aws-cn:s3:::' + s3_bucket_name + '/*'
-                    ]
-                ),
-                iam.PolicyStatement(
-                    sid='AllowPutObjectOfSpecificBucket',
-                    actions=['s3:PutObject'],
+                    sid='AllowOperateSpecificBucket',
+                    actions=['s3:ListBucket', 's3:GetObject', 's3:PutObject'],
                     resources=[
                         'arn:aws-cn:s3:::' + s3_bucket_name,
                         'arn:aws-cn:s3:::' + s3_bucket_name + '/*'
@@ -63,63 +67,256 @@ class EC2Stack(cdk.Stack):
                             managed_policies=[operating_s3_policy],
                             role_name='-'.join([construct_id, 'role'.replace(' ', '-')]),
                             )
-        block_devices = []
-        for device in ec2_config['block_devices']:
-            block_devices.append(
-                ec2.BlockDevice(
-                    device_name=device['name'],
-                    volume=ec2.BlockDeviceVolume.ebs(
-                        volume_size=int(device['size']),
-                        encrypted=False,
-                        delete_on_termination=True,
-                        volume_type=ec2.EbsDeviceVolumeType.GP2
-                    )
-                )
+        app_user_data = None
+        if monitoring_config is not None and monitoring_config.enabled:
+            app_role.add_managed_policy(iam.ManagedPolicy.from_aws_managed_policy_name('CloudWatchAgentServerPolicy'))
+            app_role.add_managed_policy(iam.ManagedPolicy.from_aws_managed_policy_name('AmazonSSMManagedInstanceCore'))
+            ssm.StringParameter(
+                self, 'CloudWatchAgentConfig',
+                parameter_name=parameter_name(construct_id),
+                description='CloudWatch agent configuration for app servers',
+                string_value=windows_agent_config_json(monitoring_config.agent_interval,
+                                                       auto_scaling=ec2_config.fleet.mode == 'auto_scaling')
             )
+            # Installs the agent at first boot and starts it with the configuration stored above.
+            app_user_data = ec2.UserData.for_windows()
+            app_user_data.add_commands(*windows_agent_install_commands(self.region, parameter_name(construct_id)))
+        block_devices = [self._block_device(device) for device in ec2_config.block_devices] + [
+            ec2.BlockDevice(device_name=device_name, volume=ec2.BlockDeviceVolume.ephemeral(index))
+            for index, device_name in enumerate(ec2_config.instance_store_devices)
+        ]
+        launch_template = None
+        if ec2_config.uses_throughput and ec2_config.fleet.mode != 'auto_scaling':
+            # AWS::EC2::Instance has no Throughput setting, so gp3 throughput goes through a launch template.
+            launch_template = self._launch_template(construct_id, ec2_config, key)
 
-        app_instance = ec2.Instance(self, 'AppEC2',
-                                    instance_type=ec2.InstanceType(ec2_config['type']),
-                                    machine_image=app_windows_image,
-                                    vpc=vpc,
-                                    block_devices=block_devices,
-                                    instance_name='-'.join([construct_id, 'app'.replace(' ', '-')]),
-                                    key_name=key_name,
-                                    role=app_role,
-                                    security_group=app_security_group,
-                                    vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PUBLIC)
-                                    )
-        eip = ec2.CfnEIP(self, 'AppInstanceIP', domain=vpc.vpc_id, instance_id=app_instance.instance_id,
-                         tags=[
-                             cdk.CfnTag(key='Name', value='-'.join([construct_id, 'app server eip'.replace(' ', '-')]))
-                         ]
-                         )
-
-        for inbound in ec2_config['inbounds']:
-            for port in inbound['port']:
-                if '-' in str(port):
-                    [from_port, to_port] = str(port).split('-')
+        fleet = ec2_config.fleet
+        subnet_types = [SUBNET_TYPES[name] for name in fleet.subnets]
+        instance_type = ec2.InstanceType(ec2_config.type)
+        app_instances = []
+        app_auto_scaling_group = None
+        if fleet.mode in ('single', 'instances'):
+            subnets = [(subnet_type, subnet) for subnet_type in subnet_types
+                       for subnet in vpc.select_subnets(subnet_type=subnet_type).subnets]
+            instance_count = 1 if fleet.mode == 'single' else fleet.count
+            for index in range(instance_count):
+                suffix = '' if index == 0 else str(index + 1)
+                subnet_type, subnet = subnets[index % len(subnets)]
+                app_instance = ec2.Instance(self, 'AppEC2' + ('Server' + suffix if suffix else ''),
+                                            instance_type=instance_type,
+                                            machine_image=app_windows_image,
+                                            vpc=vpc,
+                                            block_devices=None if launch_template else block_devices,
+                                            instance_name='-'.join([construct_id, 'app'.replace(' ', '-')] +
+                                                                   ([suffix] if suffix else [])),
+                                            key_name=key_name,
+                                            role=app_role,
+                                            security_group=app_security_group,
+                                            user_data=app_user_data,
+                                            vpc_subnets=ec2.SubnetSelection(subnets=[subnet])
+                                            )
+                cfn_instance = app_instance.instance
+                if launch_template:
+                    cfn_instance.add_property_override('LaunchTemplate', {
+                        'LaunchTemplateId': launch_template.ref,
+                        'Version': launch_template.attr_latest_version_number
+                    })
                 else:
-                    from_port = port
-                    to_port = port
-                app_security_group.add_ingress_rule(
-                    peer=ec2.Peer.ipv4(inbound['ip']),
-                    connection=ec2.Port(
-                        protocol=ec2.Protocol.TCP,
-                        string_representation=inbound['description'],
-                        from_port=int(from_port),
-                        to_port=int(to_port)
-                    ),
-                    description=inbound['description']
+                    for device_index, device in enumerate(ec2_config.block_devices):
+                        if device.kms:
+                            cfn_instance.add_property_override(
+                                'BlockDeviceMappings.{}.Ebs.KmsKeyId'.format(device_index), key.key_arn
+                            )
+                if ec2_config.ebs_optimized:
+                    cfn_instance.add_property_override('EbsOptimized', True)
+                if subnet_type == ec2.SubnetType.PUBLIC:
+                    ec2.CfnEIP(self, 'AppInstanceIP' + suffix, domain=vpc.vpc_id,
+                               instance_id=app_instance.instance_id,
+                               tags=[
+                                   cdk.CfnTag(key='Name', value='-'.join(
+                                       [construct_id, 'app server eip'.replace(' ', '-')] +
+                                       ([suffix] if suffix else [])
+                                   ))
+                               ]
+                               )
+                app_instances.append((app_instance, subnet_type == ec2.SubnetType.PUBLIC))
+        elif fleet.mode == 'auto_scaling':
+            app_auto_scaling_group = autoscaling.AutoScalingGroup(
+                self, 'AppAutoScalingGroup',
+                auto_scaling_group_name='-'.join([construct_id, 'app asg'.replace(' ', '-')]),
+                instance_type=instance_type,
+                machine_image=app_windows_image,
+                vpc=vpc,
+                block_devices=block_devices,
+                key_name=key_name,
+                role=app_role,
+                security_group=app_security_group,
+                user_data=app_user_data,
+                associate_public_ip_address=ec2.SubnetType.PUBLIC in subnet_types,
+                min_capacity=fleet.min_capacity,
+                max_capacity=fleet.max_capacity,
+                desired_capacity=fleet.desired_capacity,
+                vpc_subnets=ec2.SubnetSelection(subnets=[
+                    subnet for subnet_type in subnet_types for subnet in vpc.select_subnets(
+                        subnet_type=subnet_type).subnets
+                ])
+            )
+            launch_configuration = app_auto_scaling_group.node.find_child('LaunchConfig')
+            for device_index, device in enumerate(ec2_config.block_devices):
+                if device.throughput:
+                    launch_configuration.add_property_override(
+                        'BlockDeviceMappings.{}.Ebs.Throughput'.format(device_index), device.throughput
+                    )
+            if ec2_config.ebs_optimized:
+                launch_configuration.add_property_override('EbsOptimized', True)
+            if fleet.cpu_target_utilization:
+                app_auto_scaling_group.scale_on_cpu_utilization(
+                    'AppCpuScaling', target_utilization_percent=fleet.cpu_target_utilization
                 )
 
-        cdk.CfnOutput(
-            self, 'OutputEc2InstanceId',
-            export_name=construct_id.title().replace('-', '') + 'InstanceId', value=app_instance.instance_id)
-        cdk.CfnOutput(
-            self, 'OutputEc2PublicIP',
-            export_name=construct_id.title().replace('-', '') + 'InstancePublicIP',
-            value=app_instance.instance_public_ip)
+        if fleet.load_balancer.enabled:
+            self._add_load_balancer(construct_id, vpc, fleet.load_balancer, app_security_group,
+                                    app_instances, app_auto_scaling_group)
+
+        load_balancer_rules = sum(2 if listener.protocol == 'TCP_UDP' else 1
+                                  for listener in fleet.load_balancer.listeners) if fleet.load_balancer.enabled else 0
+        apply_ingress_plan(
+            self, app_security_group,
+            plan_ingress(ec2_config.inbounds,
+                         prefix_list_min_entries=ec2_config.security_group.prefix_list_min_entries,
+                         name='-'.join([construct_id, 'sg'.replace(' ', '-')])),
+            ec2_config.security_group, extra_rules=load_balancer_rules
+        )
+
+        for index, (app_instance, is_public) in enumerate(app_instances):
+            suffix = '' if index == 0 else str(index + 1)
+            cdk.CfnOutput(
+                self, 'OutputEc2InstanceId' + suffix,
+                export_name=construct_id.title().replace('-', '') + 'InstanceId' + suffix,
+                value=app_instance.instance_id)
+            if not is_public:
+                continue
+            cdk.CfnOutput(
+                self, 'OutputEc2PublicIP' + suffix,
+                export_name=construct_id.title().replace('-', '') + 'InstancePublicIP' + suffix,
+                value=app_instance.instance_public_ip)
+        if app_auto_scaling_group is not None:
+            cdk.CfnOutput(
+                self, 'OutputEc2AutoScalingGroupName',
+                export_name=construct_id.title().replace('-', '') + 'AutoScalingGroupName',
+                value=app_auto_scaling_group.auto_scaling_group_name)
         cdk.CfnOutput(
             self, 'OutputEc2SecurityGroupId',
             export_name=construct_id.title().replace('-', '') + 'SecurityGroupId',
             value=app_security_group.security_group_id)
+
+    @staticmethod
+    def _block_device(device: BlockDeviceConfig) -> ec2.BlockDevice:
+        return ec2.BlockDevice(
+            device_name=device.name,
+            volume=ec2.BlockDeviceVolume.ebs(
+                volume_size=device.size,
+                encrypted=device.encrypted,
+                delete_on_termination=device.delete_on_termination,
+                volume_type=EBS_VOLUME_TYPES[device.volume_type],
+                iops=device.iops
+            )
+        )
+
+    def _launch_template(self, construct_id: str, ec2_config: EC2Config, key: kms.Key) -> ec2.CfnLaunchTemplate:
+        return ec2.CfnLaunchTemplate(
+            self, 'AppLaunchTemplate',
+            launch_template_name='-'.join([construct_id, 'app lt'.replace(' ', '-')]),
+            launch_template_data=ec2.CfnLaunchTemplate.LaunchTemplateDataProperty(
+                block_device_mappings=[
+                    ec2.CfnLaunchTemplate.BlockDeviceMappingProperty(
+                        device_name=device.name,
+                        ebs=ec2.CfnLaunchTemplate.EbsProperty(
+                            volume_size=device.size,
+                            volume_type=device.volume_type,
+                            iops=device.iops,
+                            throughput=device.throughput,
+                            encrypted=device.encrypted,
+                            kms_key_id=key.key_arn if device.kms else None,
+                            delete_on_termination=device.delete_on_termination
+                        )
+                    )
+                    for device in ec2_config.block_devices
+                ] + [
+                    ec2.CfnLaunchTemplate.BlockDeviceMappingProperty(
+                        device_name=device_name, virtual_name='ephemeral{}'.format(index)
+                    )
+                    for index, device_name in enumerate(ec2_config.instance_store_devices)
+                ]
+            )
+        )
+
+    def _add_load_balancer(self, construct_id: str, vpc: ec2.Vpc, config: LoadBalancerConfig,
+                           app_security_group: ec2.SecurityGroup, app_instances: list,
+                           app_auto_scaling_group: autoscaling.AutoScalingGroup) -> None:
+        internet_facing = config.internet_facing
+        subnet_type = ec2.SubnetType.PUBLIC if internet_facing else ec2.SubnetType.PRIVATE
+        if config.type == 'application':
+            load_balancer = elbv2.ApplicationLoadBalancer(
+                self, 'AppLoadBalancer', vpc=vpc, internet_facing=internet_facing,
+                vpc_subnets=ec2.SubnetSelection(subnet_type=subnet_type)
+            )
+        else:
+            load_balancer = elbv2.NetworkLoadBalancer(
+                self, 'AppLoadBalancer', vpc=vpc, internet_facing=internet_facing,
+                cross_zone_enabled=True,
+                vpc_subnets=ec2.SubnetSelection(subnet_type=subnet_type)
+            )
+        if app_auto_scaling_group is not None:
+            targets = [app_auto_scaling_group]
+        else:
+            targets = [elbv2_targets.InstanceTarget(instance) for instance, _ in app_instances]
+
+        for listener_config in config.listeners:
+            port = listener_config.port
+            target_port = listener_config.target_port
+            protocol = listener_config.protocol
+            if config.type == 'application':
+                certificate_arn = listener_config.certificate_arn
+                listener = load_balancer.add_listener(
+                    'Listener' + str(port), port=port, protocol=elbv2.ApplicationProtocol[protocol],
+                    certificates=[elbv2.ListenerCertificate.from_arn(certificate_arn)] if certificate_arn else None,
+                    open=internet_facing
+                )
+                if not internet_facing:
+                    load_balancer.connections.allow_from(
+                        ec2.Peer.ipv4(vpc.vpc_cidr_block), ec2.Port.tcp(port), 'from vpc'
+                    )
+                listener.add_targets(
+                    'AppTargets' + str(port), port=target_port,
+                    protocol=elbv2.ApplicationProtocol[listener_config.target_protocol],
+                    targets=targets,
+                    health_check=elbv2.HealthCheck(path=config.health_check_path)
+                )
+                app_security_group.connections.allow_from(
+                    load_balancer, ec2.Port.tcp(target_port), 'from app load balancer'
+                )
+            else:
+                certificate_arn = listener_config.certificate_arn
+                listener = load_balancer.add_listener(
+                    'Listener' + str(port), port=port, protocol=elbv2.Protocol[protocol],
+                    certificates=[elbv2.ListenerCertificate.from_arn(certificate_arn)] if certificate_arn else None
+                )
+                listener.add_targets('AppTargets' + str(port), port=target_port, targets=targets)
+                # A network load balancer has no security group and keeps the client IP, so the app servers admit
+                # the clients themselves.
+                client_peer = ec2.Peer.any_ipv4() if internet_facing else ec2.Peer.ipv4(vpc.vpc_cidr_block)
+                target_ports = []
+                if protocol != 'UDP':
+                    target_ports.append(ec2.Port.tcp(target_port))
+                if protocol in ('UDP', 'TCP_UDP'):
+                    target_ports.append(ec2.Port.udp(target_port))
+                for target_port_range in target_ports:
+                    app_security_group.connections.allow_from(
+                        client_peer, target_port_range, 'from network load balancer clients'
+                    )
+
+        cdk.CfnOutput(
+            self, 'OutputEc2LoadBalancerDnsName',
+            export_name=construct_id.title().replace('-', '') + 'LoadBalancerDnsName',
+            value=load_balancer.load_balancer_dns_name)
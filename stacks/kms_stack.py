@@ -4,6 +4,8 @@ from aws_cdk import (
     core as cdk
 )
 
+from utils.pinned_exports import pin_exports
+
 
 class KMSStack(cdk.Stack):
     def __init__(self, scope: cdk.Construct, construct_id: str, key_name: str, account_id: str, **kwargs) -> None:
@@ -65,3 +67,4 @@ class KMSStack(cdk.Stack):
             export_name=construct_id.title().replace('-', '') + 'KeyId',
             value=self.key.key_id
         )
+        pin_exports(self, [self.key.key_arn])
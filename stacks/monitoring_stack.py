@@ -0,0 +1,155 @@
+import re
+
+from aws_cdk import (
+    aws_cloudwatch as cloudwatch,
+    aws_cloudwatch_actions as cloudwatch_actions,
+    aws_sns as sns,
+    aws_sns_subscriptions as sns_subscriptions,
+    core as cdk
+)
+
+from utils.cloudwatch_agent import AGENT_NAMESPACE, DISK_QUEUE_METRIC
+from utils.config import EC2Config, MonitoringConfig, RDSConfig
+from utils.rds_instance_type import load_catalog
+
+GIB = 1024 * 1024 * 1024
+PERIOD = cdk.Duration.minutes(5)
+
+
+class MonitoringStack(cdk.Stack):
+    def __init__(self, scope: cdk.Construct, construct_id: str, monitoring_config: MonitoringConfig,
+                 ec2_config: EC2Config, rds_config: RDSConfig, rds_name: str, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+        self.construct_id = construct_id
+        self.alarm_topic = None
+        if monitoring_config.alarm_email:
+            self.alarm_topic = sns.Topic(self, 'AlarmTopic',
+                                         topic_name='-'.join([construct_id, 'alarms'.replace(' ', '-')]))
+            self.alarm_topic.add_subscription(sns_subscriptions.EmailSubscription(monitoring_config.alarm_email))
+
+        export_prefix = construct_id.rsplit('-', 1)[0].title().replace('-', '')
+        fleet = ec2_config.fleet
+        if fleet.mode == 'auto_scaling':
+            app_dimensions = {'App': {'AutoScalingGroupName': cdk.Fn.import_value(
+                export_prefix + 'Ec2AutoScalingGroupName')}}
+        else:
+            instance_count = 1 if fleet.mode == 'single' else fleet.count
+            app_dimensions = {}
+            for index in range(instance_count):
+                suffix = '' if index == 0 else str(index + 1)
+                app_dimensions['AppEC2' + suffix] = {
+                    'InstanceId': cdk.Fn.import_value(export_prefix + 'Ec2InstanceId' + suffix)
+                }
+        rds_dimensions = {'RDS': {'DBInstanceIdentifier': rds_name}}
+        for index in range(len(rds_config.read_replicas)):
+            rds_dimensions['ReadReplica' + str(index + 1)] = {
+                'DBInstanceIdentifier': '-'.join([rds_name, 'replica', str(index + 1)])
+            }
+
+        dashboard = cloudwatch.Dashboard(self, 'Dashboard', dashboard_name=construct_id)
+        dashboard.add_widgets(*self._app_widgets(monitoring_config, ec2_config, app_dimensions))
+        dashboard.add_widgets(*self._rds_widgets(monitoring_config, rds_config, rds_dimensions))
+
+    @staticmethod
+    def _metric(namespace: str, metric_name: str, dimensions: dict, label: str,
+                statistic: str = 'Average') -> cloudwatch.Metric:
+        return cloudwatch.Metric(namespace=namespace, metric_name=metric_name, dimensions_map=dimensions,
+                                 label=label, statistic=statistic, period=PERIOD)
+
+    def _alarm(self, alarm_id: str, metric: cloudwatch.Metric, threshold: float, description: str,
+               comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+               evaluation_periods: int = 3) -> cloudwatch.Alarm:
+        alarm = cloudwatch.Alarm(
+            self, alarm_id,
+            alarm_name='-'.join([self.construct_id, alarm_id]),
+            alarm_description=description,
+            metric=metric,
+            threshold=threshold,
+            evaluation_periods=evaluation_periods,
+            comparison_operator=comparison_operator,
+            treat_missing_data=cloudwatch.TreatMissingData.MISSING
+        )
+        if self.alarm_topic is not None:
+            alarm.add_alarm_action(cloudwatch_actions.SnsAction(self.alarm_topic))
+        return alarm
+
+    def _app_widgets(self, config: MonitoringConfig, ec2_config: EC2Config, app_dimensions: dict) -> list:
+        spec = load_catalog().find(ec2_config.type)
+        # Outside the catalog the t families such as t4g are the burstable ones.
+        burstable = spec.burstable if spec is not None else bool(re.match(r'^t\d', ec2_config.type))
+        cpu, credits, disk_queue, ebs_ops, network_in, network_out = [], [], [], [], [], []
+        for name, dimensions in app_dimensions.items():
+            cpu.append(self._metric('AWS/EC2', 'CPUUtilization', dimensions, name))
+            self._alarm(name + 'CpuAlarm', cpu[-1], config.cpu_percent,
+                        '{} CPU above {}%'.format(name, config.cpu_percent))
+            if burstable:
+                credits.append(self._metric('AWS/EC2', 'CPUCreditBalance', dimensions, name))
+                self._alarm(name + 'CpuCreditAlarm', credits[-1], config.cpu_credit_balance,
+                            '{} CPU credit balance below {}'.format(name, config.cpu_credit_balance),
+                            comparison_operator=cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD)
+            # Queue depth is a per-volume metric in AWS/EBS, so the agent's Windows disk counter is used instead.
+            agent_dimensions = dict(dimensions) if 'AutoScalingGroupName' in dimensions else dict(
+                dimensions, objectname='PhysicalDisk', instance='_Total')
+            disk_queue.append(self._metric(AGENT_NAMESPACE, DISK_QUEUE_METRIC, agent_dimensions, name))
+            self._alarm(name + 'DiskQueueAlarm', disk_queue[-1], config.disk_queue_length,
+                        '{} average disk queue length above {:g}'.format(name, config.disk_queue_length))
+            ebs_ops.append(self._metric('AWS/EC2', 'EBSReadOps', dimensions, name + ' read', 'Sum'))
+            ebs_ops.append(self._metric('AWS/EC2', 'EBSWriteOps', dimensions, name + ' write', 'Sum'))
+            network_in.append(self._metric('AWS/EC2', 'NetworkIn', dimensions, name, 'Sum'))
+            network_out.append(self._metric('AWS/EC2', 'NetworkOut', dimensions, name, 'Sum'))
+            self._alarm(name + 'StatusCheckAlarm',
+                        self._metric('AWS/EC2', 'StatusCheckFailed', dimensions, name, 'Maximum'), 0,
+                        '{} failed a status check'.format(name), evaluation_periods=2)
+
+        widgets = [
+            cloudwatch.GraphWidget(title='App CPU utilization (%)', left=cpu, width=8),
+            cloudwatch.GraphWidget(title='App disk queue length', left=disk_queue, width=8),
+            cloudwatch.GraphWidget(title='App EBS operations', left=ebs_ops, width=8),
+            cloudwatch.GraphWidget(title='App network (bytes)', left=network_in, right=network_out, width=12)
+        ]
+        if credits:
+            widgets.append(cloudwatch.GraphWidget(title='App CPU credit balance', left=credits, width=12))
+        return widgets
+
+    def _rds_widgets(self, config: MonitoringConfig, rds_config: RDSConfig, rds_dimensions: dict) -> list:
+        latency, iops, connections, free_storage, burst_balance = [], [], [], [], []
+        free_storage_threshold = rds_config.storage * GIB * config.rds_free_storage_percent / 100
+        for name, dimensions in rds_dimensions.items():
+            for metric_name in ('ReadLatency', 'WriteLatency'):
+                latency.append(self._metric('AWS/RDS', metric_name, dimensions, ' '.join([name, metric_name])))
+                self._alarm(name + metric_name + 'Alarm', latency[-1], config.rds_latency_ms / 1000,
+                            '{} {} above {} ms'.format(name, metric_name, config.rds_latency_ms))
+            iops.append(self._metric('AWS/RDS', 'ReadIOPS', dimensions, name + ' read'))
+            iops.append(self._metric('AWS/RDS', 'WriteIOPS', dimensions, name + ' write'))
+            connections.append(self._metric('AWS/RDS', 'DatabaseConnections', dimensions, name))
+            if config.rds_connections:
+                self._alarm(name + 'ConnectionsAlarm', connections[-1], config.rds_connections,
+                            '{} has more than {} connections'.format(name, config.rds_connections))
+            free_storage.append(self._metric('AWS/RDS', 'FreeStorageSpace', dimensions, name, 'Minimum'))
+            # Storage autoscaling only grows the volume once free space is low, so the alarm uses the initial size.
+            self._alarm(name + 'FreeStorageAlarm', free_storage[-1], free_storage_threshold,
+                        '{} free storage below {}% of {} GiB'.format(name, config.rds_free_storage_percent,
+                                                                    rds_config.storage),
+                        comparison_operator=cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD)
+            if rds_config.storage_type == 'gp2':
+                burst_balance.append(self._metric('AWS/RDS', 'BurstBalance', dimensions, name))
+                self._alarm(name + 'BurstBalanceAlarm', burst_balance[-1], config.rds_burst_balance_percent,
+                            '{} storage burst balance below {}%'.format(name, config.rds_burst_balance_percent),
+                            comparison_operator=cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD)
+
+        storage_annotations = [cloudwatch.HorizontalAnnotation(value=rds_config.storage * GIB,
+                                                               label='allocated storage')]
+        if rds_config.max_storage:
+            storage_annotations.append(cloudwatch.HorizontalAnnotation(value=rds_config.max_storage * GIB,
+                                                                       label='max allocated storage'))
+        widgets = [
+            cloudwatch.GraphWidget(title='RDS latency (s)', left=latency, width=8),
+            cloudwatch.GraphWidget(title='RDS IOPS', left=iops, width=8),
+            cloudwatch.GraphWidget(title='RDS connections', left=connections, width=8),
+            cloudwatch.GraphWidget(title='RDS free storage (bytes)', left=free_storage,
+                                   left_annotations=storage_annotations, width=12)
+        ]
+        if burst_balance:
+            widgets.append(cloudwatch.GraphWidget(title='RDS storage burst balance (%)', left=burst_balance,
+                                                  width=12))
+        return widgets
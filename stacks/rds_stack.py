@@ -1,6 +1,3 @@
-import os
-
-import yaml
 from aws_cdk import (
     aws_ec2 as ec2,
     aws_iam as iam,
@@ -9,37 +6,38 @@ from aws_cdk import (
     core as cdk
 )
 
-from utils.rds_instance_type import RDSInstanceType
+from utils.config import RDSConfig
+from utils.security_group_rules import apply_ingress_plan, plan_ingress
 
-SQL_SERVER_VERSION = rds.SqlServerEngineVersion.VER_12_00_5571_0_V1
-SQL_ENGINE = rds.DatabaseInstanceEngine.sql_server_se(version=SQL_SERVER_VERSION)
+SQL_ENGINES = {
+    'se': rds.DatabaseInstanceEngine.sql_server_se,
+    'ee': rds.DatabaseInstanceEngine.sql_server_ee
+}
+STORAGE_TYPES = {
+    'gp2': rds.StorageType.GP2,
+    'io1': rds.StorageType.IO1
+}
 
 
 class RDSStack(cdk.Stack):
     def __init__(self, scope: cdk.Construct, construct_id: str, vpc: ec2.Vpc, key: kms.Key, rds_name: str,
-                 **kwargs) -> None:
+                 rds_config: RDSConfig, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
         rds_security_group = ec2.SecurityGroup(
             self, 'RDSSecurityGroup', vpc=vpc, description='Security group for rds.',
             security_group_name='-'.join([construct_id, 'sg'.replace(' ', '-')])
         )
-        with open(os.path.join(os.path.dirname(__file__), 'rds_config.yaml'), 'r', encoding='UTF-8') as file:
-            rds_config = yaml.load(file, Loader=yaml.SafeLoader)
-        rds_port = rds_config['rds_port']
-        master_user = rds_config['master_user']
+        rds_port = rds_config.rds_port
+        master_user = rds_config.master_user
 
-        for inbound in rds_config['inbounds']:
-            rds_security_group.add_ingress_rule(
-                peer=ec2.Peer.ipv4(inbound['ip']),
-                connection=ec2.Port(
-                    protocol=ec2.Protocol.TCP,
-                    string_representation=inbound['description'],
-                    from_port=rds_port,
-                    to_port=rds_port
-                ),
-                description=inbound['description']
-            )
+        apply_ingress_plan(
+            self, rds_security_group,
+            plan_ingress(rds_config.inbounds, ports=[(rds_port, rds_port)],
+                         prefix_list_min_entries=rds_config.security_group.prefix_list_min_entries,
+                         name='-'.join([construct_id, 'sg'.replace(' ', '-')])),
+            rds_config.security_group, extra_rules=1
+        )
         rds_security_group.add_ingress_rule(
             peer=ec2.SecurityGroup.from_security_group_id(
                 self, "AppSG",
@@ -84,9 +82,11 @@ class RDSStack(cdk.Stack):
             managed_policies=[backup_restore_from_s3_policy],
             role_name='-'.join([construct_id, 'role'.replace(' ', '-')]),
         )
+        engine = SQL_ENGINES[rds_config.edition](version=rds.SqlServerEngineVersion.of(
+            rds_config.engine_version, rds_config.engine_major_version))
         option_group = rds.OptionGroup(
             self, 'OptionGroup',
-            engine=SQL_ENGINE,
+            engine=engine,
             configurations=[
                 rds.OptionConfiguration(
                     name='SQLSERVER_BACKUP_RESTORE',
@@ -95,42 +95,84 @@ class RDSStack(cdk.Stack):
             ]
         )
 
+        performance_insights = rds_config.performance_insights
+        performance_insight_retention = None
+        if performance_insights.enabled:
+            performance_insight_retention = rds.PerformanceInsightRetention.LONG_TERM \
+                if performance_insights.retention_days > 7 else rds.PerformanceInsightRetention.DEFAULT
+        monitoring_interval = cdk.Duration.seconds(rds_config.monitoring_interval) \
+            if rds_config.monitoring_interval else None
         mssql_rds = rds.DatabaseInstance(
             self, 'RDS',
-            character_set_name=rds_config['collation'],
+            character_set_name=rds_config.collation,
             credentials=rds.Credentials.from_password(
-                username=master_user['name'],
+                username=master_user.name,
                 password=cdk.SecretValue.secrets_manager(
-                    secret_id=master_user['password']['secret_id'],
-                    json_field=master_user['password']['json_field']
+                    secret_id=master_user.secret_id,
+                    json_field=master_user.json_field
                 )
             ),
             storage_encrypted=True,
             storage_encryption_key=key,
-            allocated_storage=int(rds_config['storage']),
-            engine=SQL_ENGINE,
-            instance_type=RDSInstanceType().get_instance_type(rds_config['type']),
+            allocated_storage=rds_config.storage,
+            engine=engine,
+            instance_type=ec2.InstanceType(rds_config.type),
             license_model=rds.LicenseModel.LICENSE_INCLUDED,
-            timezone=rds_config['timezone'],
+            timezone=rds_config.timezone,
             auto_minor_version_upgrade=False,
-            backup_retention=cdk.Duration.days(int(rds_config['backup_retention_days'])),
-            cloudwatch_logs_exports=rds_config['cloudwatch_logs_exports'],
+            backup_retention=cdk.Duration.days(rds_config.backup_retention_days),
+            cloudwatch_logs_exports=rds_config.cloudwatch_logs_exports,
             copy_tags_to_snapshot=True,
             delete_automated_backups=True,
             deletion_protection=False,
             instance_identifier=rds_name,
-            max_allocated_storage=int(rds_config['max_storage']) if rds_config['max_storage'] else None,
-            multi_az=False,
+            max_allocated_storage=rds_config.max_storage,
+            multi_az=rds_config.multi_az,
             option_group=option_group,
             port=rds_port,
-            preferred_backup_window=rds_config['backup_window'],
+            preferred_backup_window=rds_config.backup_window,
             publicly_accessible=False,
             removal_policy=cdk.RemovalPolicy.SNAPSHOT,
             security_groups=[rds_security_group],
-            storage_type=rds.StorageType.GP2,
+            storage_type=STORAGE_TYPES.get(rds_config.storage_type, rds.StorageType.GP2),
+            iops=rds_config.iops if rds_config.storage_type == 'io1' else None,
+            enable_performance_insights=performance_insights.enabled or None,
+            performance_insight_retention=performance_insight_retention,
+            performance_insight_encryption_key=key if performance_insights.enabled else None,
+            monitoring_interval=monitoring_interval,
             vpc=vpc,
             vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.ISOLATED)
         )
+        self._override_gp3(mssql_rds, rds_config)
+
+        for index, replica_config in enumerate(rds_config.read_replicas):
+            replica = rds.DatabaseInstanceReadReplica(
+                self, 'ReadReplica' + str(index + 1),
+                source_database_instance=mssql_rds,
+                instance_type=ec2.InstanceType(replica_config.type),
+                instance_identifier='-'.join([rds_name, 'replica', str(index + 1)]),
+                storage_encrypted=True,
+                storage_encryption_key=key,
+                auto_minor_version_upgrade=False,
+                storage_type=STORAGE_TYPES.get(rds_config.storage_type, rds.StorageType.GP2),
+                iops=rds_config.iops if rds_config.storage_type == 'io1' else None,
+                enable_performance_insights=performance_insights.enabled or None,
+                performance_insight_retention=performance_insight_retention,
+                performance_insight_encryption_key=key if performance_insights.enabled else None,
+                monitoring_interval=monitoring_interval,
+                port=rds_port,
+                publicly_accessible=False,
+                removal_policy=cdk.RemovalPolicy.DESTROY,
+                security_groups=[rds_security_group],
+                vpc=vpc,
+                vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.ISOLATED)
+            )
+            self._override_gp3(replica, rds_config)
+            cdk.CfnOutput(
+                self, 'OutputRdsReplica{}EndpointAddress'.format(index + 1),
+                export_name=construct_id.title().replace('-', '') + 'Replica{}EndpointAddress'.format(index + 1),
+                value=replica.db_instance_endpoint_address
+            )
 
         cdk.CfnOutput(
             self, 'OutputRdsEndpointAddress',
@@ -142,3 +184,15 @@ class RDSStack(cdk.Stack):
             export_name=construct_id.title().replace('-', '') + 'EndpointPort',
             value=mssql_rds.db_instance_endpoint_port
         )
+
+    @staticmethod
+    def _override_gp3(instance: rds.DatabaseInstanceBase, rds_config: RDSConfig) -> None:
+        if rds_config.storage_type != 'gp3':
+            return
+        # gp3 is newer than the StorageType enum of this CDK release, so it is set on the L1 resource.
+        cfn_instance = instance.node.default_child
+        cfn_instance.add_property_override('StorageType', 'gp3')
+        if rds_config.iops:
+            cfn_instance.add_property_override('Iops', rds_config.iops)
+        if rds_config.storage_throughput:
+            cfn_instance.add_property_override('StorageThroughput', rds_config.storage_throughput)
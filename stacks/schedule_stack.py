@@ -0,0 +1,123 @@
+import os
+
+from aws_cdk import (
+    aws_autoscaling as autoscaling,
+    aws_events as events,
+    aws_events_targets as events_targets,
+    aws_iam as iam,
+    aws_kms as kms,
+    aws_lambda as lambda_,
+    core as cdk
+)
+
+from utils.config import EC2Config, RDSConfig, ScheduleConfig
+
+FUNCTION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions', 'scheduler')
+
+
+class ScheduleStack(cdk.Stack):
+    def __init__(self, scope: cdk.Construct, construct_id: str, schedule_config: ScheduleConfig,
+                 ec2_config: EC2Config, rds_config: RDSConfig, rds_name: str, key: kms.Key = None, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+        export_prefix = construct_id.rsplit('-', 1)[0].title().replace('-', '')
+        fleet = ec2_config.fleet
+        targets = {}
+        statements = []
+
+        if schedule_config.ec2.action != 'none' and fleet.mode == 'auto_scaling':
+            self._schedule_auto_scaling_group(schedule_config, ec2_config,
+                                              cdk.Fn.import_value(export_prefix + 'Ec2AutoScalingGroupName'))
+        elif schedule_config.ec2.action != 'none':
+            instance_count = 1 if fleet.mode == 'single' else fleet.count
+            instance_ids = [
+                cdk.Fn.import_value(export_prefix + 'Ec2InstanceId' + ('' if index == 0 else str(index + 1)))
+                for index in range(instance_count)
+            ]
+            targets['ec2'] = {
+                'action': schedule_config.ec2.action,
+                'instance_ids': instance_ids,
+                'type': ec2_config.type,
+                'scaled_down_type': schedule_config.ec2.type
+            }
+            statements.append(iam.PolicyStatement(
+                sid='AllowScaleAppInstances',
+                actions=['ec2:StartInstances', 'ec2:StopInstances', 'ec2:ModifyInstanceAttribute'],
+                resources=[self.format_arn(service='ec2', resource='instance', resource_name=instance_id)
+                           for instance_id in instance_ids]
+            ))
+            statements.append(iam.PolicyStatement(
+                sid='AllowDescribeInstances', actions=['ec2:DescribeInstances'], resources=['*']
+            ))
+            if ec2_config.uses_kms and key is not None:
+                # Starting an instance with volumes encrypted by the stack key needs a grant for EBS.
+                statements.append(iam.PolicyStatement(
+                    sid='AllowStartEncryptedVolumes',
+                    actions=['kms:CreateGrant'],
+                    resources=[key.key_arn],
+                    conditions={'Bool': {'kms:GrantIsForAWSResource': 'true'}}
+                ))
+
+        if schedule_config.rds.action != 'none':
+            targets['rds'] = {
+                'action': schedule_config.rds.action,
+                'db_instance_id': rds_name,
+                'type': 'db.' + rds_config.type,
+                'scaled_down_type': 'db.' + schedule_config.rds.type if schedule_config.rds.type else None
+            }
+            statements.append(iam.PolicyStatement(
+                sid='AllowScaleDatabase',
+                actions=['rds:StartDBInstance', 'rds:StopDBInstance', 'rds:ModifyDBInstance',
+                         'rds:DescribeDBInstances'],
+                resources=[self.format_arn(service='rds', resource='db', resource_name=rds_name, sep=':')]
+            ))
+
+        if not targets:
+            return
+        scheduler_function = lambda_.Function(
+            self, 'SchedulerFunction',
+            function_name='-'.join([construct_id, 'scheduler'.replace(' ', '-')]),
+            description='Scales the app servers and database down outside working hours',
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            handler='index.handler',
+            # Byte code left by local runs would change the asset hash.
+            code=lambda_.Code.from_asset(FUNCTION_DIR, exclude=['__pycache__', '*.pyc']),
+            # Resizing waits for the instances to stop.
+            timeout=cdk.Duration.minutes(10)
+        )
+        for statement in statements:
+            scheduler_function.add_to_role_policy(statement)
+        for phase, expression in (('down', schedule_config.scale_down), ('up', schedule_config.scale_up)):
+            rule = events.Rule(
+                self, 'Scale{}Rule'.format(phase.title()),
+                rule_name='-'.join([construct_id, 'scale {}'.format(phase).replace(' ', '-')]),
+                description='Scale {} the app servers and database, {} UTC'.format(phase, expression),
+                schedule=self._cron(expression)
+            )
+            rule.add_target(events_targets.LambdaFunction(
+                scheduler_function, event=events.RuleTargetInput.from_object(dict(targets, phase=phase))
+            ))
+
+    @staticmethod
+    def _cron(expression: str) -> events.Schedule:
+        minute, hour, day, month, week_day = expression.split()
+        return events.Schedule.cron(
+            minute=minute, hour=hour, month=month,
+            day=None if day == '*' and week_day != '*' else day,
+            week_day=None if week_day == '*' else week_day
+        )
+
+    def _schedule_auto_scaling_group(self, schedule_config: ScheduleConfig, ec2_config: EC2Config,
+                                     auto_scaling_group_name: str) -> None:
+        fleet = ec2_config.fleet
+        for phase, expression, capacity in (
+                ('down', schedule_config.scale_down, (0, 0, 0)),
+                ('up', schedule_config.scale_up, (fleet.min_capacity, fleet.max_capacity, fleet.desired_capacity))):
+            min_size, max_size, desired_capacity = capacity
+            autoscaling.CfnScheduledAction(
+                self, 'Scale{}Action'.format(phase.title()),
+                auto_scaling_group_name=auto_scaling_group_name,
+                recurrence=expression,
+                min_size=min_size,
+                max_size=max_size,
+                desired_capacity=desired_capacity
+            )
@@ -3,17 +3,57 @@ from aws_cdk import (
     core as cdk
 )
 
+from utils.config import VPCConfig
+from utils.pinned_exports import pin_exports
+
+GATEWAY_ENDPOINT_SERVICES = {
+    's3': ec2.GatewayVpcEndpointAwsService.S3,
+    'dynamodb': ec2.GatewayVpcEndpointAwsService.DYNAMODB
+}
+
 
 class VPCStack(cdk.Stack):
-    def __init__(self, scope: cdk.Construct, construct_id: str, cidr: str, **kwargs) -> None:
+    def __init__(self, scope: cdk.Construct, construct_id: str, cidr: str, vpc_config: VPCConfig = None,
+                 **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
+        vpc_config = vpc_config or VPCConfig()
 
         public_subnet = ec2.SubnetConfiguration(subnet_type=ec2.SubnetType.PUBLIC, name='Public', cidr_mask=24)
         private_subnet = ec2.SubnetConfiguration(subnet_type=ec2.SubnetType.PRIVATE, name='Private', cidr_mask=24)
         isolated_subnet = ec2.SubnetConfiguration(subnet_type=ec2.SubnetType.ISOLATED, name='Isolated', cidr_mask=24)
-        self.vpc = ec2.Vpc(self, 'VPC', cidr=cidr, max_azs=2,
+        nat_gateway_provider = None
+        if vpc_config.nat_provider == 'instance':
+            nat_gateway_provider = ec2.NatProvider.instance(
+                instance_type=ec2.InstanceType(vpc_config.nat_instance_type),
+                # Without a pinned AMI the latest amzn-ami-vpc-nat image is looked up in EC2 at synth time.
+                machine_image=ec2.MachineImage.generic_linux({self.region: vpc_config.nat_instance_ami})
+                if vpc_config.nat_instance_ami else None
+            )
+        self.vpc = ec2.Vpc(self, 'VPC', cidr=cidr, max_azs=vpc_config.max_azs,
+                           nat_gateways=vpc_config.nat_gateways,
+                           nat_gateway_provider=nat_gateway_provider,
                            enable_dns_hostnames=True, enable_dns_support=True,
                            subnet_configuration=[public_subnet, private_subnet, isolated_subnet]
                            )
 
+        for name in vpc_config.gateway_endpoints:
+            endpoint = self.vpc.add_gateway_endpoint(
+                name.title() + 'GatewayEndpoint', service=GATEWAY_ENDPOINT_SERVICES[name]
+            )
+            cdk.CfnOutput(
+                self, 'Output{}EndpointId'.format(name.title()),
+                export_name=construct_id.title().replace('-', '') + '{}EndpointId'.format(name.title()),
+                value=endpoint.vpc_endpoint_id
+            )
+        for name in vpc_config.interface_endpoints:
+            self.vpc.add_interface_endpoint(
+                name.title() + 'InterfaceEndpoint',
+                service=ec2.InterfaceVpcEndpointAwsService(name, prefix=vpc_config.interface_endpoint_prefix),
+                private_dns_enabled=True,
+                subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE, one_per_az=True)
+            )
+
         cdk.CfnOutput(self, 'OutputVpc', export_name=construct_id.title().replace('-', ''), value=self.vpc.vpc_id)
+        # Every value another stack may take from the VPC, so the template does not depend on which stacks are built.
+        subnets = self.vpc.public_subnets + self.vpc.private_subnets + self.vpc.isolated_subnets
+        pin_exports(self, [self.vpc.vpc_id, self.vpc.vpc_cidr_block] + [subnet.subnet_id for subnet in subnets])
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import argparse
+import copy
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.config import CONFIG_PATH, Config, ConfigError, build_config, load_config, load_yaml
+
+DEFAULT_OUTDIR = 'cdk.out.environments'
+
+
+def load_configs(config_paths: list, environments: list, base_config_path: str = CONFIG_PATH) -> list:
+    # Every config is parsed here, so a broken one fails before any worker process is started.
+    configs = [load_config(path) for path in config_paths]
+    for environment in environments:
+        data = copy.deepcopy(load_yaml(base_config_path))
+        data['environment'] = environment.lower().replace(' ', '-')
+        data['aws_tags'] = dict(data.get('aws_tags') or {}, environment=environment)
+        configs.append(build_config(data))
+    return configs
+
+
+def synth_environment(config: Config, outdir: str, offline: bool) -> tuple:
+    start = time.perf_counter()
+    from aws_cdk import core as cdk
+    from app import build_app
+
+    context = {'offline': 'true'} if offline else {}
+    build_app(config, cdk.App(outdir=outdir, context=context)).synth()
+    return config.app.environment, outdir, time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Synthesize several environments in parallel worker processes.')
+    parser.add_argument('--config', dest='configs', action='append', default=[],
+                        help='path of a rendered config.yaml, can be repeated')
+    parser.add_argument('--environments', nargs='+', default=[],
+                        help='environment names applied on top of the base config.yaml')
+    parser.add_argument('--base-config', default=CONFIG_PATH, help='config used with --environments')
+    parser.add_argument('--outdir', default=DEFAULT_OUTDIR, help='parent directory of the cloud assemblies')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--offline', action='store_true', help='do not call AWS while synthesizing')
+    args = parser.parse_args(argv)
+
+    try:
+        configs = load_configs(args.configs, args.environments, args.base_config)
+    except (ConfigError, OSError) as error:
+        parser.error(str(error))
+    if not configs:
+        parser.error('at least one --config or --environments value is required')
+    names = ['-'.join([config.app.project, config.app.environment]) for config in configs]
+    if len(set(names)) != len(names):
+        parser.error('environments must be unique, got: {}'.format(', '.join(names)))
+
+    start = time.perf_counter()
+    failures = 0
+    # jsii starts a node runtime per process, so workers are spawned rather than forked.
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(configs)),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {
+            executor.submit(synth_environment, config, os.path.join(args.outdir, name), args.offline): name
+            for name, config in zip(names, configs)
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                _, outdir, seconds = future.result()
+                print('{:<40} {:>8.2f}s  {}'.format(name, seconds, outdir))
+            except Exception as error:
+                failures += 1
+                print('{:<40} {:>9}  {}'.format(name, 'FAILED', error), file=sys.stderr)
+    print('{:<40} {:>8.2f}s'.format('total', time.perf_counter() - start))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SNAPSHOTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots')
+STUB_ACCOUNT = '123456789012'
+STUB_KEYPAIR_NAME = 'demo-test-key'
+STUB_ZONES = ['cn-northwest-1a', 'cn-northwest-1b', 'cn-northwest-1c']
+SYNTH_TIMINGS = {}
+
+sys.path.insert(0, ROOT_DIR)
+
+
+class StubKeypairResolver(object):
+    # The real resolver calls EC2 and puts the current date in the name, both of which would break snapshots.
+    def resolve(self, keypair_name: str, aws_tags: list, environment: str = None) -> str:
+        return STUB_KEYPAIR_NAME
+
+
+def pytest_addoption(parser):
+    parser.addoption('--synth-timings', metavar='PATH', help='write the synth time of every test to a JSON file')
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not SYNTH_TIMINGS:
+        return
+    terminalreporter.write_sep('-', 'synth time per test')
+    for nodeid, seconds in sorted(SYNTH_TIMINGS.items(), key=lambda item: item[1], reverse=True):
+        terminalreporter.write_line('{:>8.3f}s  {}'.format(seconds, nodeid))
+    path = config.getoption('--synth-timings')
+    if path:
+        with open(path, 'w', encoding='UTF-8') as file:
+            json.dump(SYNTH_TIMINGS, file, indent=2, sort_keys=True)
+
+
+@pytest.fixture(scope='session')
+def stub_environment():
+    previous = {name: os.environ.get(name) for name in ('CDK_DEFAULT_ACCOUNT', 'AWS_DEFAULT_REGION', 'CDK_OFFLINE')}
+    os.environ.update(CDK_DEFAULT_ACCOUNT=STUB_ACCOUNT, AWS_DEFAULT_REGION='cn-northwest-1', CDK_OFFLINE='1')
+    yield
+    for name, value in previous.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+@pytest.fixture(scope='session')
+def config(stub_environment):
+    from utils.config import build_config, load_yaml
+
+    return build_config(load_yaml(os.path.join(FIXTURES_DIR, 'config.yaml')),
+                        ec2_path=os.path.join(FIXTURES_DIR, 'ec2_config.yaml'),
+                        rds_path=os.path.join(FIXTURES_DIR, 'rds_config.yaml'))
+
+
+@pytest.fixture(scope='session')
+def assembly(config, tmp_path_factory):
+    cdk = pytest.importorskip('aws_cdk.core')
+    from app import build_app
+
+    # Every stack comes from one synth of the whole app, the way `cdk synth` builds them.
+    start = time.perf_counter()
+    app = cdk.App(outdir=str(tmp_path_factory.mktemp('cdk.out')), analytics_reporting=False, context={
+        'availability-zones:account={}:region={}'.format(STUB_ACCOUNT, config.app.aws_region): STUB_ZONES
+    })
+    build_app(config, app, keypair_resolver=StubKeypairResolver())
+    cloud_assembly = app.synth()
+    SYNTH_TIMINGS['app'] = time.perf_counter() - start
+    return cloud_assembly
+
+
+@pytest.fixture
+def synth(request, config, assembly):
+    def synth_stack(name: str) -> dict:
+        start = time.perf_counter()
+        stack_name = '-'.join([config.app.project, config.app.environment, name])
+        template = assembly.get_stack_by_name(stack_name).template
+        SYNTH_TIMINGS[request.node.nodeid] = time.perf_counter() - start
+        return template
+
+    return synth_stack
+
+
+@pytest.fixture
+def snapshot():
+    def assert_matches(name: str, template: dict) -> None:
+        path = os.path.join(SNAPSHOTS_DIR, name + '.template.json')
+        if os.getenv('UPDATE_SNAPSHOTS'):
+            os.makedirs(SNAPSHOTS_DIR, exist_ok=True)
+            with open(path, 'w', encoding='UTF-8') as file:
+                json.dump(template, file, indent=1, sort_keys=True)
+                file.write('\n')
+        if not os.path.exists(path):
+            pytest.fail('{} is missing, run with UPDATE_SNAPSHOTS=1 to record it'.format(
+                os.path.relpath(path, ROOT_DIR)))
+        with open(path, 'r', encoding='UTF-8') as file:
+            expected = json.load(file)
+        assert template == expected, 'template differs from {}, rerun with UPDATE_SNAPSHOTS=1 if intended'.format(
+            os.path.relpath(path, ROOT_DIR))
+
+    return assert_matches
+
+
+@pytest.fixture
+def resources():
+    def of_type(template: dict, resource_type: str) -> dict:
+        return {logical_id: resource for logical_id, resource in template.get('Resources', {}).items()
+                if resource['Type'] == resource_type}
+
+    return of_type
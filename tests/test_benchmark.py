@@ -0,0 +1,48 @@
+from benchmark import compare, summarize
+
+
+def report(imports: dict = None, construct: dict = None, **totals) -> dict:
+    return dict({
+        'imports': dict({'aws_cdk.core': 1.0, 'app': 0.5}, **(imports or {})),
+        'construct': dict({'demo-test-vpc': 0.25, 'demo-test-ec2': 0.5}, **(construct or {})),
+        'construct_total': 1.0,
+        'synth': 2.0
+    }, **totals)
+
+
+def test_timings_within_the_threshold_pass():
+    baseline = report()
+
+    assert compare(report(), baseline, 0.2) == []
+    # The threshold itself is still allowed, only a slowdown beyond it fails.
+    assert compare(report({'aws_cdk.core': 1.2}, {'demo-test-ec2': 0.6}, synth=2.4), baseline, 0.2) == []
+    assert compare(report(synth=0.5), baseline, 0.2) == []
+
+
+def test_slowdowns_beyond_the_threshold_are_regressions():
+    regressions = compare(report({'aws_cdk.core': 1.3}, {'demo-test-ec2': 0.75}, synth=2.5),
+                          report(), 0.2)
+
+    assert regressions == [('imports.aws_cdk.core', 1.0, 1.3), ('construct.demo-test-ec2', 0.5, 0.75),
+                           ('synth', 2.0, 2.5)]
+    assert compare(report(synth=2.5), report(), 0.3) == []
+
+
+def test_metrics_missing_from_the_baseline_are_not_compared():
+    baseline = report()
+    del baseline['construct']['demo-test-ec2']
+    baseline['imports']['app'] = 0
+
+    assert compare(report({'app': 5.0}, {'demo-test-ec2': 5.0}), baseline, 0.2) == []
+    assert compare(report(synth=5.0), {}, 0.2) == []
+
+
+def test_summary_takes_the_median_of_the_runs():
+    runs = [
+        {'construct': {'demo-test-vpc': seconds}, 'construct_total': seconds, 'synth': seconds * 2,
+         'template_bytes': {'demo-test-vpc': int(seconds * 100)}}
+        for seconds in (0.3, 0.1, 0.2)
+    ]
+
+    assert summarize(runs) == {'construct': {'demo-test-vpc': 0.2}, 'construct_total': 0.2, 'synth': 0.4,
+                               'template_bytes': {'demo-test-vpc': 20}}
@@ -0,0 +1,31 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.cache import JsonFileCache
+
+
+def write_entries(path: str, writer: int) -> None:
+    cache = JsonFileCache(path)
+    for index in range(50):
+        cache.set('writer-{}'.format(writer), index)
+
+
+def test_processes_sharing_the_cache_never_leave_a_broken_file(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        for result in [executor.submit(write_entries, path, writer) for writer in range(4)]:
+            result.result()
+
+    with open(path, 'r', encoding='UTF-8') as file:
+        entries = json.load(file)
+    assert entries and all(entry['value'] in range(50) for entry in entries.values())
+    assert os.listdir(str(tmp_path)) == ['cache.json']
+
+
+def test_expired_entries_are_only_returned_on_request(tmp_path):
+    cache = JsonFileCache(str(tmp_path / 'cache.json'), ttl=-1)
+    cache.set('key', 'value')
+
+    assert cache.get('key') is None
+    assert cache.get('key', include_expired=True) == 'value'
@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip('aws_cdk.core')
+
+
+def build(config, tmp_path, cache_config):
+    from dataclasses import replace
+
+    from aws_cdk import core as cdk
+
+    from app import build_app
+    from tests.conftest import STUB_ZONES, StubKeypairResolver
+
+    app = cdk.App(outdir=str(tmp_path), analytics_reporting=False, context={
+        'stacks': 'cache',
+        'availability-zones:account=123456789012:region=cn-northwest-1': STUB_ZONES
+    })
+    build_app(replace(config, app=replace(config.app, cache=cache_config)), app,
+              keypair_resolver=StubKeypairResolver())
+    return app.synth()
+
+
+def test_cache_stack_matches_snapshot(synth, snapshot, resources, config):
+    template = synth('cache')
+
+    replication_group = next(iter(resources(template, 'AWS::ElastiCache::ReplicationGroup').values()))
+    assert replication_group['Properties']['Engine'] == 'redis'
+    assert replication_group['Properties']['NumCacheClusters'] == 1 + config.app.cache.replicas
+    assert replication_group['Properties']['AutomaticFailoverEnabled'] is True
+    ingress = next(iter(resources(template, 'AWS::EC2::SecurityGroupIngress').values()))
+    assert ingress['Properties']['SourceSecurityGroupId'] == {'Fn::ImportValue': 'DemoTestEc2SecurityGroupId'}
+    assert template['Outputs']['OutputCacheEndpointAddress']['Export']['Name'] == 'DemoTestCacheEndpointAddress'
+    snapshot('cache', template)
+
+
+def test_cache_uses_the_isolated_subnets(config, tmp_path, resources):
+    assembly = build(config, tmp_path, config.app.cache)
+    vpc_template = assembly.get_stack_by_name('demo-test-vpc').template
+    isolated_subnets = sorted(logical_id for logical_id in resources(vpc_template, 'AWS::EC2::Subnet')
+                              if logical_id.startswith('VPCIsolated'))
+    subnet_group = next(iter(resources(assembly.get_stack_by_name('demo-test-cache').template,
+                                       'AWS::ElastiCache::SubnetGroup').values()))
+
+    imported = subnet_group['Properties']['SubnetIds']
+    assert len(imported) == len(isolated_subnets) == 2
+    assert all(isolated_subnet in subnet_id['Fn::ImportValue']
+               for isolated_subnet, subnet_id in zip(isolated_subnets, imported))
+
+
+def test_single_node_cache_has_no_failover(config, tmp_path, resources):
+    from dataclasses import replace
+
+    template = build(config, tmp_path, replace(config.app.cache, replicas=0)).get_stack_by_name(
+        'demo-test-cache').template
+
+    replication_group = next(iter(resources(template, 'AWS::ElastiCache::ReplicationGroup').values()))
+    assert replication_group['Properties']['NumCacheClusters'] == 1
+    assert replication_group['Properties']['AutomaticFailoverEnabled'] is False
+    assert replication_group['Properties']['MultiAZEnabled'] is False
+
+
+def test_disabled_cache_adds_no_stack(config, tmp_path):
+    from dataclasses import replace
+
+    assembly = build(config, tmp_path, replace(config.app.cache, enabled=False))
+
+    assert 'demo-test-cache' not in [stack.stack_name for stack in assembly.stacks]
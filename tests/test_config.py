@@ -0,0 +1,208 @@
+import copy
+import os
+
+import pytest
+
+from tests.conftest import FIXTURES_DIR
+from utils.config import ConfigError, load_yaml, parse_app_config, parse_ec2_config, parse_rds_config
+
+
+def fixture_data(name: str, changes: dict = None) -> dict:
+    data = copy.deepcopy(load_yaml(os.path.join(FIXTURES_DIR, name)))
+    for path, value in (changes or {}).items():
+        *parents, key = path.split('.')
+        target = data
+        for parent in parents:
+            target = target[int(parent)] if isinstance(target, list) else target.setdefault(parent, {})
+        target[int(key) if isinstance(target, list) else key] = value
+    return data
+
+
+def rds_data(**overrides) -> dict:
+    return fixture_data('rds_config.yaml', overrides)
+
+
+def parse_ec2(changes: dict):
+    return parse_ec2_config(fixture_data('ec2_config.yaml', changes))
+
+
+def parse_rds(changes: dict):
+    return parse_rds_config(fixture_data('rds_config.yaml', changes))
+
+
+def parse_app(changes: dict, ec2_changes: dict = None, rds_changes: dict = None):
+    return parse_app_config(fixture_data('config.yaml', changes), ec2_config=parse_ec2(ec2_changes),
+                            rds_config=parse_rds(rds_changes))
+
+
+# Each rule with a change that passes it and one that breaks it, applied to the fixture configs.
+RULES = [
+    # ec2_config.yaml
+    ('ami', parse_ec2, {'ami': 'ami-0123456789abcdef0'}, {'ami': 'ami-xyz'}, 'ami: .* is not an AMI id'),
+    ('inbound cidr', parse_ec2, {'inbounds.0.ip': '10.0.0.0/8'}, {'inbounds.0.ip': '10.0.0.300/32'},
+     r'inbounds\[0\].ip: .* is not a valid IPv4 CIDR'),
+    ('inbound description', parse_ec2, {'inbounds.0.description': 'office'}, {'inbounds.0.description': None},
+     r'inbounds\[0\].description: is required'),
+    ('port range order', parse_ec2, {'inbounds.0.port': ['1000-2000']}, {'inbounds.0.port': ['2000-1000']},
+     r'port\[0\]: .* is not a valid port range'),
+    ('port range bounds', parse_ec2, {'inbounds.0.port': [65535]}, {'inbounds.0.port': [65536]},
+     r'port\[0\]: .* is not a valid port range'),
+    ('port syntax', parse_ec2, {'inbounds.0.port': ['0 - 65535']}, {'inbounds.0.port': ['http']},
+     r'port\[0\]: .* is not a port or a from-to port range'),
+    ('ports listed', parse_ec2, {'inbounds.0.port': [80]}, {'inbounds.0.port': []},
+     'expected a non-empty list of ports'),
+    ('instance type', parse_ec2, {'type': {'min_vcpu': 2, 'min_memory_gib': 8}}, {'type': 'nonsense'}, 'type: '),
+    ('ebs optimized', parse_ec2, {'type': 'm5.large', 'ebs_optimized': True}, {'ebs_optimized': True},
+     'ebs_optimized: t2.xlarge does not support EBS optimization'),
+    ('instance store', parse_ec2, {'type': 'm5d.large', 'instance_store': True}, {'instance_store': True},
+     'instance_store: t2.xlarge has no instance store volumes'),
+    ('instance store names', parse_ec2, {'type': 'm5d.large', 'instance_store': True, 'block_devices.1.name': 'xvdf'},
+     {'type': 'm5d.large', 'instance_store': True, 'block_devices.1.name': 'xvdca'}, 'xvdca to xvdcz are kept'),
+    ('device names', parse_ec2, {'block_devices.1.name': 'xvdg'}, {'block_devices.1.name': '/dev/sda1'},
+     'device names must be unique'),
+    ('gp2 size', parse_ec2, {'block_devices.1.size': 16384}, {'block_devices.1.size': 16385},
+     r'block_devices\[1\].size: 16385 is outside 1-16384'),
+    ('integral size', parse_ec2, {'block_devices.1.size': 1400.0}, {'block_devices.1.size': 1400.5},
+     'size: expected an integer, got 1400.5'),
+    ('gp2 iops', parse_ec2, {'block_devices.1.iops': None}, {'block_devices.1.iops': 3000},
+     'iops and throughput are not supported by gp2'),
+    ('st1 boot volume', parse_ec2, {'block_devices.1.volume_type': 'st1'}, {'block_devices.0.volume_type': 'st1'},
+     'st1 cannot be used as a boot volume'),
+    ('gp3 throughput', parse_ec2,
+     {'block_devices.1.volume_type': 'gp3', 'block_devices.1.iops': 4000, 'block_devices.1.throughput': 1000},
+     {'block_devices.1.volume_type': 'gp3', 'block_devices.1.iops': 3000, 'block_devices.1.throughput': 1000},
+     'gp3 throughput 1000 MiB/s exceeds a quarter of the iops'),
+    ('io1 iops ratio', parse_ec2, {'block_devices.1.volume_type': 'io1', 'block_devices.1.iops': 64000},
+     {'block_devices.1.volume_type': 'io1', 'block_devices.1.size': 100, 'block_devices.1.iops': 6000},
+     'io1 allows at most 50 iops per GiB'),
+    ('io1 throughput', parse_ec2, {'block_devices.1.volume_type': 'io2', 'block_devices.1.iops': 64000},
+     {'block_devices.1.volume_type': 'io2', 'block_devices.1.iops': 64000, 'block_devices.1.throughput': 500},
+     'throughput: is only supported by gp3'),
+    ('fleet capacity', parse_ec2, {'fleet.min_capacity': 2, 'fleet.desired_capacity': 2},
+     {'fleet.min_capacity': 3}, 'min_capacity 3 is greater than max_capacity 2'),
+    ('desired capacity', parse_ec2, {'fleet.desired_capacity': 2}, {'fleet.desired_capacity': 3},
+     'desired_capacity: 3 is outside min_capacity-max_capacity'),
+    ('fleet subnets', parse_ec2, {'fleet.subnets': ['private', 'isolated']}, {'fleet.subnets': ['dmz']},
+     'fleet.subnets: .dmz. is not one of'),
+    ('listener port', parse_ec2, {'fleet.load_balancer.enabled': True, 'fleet.load_balancer.listeners.0.port': 65535},
+     {'fleet.load_balancer.enabled': True, 'fleet.load_balancer.listeners.0.port': 0},
+     r'listeners\[0\].port: 0 is outside 1-65535'),
+    ('listener protocol', parse_ec2,
+     {'fleet.load_balancer.type': 'network', 'fleet.load_balancer.listeners.0.protocol': 'TCP_UDP'},
+     {'fleet.load_balancer.type': 'network'}, r'listeners\[0\].protocol: .HTTP. is not one of TCP, TLS'),
+    ('listener certificate', parse_ec2,
+     {'fleet.load_balancer.listeners.0.protocol': 'HTTPS',
+      'fleet.load_balancer.listeners.0.certificate_arn': 'arn:aws-cn:acm:cn-northwest-1:123456789012:certificate/1'},
+     {'fleet.load_balancer.listeners.0.protocol': 'HTTPS'}, 'certificate_arn: is required for HTTPS listeners'),
+    ('listeners when enabled', parse_ec2, {'fleet.load_balancer.enabled': True},
+     {'fleet.load_balancer.enabled': True, 'fleet.load_balancer.listeners': []},
+     'listeners: expected a non-empty list'),
+    ('auto scaling kms', parse_ec2, {'fleet.mode': 'auto_scaling', 'block_devices.1.encrypted': True},
+     {'fleet.mode': 'auto_scaling', 'block_devices.1.kms': True}, 'launch configurations cannot use the KMS stack key'),
+    ('security group rules', parse_ec2, {'security_group.max_rules': 1000}, {'security_group.max_rules': 1001},
+     'security_group.max_rules: 1001 is outside 1-1000'),
+    ('prefix list entries', parse_ec2, {'security_group.prefix_list_min_entries': 2},
+     {'security_group.prefix_list_min_entries': 1}, 'prefix_list_min_entries: 1 is outside 2-1000'),
+    # rds_config.yaml
+    ('rds port', parse_rds, {'rds_port': 1150}, {'rds_port': 1149}, 'rds_port: 1149 is outside 1150-65535'),
+    ('reserved rds port', parse_rds, {'rds_port': 1435}, {'rds_port': 1434}, 'rds_port: 1434 is reserved'),
+    ('storage minimum', parse_rds, {'storage': 20}, {'storage': 19}, 'storage: 19 is outside 20-16384'),
+    ('storage maximum', parse_rds, {'storage': 16384}, {'storage': 16385}, 'storage: 16385 is outside 20-16384'),
+    ('max storage', parse_rds, {'max_storage': 271}, {'max_storage': 270},
+     'max_storage: 270 must be greater than storage 270'),
+    ('backup window', parse_rds, {'backup_window': '23:50-00:20'}, {'backup_window': '25:00-01:00'},
+     'backup_window: .* is not a window such as 19:00-19:30'),
+    ('backup window length', parse_rds, {'backup_window': '19:00-19:30'}, {'backup_window': '19:00-19:29'},
+     'backup_window: .* must be at least 30 minutes long'),
+    ('backup retention', parse_rds, {'backup_retention_days': 35}, {'backup_retention_days': 36},
+     'backup_retention_days: 36 is outside 0-35'),
+    ('gp2 storage iops', parse_rds, {'storage_type': 'gp2'}, {'iops': 3000},
+     'iops and storage_throughput are not supported by gp2'),
+    ('io1 storage', parse_rds, {'storage_type': 'io1', 'storage': 100, 'iops': 1000},
+     {'storage_type': 'io1', 'storage': 99, 'iops': 1000}, 'storage: io1 needs at least 100 GiB'),
+    ('io1 iops', parse_rds, {'storage_type': 'io1', 'iops': 13500}, {'storage_type': 'io1', 'iops': 13501},
+     'iops: io1 iops must be 1-50 times the storage size'),
+    ('gp3 storage throughput', parse_rds, {'storage_type': 'gp3', 'iops': 12000, 'storage_throughput': 1000},
+     {'storage_type': 'gp3', 'storage_throughput': 1000}, 'gp3 throughput 1000 MiB/s exceeds a quarter of the iops'),
+    ('edition', parse_rds, {'edition': 'ee'}, {'edition': 'ex'}, 'edition: .ex. is not one of se, ee'),
+    ('monitoring interval', parse_rds, {'monitoring_interval': 60}, {'monitoring_interval': 2},
+     'monitoring_interval: 2 is not one of'),
+    ('performance insights retention', parse_rds, {'performance_insights.retention_days': 731},
+     {'performance_insights.retention_days': 30}, 'retention_days: 30 is not one of'),
+    ('read replica edition', parse_rds,
+     {'edition': 'ee', 'multi_az': True, 'engine_version': '15.00.4073.23.v1', 'read_replicas': [{'type': 'm5.large'}]},
+     {'edition': 'se', 'multi_az': True, 'engine_version': '15.00.4073.23.v1', 'read_replicas': [{'type': 'm5.large'}]},
+     'read_replicas: SQL Server read replicas need edition ee and multi_az'),
+    ('log exports', parse_rds, {'cloudwatch_logs_exports': ['error']}, {'cloudwatch_logs_exports': ['trace']},
+     'cloudwatch_logs_exports: .trace. is not one of agent, error'),
+    ('rds inbound cidr', parse_rds, {'inbounds.0.ip': '10.0.0.0/16'}, {'inbounds.0.ip': '10.0.0.0/33'},
+     r'inbounds\[0\].ip: .* is not a valid IPv4 CIDR'),
+    # config.yaml
+    ('vpc cidr', parse_app, {'vpc_cidr': '172.16.0.0/20'}, {'vpc_cidr': '10.5.0.0/33'},
+     'vpc_cidr: .* is not a valid IPv4 CIDR'),
+    ('vpc prefix length', parse_app, {'vpc_cidr': '10.5.0.0/16'}, {'vpc_cidr': '10.0.0.0/29'},
+     'vpc_cidr: prefix length /29 is outside /16-/28'),
+    ('vpc subnets fit', parse_app, {'vpc_cidr': '10.5.0.0/21'}, {'vpc_cidr': '10.5.0.0/21', 'vpc.max_azs': 3},
+     'vpc.max_azs: 9 /24 subnets do not fit in a /21 vpc_cidr'),
+    ('nat gateways', parse_app, {'vpc.nat_gateways': 2}, {'vpc.nat_gateways': 3}, 'vpc.nat_gateways: 3 is outside 1-2'),
+    ('nat instance ami', parse_app, {'vpc.nat_instance_ami': 'ami-0123456789abcdef0'},
+     {'vpc.nat_instance_ami': 'nat'}, 'vpc.nat_instance_ami: .nat. is not an AMI id'),
+    ('gateway endpoints', parse_app, {'vpc.gateway_endpoints': ['s3', 'dynamodb']},
+     {'vpc.gateway_endpoints': ['ec2']}, 'vpc.gateway_endpoints: .ec2. is not one of s3, dynamodb'),
+    ('interface endpoints', parse_app, {'vpc.interface_endpoints': ['ssm', 'logs']},
+     {'vpc.interface_endpoints': ['s3']}, 'vpc.interface_endpoints: .s3. is not one of'),
+    ('cache node type', parse_app, {'cache.node_type': 'cache.r6g.large'}, {'cache.node_type': 'r6g.large'},
+     'cache.node_type: .r6g.large. is not a node type'),
+    ('cache replicas', parse_app, {'cache.replicas': 5}, {'cache.replicas': 6}, 'cache.replicas: 6 is outside 0-5'),
+    ('cache port', parse_app, {'cache.port': 1024}, {'cache.port': 1023}, 'cache.port: 1023 is outside 1024-65535'),
+    ('cache subnets', parse_app, {'cache.subnets': 'private'}, {'cache.subnets': 'public'},
+     'cache.subnets: .public. is not one of private, isolated'),
+    ('alarm email', parse_app, {'monitoring.alarm_email': None}, {'monitoring.alarm_email': 'ops'},
+     'monitoring.alarm_email: .ops. is not an email address'),
+    ('disk queue length', parse_app, {'monitoring.disk_queue_length': 0.5}, {'monitoring.disk_queue_length': 0},
+     'monitoring.disk_queue_length: must be greater than 0'),
+    ('cpu percent', parse_app, {'monitoring.cpu_percent': 100}, {'monitoring.cpu_percent': 101},
+     'monitoring.cpu_percent: 101 is outside 1-100'),
+    ('cron fields', parse_app, {'schedule.scale_down': '30 11 * * SAT'}, {'schedule.scale_down': '0 12 * *'},
+     'schedule.scale_down: .* is not a cron expression'),
+    ('cron week day', parse_app, {'schedule.scale_down': '0 12 * * MON-FRI'}, {'schedule.scale_down': '0 12 * * 1-5'},
+     'schedule.scale_down: use day names'),
+    ('cron day of month', parse_app, {'schedule.scale_down': '0 12 1 * *'}, {'schedule.scale_down': '0 12 1 * MON'},
+     'schedule.scale_down: .* sets both the day of month and the week day'),
+    ('schedule times', parse_app, {'schedule.scale_up': '0 1 * * MON-FRI'}, {'schedule.scale_up': '0 12 * * MON-FRI'},
+     'schedule: scale_down and scale_up are both'),
+    ('schedule resize', parse_app, {'schedule.ec2.type': 't2.medium'}, {'schedule.ec2.type': 't2.2xlarge'},
+     'schedule.ec2.type: t2.2xlarge is not smaller than t2.xlarge'),
+    ('disabled schedule', parse_app, {'schedule.enabled': False, 'schedule.ec2.type': 't2.2xlarge'},
+     {'schedule.enabled': False, 'schedule.scale_down': 'never'}, 'schedule.scale_down: .* is not a cron expression'),
+]
+
+
+@pytest.mark.parametrize('parse, good, bad, message', [rule[1:] for rule in RULES], ids=[rule[0] for rule in RULES])
+def test_rule_accepts_the_good_value_and_rejects_the_bad_one(parse, good, bad, message):
+    parse(good)
+    with pytest.raises(ConfigError, match=message):
+        parse(bad)
+
+
+def test_schedule_rules_that_depend_on_the_stack_configs():
+    parse_app({}, rds_changes={'multi_az': False})
+    with pytest.raises(ConfigError, match='schedule.rds.action: SQL Server instances with multi_az'):
+        parse_app({}, rds_changes={'multi_az': True})
+    parse_app({'schedule.ec2.action': 'stop'}, ec2_changes={'fleet.mode': 'auto_scaling'})
+    with pytest.raises(ConfigError, match='schedule.ec2.action: auto_scaling fleets can only be stopped'):
+        parse_app({}, ec2_changes={'fleet.mode': 'auto_scaling'})
+
+
+def test_engine_version_must_be_a_sql_server_version():
+    assert parse_rds_config(rds_data(engine_version='15.00.4073.23.v1')).engine_major_version == '15.00'
+    with pytest.raises(ConfigError, match=r'engine_version: \'15.0\' is not a SQL Server version'):
+        parse_rds_config(rds_data(engine_version='15.0'))
+
+
+def test_read_replicas_need_sql_server_2016_or_later():
+    replicas = dict(edition='ee', multi_az=True, read_replicas=[{'type': 'm5.large'}])
+
+    assert len(parse_rds_config(rds_data(engine_version='13.00.6419.1.v1', **replicas)).read_replicas) == 1
+    with pytest.raises(ConfigError, match='read_replicas: SQL Server read replicas need engine_version 13.00 or later'):
+        parse_rds_config(rds_data(**replicas))
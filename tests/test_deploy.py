@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+
+import pytest
+
+from utils.deploy import (DeployError, LocalDeployer, Orchestrator, dependency_graph, external_imports, levels,
+                          read_assembly, select)
+
+GRAPH = {
+    'kms': set(), 's3': set(), 'vpc': set(),
+    'ec2': {'vpc', 's3'},
+    'rds': {'vpc', 'kms', 's3', 'ec2'},
+    'cache': {'vpc', 'ec2'},
+    'monitoring': {'ec2', 'rds'}
+}
+
+
+class ConcurrencyDeployer(LocalDeployer):
+    def __init__(self, delay: float):
+        super().__init__(delay=delay)
+        self.running = 0
+        self.max_running = 0
+        self._running_lock = threading.Lock()
+
+    def deploy(self, stack_name: str) -> None:
+        with self._running_lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            super().deploy(stack_name)
+        finally:
+            with self._running_lock:
+                self.running -= 1
+
+
+def orchestrator(deployer, **kwargs) -> Orchestrator:
+    return Orchestrator(deployer, retry_delay=0, log=lambda message: None, **kwargs)
+
+
+def test_assembly_deploys_producers_first_and_rds_after_ec2(assembly):
+    waves = [[name.split('-')[-1] for name in wave] for wave in levels(dependency_graph(read_assembly(
+        assembly.directory)))]
+
+    assert waves[0] == ['kms', 's3', 'vpc']
+    assert waves[1] == ['ec2']
+    assert 'rds' in waves[2]
+    assert waves[-1] == ['monitoring', 'schedule']
+
+
+def test_assembly_dependencies_come_from_imports_and_the_manifest(tmp_path):
+    templates = {
+        'demo-dev-vpc': {'Outputs': {'OutputVpcId': {'Value': 'vpc-1', 'Export': {'Name': 'DemoDevVpcVpcId'}}}},
+        's3': {'Outputs': {'OutputS3BucketName': {'Value': 'bucket', 'Export': {'Name': 'DemoDevS3BucketName'}}}},
+        'demo-dev-ec2': {'Resources': {'OperatingS3Policy': {'Type': 'AWS::IAM::ManagedPolicy', 'Properties': {
+            'Resource': [{'Fn::Join': ['', ['arn:aws-cn:s3:::', {'Fn::ImportValue': 'DemoDevS3BucketName'}]]},
+                         {'Fn::ImportValue': 'DemoDevKmsKeyArn'}]
+        }}}}
+    }
+    artifacts = {'Tree': {'type': 'cdk:tree', 'properties': {'file': 'tree.json'}}}
+    for artifact_id, template in templates.items():
+        (tmp_path / (artifact_id + '.template.json')).write_text(json.dumps(template))
+        artifacts[artifact_id] = {'type': 'aws:cloudformation:stack',
+                                  'properties': {'templateFile': artifact_id + '.template.json'}}
+    artifacts['s3']['properties']['stackName'] = 'demo-dev-s3'
+    artifacts['demo-dev-ec2']['dependencies'] = ['demo-dev-vpc', 'Tree']
+    (tmp_path / 'manifest.json').write_text(json.dumps({'version': '13.0.0', 'artifacts': artifacts}))
+
+    stacks = read_assembly(str(tmp_path))
+
+    assert dependency_graph(stacks) == {'demo-dev-vpc': set(), 'demo-dev-s3': set(),
+                                        'demo-dev-ec2': {'demo-dev-vpc', 'demo-dev-s3'}}
+    assert external_imports(stacks) == {'demo-dev-ec2': ['DemoDevKmsKeyArn']}
+
+
+def test_levels_reject_cycles():
+    with pytest.raises(DeployError, match='cycle'):
+        levels({'a': {'b'}, 'b': {'a'}, 'c': set()})
+
+
+def test_select_pulls_in_dependencies():
+    assert select(GRAPH, ['cache']) == {'cache': {'vpc', 'ec2'}, 'ec2': {'vpc', 's3'}, 'vpc': set(), 's3': set()}
+    with pytest.raises(DeployError, match='Unknown stack'):
+        select(GRAPH, ['web'])
+
+
+def test_dependencies_deploy_before_dependents():
+    deployer = LocalDeployer()
+    results = orchestrator(deployer).run(GRAPH)
+
+    assert all(result['status'] == 'deployed' for result in results.values())
+    for name, dependencies in GRAPH.items():
+        assert all(deployer.deployed.index(dependency) < deployer.deployed.index(name) for dependency in dependencies)
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_concurrency_is_bounded(max_workers):
+    deployer = ConcurrencyDeployer(delay=0.05)
+    start = time.perf_counter()
+    orchestrator(deployer, max_workers=max_workers).run({'a': set(), 'b': set(), 'c': set(), 'd': set()})
+
+    assert deployer.max_running == max_workers
+    assert time.perf_counter() - start >= 0.05 * 4 / max_workers
+
+
+def test_failed_attempts_are_retried():
+    deployer = LocalDeployer(failures={'ec2': 2})
+    results = orchestrator(deployer, retries=2).run(GRAPH)
+
+    assert results['ec2']['status'] == 'deployed'
+    assert results['monitoring']['status'] == 'deployed'
+
+
+def test_failure_skips_dependents_only():
+    deployer = LocalDeployer(failures={'ec2': 3})
+    results = orchestrator(deployer, retries=2).run(GRAPH)
+
+    assert results['ec2'] == {'status': 'failed', 'error': 'ec2 failed'}
+    assert {name for name, result in results.items() if result['status'] == 'skipped'} == {'rds', 'cache',
+                                                                                         'monitoring'}
+    assert results['monitoring']['error'] in ('depends on ec2', 'depends on rds')
+    assert sorted(deployer.deployed) == ['kms', 's3', 'vpc']
@@ -0,0 +1,142 @@
+import os
+
+import pytest
+import yaml
+
+pytest.importorskip('aws_cdk.core')
+
+from tests.conftest import STUB_KEYPAIR_NAME  # noqa: E402
+
+
+def test_ec2_stack_matches_snapshot(synth, snapshot, resources):
+    template = synth('ec2')
+
+    instances = resources(template, 'AWS::EC2::Instance')
+    assert len(instances) == 1
+    assert next(iter(instances.values()))['Properties']['KeyName'] == STUB_KEYPAIR_NAME
+    security_group = next(resource for logical_id, resource in resources(template, 'AWS::EC2::SecurityGroup').items()
+                          if logical_id.startswith('AppSecurityGroup'))
+    # 9 requested rules in the fixture collapse to 4.
+    assert len(security_group['Properties']['SecurityGroupIngress']) == 4
+    policy = next(iter(resources(template, 'AWS::IAM::ManagedPolicy').values()))
+    assert len(policy['Properties']['PolicyDocument']['Statement']) == 1
+    parameter = next(iter(resources(template, 'AWS::SSM::Parameter').values()))
+    assert parameter['Properties']['Name'] == 'AmazonCloudWatch-demo-test-ec2'
+    user_data = next(iter(instances.values()))['Properties']['UserData']['Fn::Base64']
+    assert 'amazoncloudwatch-agent-cn-northwest-1' in user_data
+    assert '-a fetch-config -m ec2 -c ssm:AmazonCloudWatch-demo-test-ec2 -s' in user_data
+    role = next(iter(resources(template, 'AWS::IAM::Role').values()))
+    assert 'AmazonSSMManagedInstanceCore' in str(role['Properties']['ManagedPolicyArns'])
+    snapshot('ec2', template)
+
+
+def test_internal_load_balancer_only_admits_the_vpc(config, tmp_path, resources):
+    from dataclasses import replace
+
+    from aws_cdk import core as cdk
+
+    from app import build_app
+    from tests.conftest import STUB_ZONES, StubKeypairResolver
+    from utils.config import ListenerConfig, LoadBalancerConfig
+
+    load_balancer = LoadBalancerConfig(enabled=True, internet_facing=False,
+                                       listeners=[ListenerConfig(port=80, protocol='HTTP', target_port=8080)])
+    internal = replace(config, ec2=replace(config.ec2, fleet=replace(config.ec2.fleet, load_balancer=load_balancer)))
+    app = cdk.App(outdir=str(tmp_path), analytics_reporting=False, context={
+        'stacks': 'ec2',
+        'availability-zones:account=123456789012:region=cn-northwest-1': STUB_ZONES
+    })
+    build_app(internal, app, keypair_resolver=StubKeypairResolver())
+    template = app.synth().get_stack_by_name('demo-test-ec2').template
+
+    security_group = next(resource for logical_id, resource in resources(template, 'AWS::EC2::SecurityGroup').items()
+                          if logical_id.startswith('AppLoadBalancerSecurityGroup'))
+    ingress = security_group['Properties']['SecurityGroupIngress']
+    assert [rule['FromPort'] for rule in ingress] == [80]
+    assert ingress[0]['CidrIp'] != '0.0.0.0/0'
+
+
+def test_instance_type_outside_the_catalog_is_used_as_is(tmp_path, resources):
+    from aws_cdk import core as cdk
+
+    from app import build_app
+    from tests.conftest import FIXTURES_DIR, STUB_ZONES, StubKeypairResolver
+    from utils.config import ConfigError, build_config, load_yaml, parse_ec2_config
+
+    ec2_data = load_yaml(os.path.join(FIXTURES_DIR, 'ec2_config.yaml'))
+    with pytest.raises(ConfigError, match='no size'):
+        parse_ec2_config(dict(ec2_data, type='m5.huge'))
+    ec2_path = tmp_path / 'ec2_config.yaml'
+    ec2_path.write_text(yaml.safe_dump(dict(ec2_data, type='m6a.large')), encoding='UTF-8')
+    config = build_config(load_yaml(os.path.join(FIXTURES_DIR, 'config.yaml')), ec2_path=str(ec2_path),
+                          rds_path=os.path.join(FIXTURES_DIR, 'rds_config.yaml'))
+    app = cdk.App(outdir=str(tmp_path / 'cdk.out'), analytics_reporting=False, context={
+        'stacks': 'ec2',
+        'availability-zones:account=123456789012:region=cn-northwest-1': STUB_ZONES
+    })
+    build_app(config, app, keypair_resolver=StubKeypairResolver())
+    template = app.synth().get_stack_by_name('demo-test-ec2').template
+
+    instance = next(iter(resources(template, 'AWS::EC2::Instance').values()))
+    assert instance['Properties']['InstanceType'] == 'm6a.large'
+
+
+def test_instance_store_volumes_are_mapped(config, tmp_path, resources):
+    from dataclasses import replace
+
+    from aws_cdk import core as cdk
+
+    from app import build_app
+    from tests.conftest import FIXTURES_DIR, STUB_ZONES, StubKeypairResolver
+    from utils.config import ConfigError, load_yaml, parse_ec2_config
+
+    ec2_data = load_yaml(os.path.join(FIXTURES_DIR, 'ec2_config.yaml'))
+    with pytest.raises(ConfigError, match='no instance store'):
+        parse_ec2_config(dict(ec2_data, instance_store=True))
+    ec2_config = parse_ec2_config(dict(ec2_data, type='x1e.32xlarge', instance_store=True))
+    assert ec2_config.instance_store_devices == ['xvdca', 'xvdcb']
+    app = cdk.App(outdir=str(tmp_path), analytics_reporting=False, context={
+        'stacks': 'ec2',
+        'availability-zones:account=123456789012:region=cn-northwest-1': STUB_ZONES
+    })
+    build_app(replace(config, ec2=ec2_config), app, keypair_resolver=StubKeypairResolver())
+    template = app.synth().get_stack_by_name('demo-test-ec2').template
+
+    mappings = next(iter(resources(template, 'AWS::EC2::Instance').values()))['Properties']['BlockDeviceMappings']
+    assert [mapping['DeviceName'] for mapping in mappings] == ['/dev/sda1', 'xvdf', 'xvdca', 'xvdcb']
+    assert [mapping.get('VirtualName') for mapping in mappings[2:]] == ['ephemeral0', 'ephemeral1']
+
+
+@pytest.mark.parametrize('internet_facing', [False, True])
+def test_network_load_balancer_uses_the_certificate_and_admits_its_clients(config, tmp_path, resources,
+                                                                          internet_facing):
+    from dataclasses import replace
+
+    from aws_cdk import core as cdk
+
+    from app import build_app
+    from tests.conftest import STUB_ZONES, StubKeypairResolver
+    from utils.config import ListenerConfig, LoadBalancerConfig
+
+    certificate_arn = 'arn:aws-cn:acm:cn-northwest-1:123456789012:certificate/0a1b2c3d'
+    load_balancer = LoadBalancerConfig(enabled=True, type='network', internet_facing=internet_facing, listeners=[
+        ListenerConfig(port=443, protocol='TLS', target_port=8443, certificate_arn=certificate_arn)
+    ])
+    network = replace(config, ec2=replace(config.ec2, fleet=replace(config.ec2.fleet, load_balancer=load_balancer)))
+    app = cdk.App(outdir=str(tmp_path), analytics_reporting=False, context={
+        'stacks': 'ec2',
+        'availability-zones:account=123456789012:region=cn-northwest-1': STUB_ZONES
+    })
+    build_app(network, app, keypair_resolver=StubKeypairResolver())
+    template = app.synth().get_stack_by_name('demo-test-ec2').template
+
+    listener = next(iter(resources(template, 'AWS::ElasticLoadBalancingV2::Listener').values()))
+    assert listener['Properties']['Certificates'] == [{'CertificateArn': certificate_arn}]
+    security_group = next(resource for logical_id, resource in resources(template, 'AWS::EC2::SecurityGroup').items()
+                          if logical_id.startswith('AppSecurityGroup'))
+    [rule] = [rule for rule in security_group['Properties']['SecurityGroupIngress'] if rule['FromPort'] == 8443]
+    assert rule['IpProtocol'] == 'tcp'
+    if internet_facing:
+        assert rule['CidrIp'] == '0.0.0.0/0'
+    else:
+        assert 'CidrBlock' in rule['CidrIp']['Fn::ImportValue']
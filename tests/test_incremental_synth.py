@@ -0,0 +1,55 @@
+import json
+import os
+from dataclasses import replace
+
+import pytest
+
+pytest.importorskip('aws_cdk.core')
+
+from aws_cdk import core as cdk  # noqa: E402
+
+from app import build_app  # noqa: E402
+from tests.conftest import STUB_ACCOUNT, STUB_ZONES, StubKeypairResolver  # noqa: E402
+from utils.incremental_synth import IncrementalSynth, TemplateCache  # noqa: E402
+
+
+def stub_synth(config, outdir: str, stack_names: list) -> None:
+    context = {'availability-zones:account={}:region={}'.format(STUB_ACCOUNT, config.app.aws_region): STUB_ZONES}
+    if stack_names:
+        context['stacks'] = ','.join(stack_names)
+    build_app(config, cdk.App(outdir=outdir, analytics_reporting=False, context=context),
+              keypair_resolver=StubKeypairResolver()).synth()
+
+
+def read_template(outdir, name: str) -> dict:
+    with open(os.path.join(str(outdir), 'demo-test-{}.template.json'.format(name)), 'r', encoding='UTF-8') as file:
+        return json.load(file)
+
+
+def run(config, tmp_path) -> dict:
+    return IncrementalSynth(config, outdir=str(tmp_path / 'cdk.out'), cache=TemplateCache(str(tmp_path / 'cache')),
+                            synth=stub_synth, log=lambda message: None).run()
+
+
+def test_editing_a_consumer_keeps_the_producer_exports(config, tmp_path):
+    run(config, tmp_path)
+    full_vpc = read_template(tmp_path / 'cdk.out', 'vpc')
+
+    edited = replace(config, ec2=replace(config.ec2, ami='ami-0123456789abcdef0'))
+    result = run(edited, tmp_path)
+
+    assert 'ec2' in result['synthesized']
+    assert {'vpc', 'kms'} <= set(result['reused'])
+    assert read_template(tmp_path / 'cdk.out', 'vpc') == full_vpc
+    assert run(edited, tmp_path)['synthesized'] == ['schedule']
+    assert read_template(tmp_path / 'cdk.out', 'vpc') == full_vpc
+
+
+def test_editing_a_producer_rebuilds_its_consumers(config, tmp_path):
+    run(config, tmp_path)
+
+    edited = replace(config, app=replace(config.app, vpc=replace(config.app.vpc, nat_gateways=2)))
+    result = run(edited, tmp_path)
+
+    assert {'vpc', 'ec2', 'rds', 'cache'} <= set(result['synthesized'])
+    assert 'kms' in result['reused']
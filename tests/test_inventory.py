@@ -0,0 +1,127 @@
+import pytest
+
+pytest.importorskip('boto3')
+
+import boto3  # noqa: E402
+from botocore.stub import Stubber  # noqa: E402
+
+from utils.cache import JsonFileCache  # noqa: E402
+from utils.inventory import ClientPool, Inventory, describe_instances, group_exports, list_exports  # noqa: E402
+
+REGION = 'cn-northwest-1'
+
+
+def stack_id(stack_name: str) -> str:
+    return 'arn:aws-cn:cloudformation:{}:123456789012:stack/{}/0a1b2c3d'.format(REGION, stack_name)
+
+
+def export(stack_name: str, output: str, value: str) -> dict:
+    return {'ExportingStackId': stack_id(stack_name), 'Name': stack_name.title().replace('-', '') + output,
+            'Value': value}
+
+
+EXPORTS = [
+    export('demo-dev-ec2', 'InstanceId', 'i-0123456789abcdef0'),
+    export('demo-dev-ec2', 'InstanceId2', 'i-0fedcba9876543210'),
+    export('demo-dev-ec2', 'SecurityGroupId', 'sg-0123456789abcdef0'),
+    export('demo-dev-rds', 'EndpointAddress', 'demo-dev-rds.abc.rds.cn-northwest-1.amazonaws.com.cn'),
+    export('demo-dev-kms', 'KeyId', '1234abcd-12ab-34cd-56ef-1234567890ab'),
+    export('demo-uat-s3', 'BucketName', 'demo-uat-s3-bucket'),
+    {'ExportingStackId': stack_id('other'), 'Name': 'OtherInstanceId', 'Value': 'i-0000000000000000a'}
+]
+
+
+@pytest.fixture
+def session():
+    return boto3.session.Session(aws_access_key_id='testing', aws_secret_access_key='testing', region_name=REGION)
+
+
+@pytest.fixture
+def stubbers(session):
+    stubbers = {}
+
+    def client_factory(service, region):
+        client = session.client(service, region_name=region)
+        stubbers[service] = Stubber(client)
+        stubbers[service].activate()
+        return client
+
+    pool = ClientPool(session=session, client_factory=client_factory)
+    # Every client the inventory asks for is created up front, so the stubs can be queued before the calls.
+    for service in ('cloudformation', 'ec2', 'rds'):
+        pool.client(service, REGION)
+    yield pool, stubbers
+    for stubber in stubbers.values():
+        stubber.assert_no_pending_responses()
+
+
+def test_exports_are_grouped_per_environment():
+    environments = group_exports(EXPORTS, REGION)
+
+    assert sorted(environments) == ['demo-dev', 'demo-uat']
+    assert environments['demo-dev']['instance_ids'] == ['i-0123456789abcdef0', 'i-0fedcba9876543210']
+    assert environments['demo-dev']['rds_endpoints'] == ['demo-dev-rds.abc.rds.cn-northwest-1.amazonaws.com.cn']
+    assert environments['demo-dev']['kms_key_ids'] == ['1234abcd-12ab-34cd-56ef-1234567890ab']
+    assert environments['demo-dev']['buckets'] == []
+    assert environments['demo-uat']['buckets'] == ['demo-uat-s3-bucket']
+
+
+def test_exports_are_read_from_every_page(stubbers):
+    pool, stubs = stubbers
+    stubs['cloudformation'].add_response('list_exports', {'Exports': EXPORTS[:3], 'NextToken': 'page-2'}, {})
+    stubs['cloudformation'].add_response('list_exports', {'Exports': EXPORTS[3:]}, {'NextToken': 'page-2'})
+
+    assert list_exports(pool.client('cloudformation', REGION)) == EXPORTS
+
+
+def test_instances_are_described_in_batches_of_200(stubbers):
+    pool, stubs = stubbers
+    instance_ids = ['i-{:017x}'.format(index) for index in range(201)]
+    for batch in (instance_ids[:200], instance_ids[200:]):
+        stubs['ec2'].add_response('describe_instances', {'Reservations': [{'Instances': [
+            {'InstanceId': instance_id, 'State': {'Name': 'running'}, 'InstanceType': 't2.xlarge'}
+            for instance_id in batch
+        ]}]}, {'Filters': [{'Name': 'instance-id', 'Values': batch}]})
+
+    instances = describe_instances(pool.client('ec2', REGION), instance_ids + instance_ids[:5])
+
+    assert len(instances) == 201
+    assert instances[instance_ids[200]] == {'state': 'running', 'type': 't2.xlarge', 'key_name': None,
+                                            'private_ip': None, 'public_ip': None}
+
+
+def test_inventory_is_cached_per_region(stubbers, tmp_path):
+    pool, stubs = stubbers
+
+    def expect_region_calls():
+        stubs['cloudformation'].add_response('list_exports', {'Exports': EXPORTS}, {})
+        stubs['ec2'].add_response('describe_instances', {'Reservations': [{'Instances': [
+            {'InstanceId': 'i-0123456789abcdef0', 'State': {'Name': 'stopped'}, 'InstanceType': 't2.xlarge',
+             'KeyName': 'demo-dev-20260101-key', 'PrivateIpAddress': '10.5.2.10'}
+        ]}]}, {'Filters': [{'Name': 'instance-id', 'Values': ['i-0123456789abcdef0', 'i-0fedcba9876543210']}]})
+        stubs['rds'].add_response('describe_db_instances', {'DBInstances': [
+            {'DBInstanceIdentifier': 'demo-dev-rds', 'DBInstanceStatus': 'available', 'DBInstanceClass': 'db.m5.large',
+             'MultiAZ': False, 'AllocatedStorage': 270,
+             'Endpoint': {'Address': 'demo-dev-rds.abc.rds.cn-northwest-1.amazonaws.com.cn'}}
+        ]}, {'Filters': [{'Name': 'db-instance-id', 'Values': ['demo-dev-rds']}]})
+        stubs['ec2'].add_response('describe_key_pairs', {'KeyPairs': [
+            {'KeyName': 'demo-dev-20260101-key', 'KeyPairId': 'key-0123456789abcdef0'}
+        ]}, {'Filters': [{'Name': 'key-name', 'Values': ['demo-dev-20260101-key']}]})
+
+    cache = JsonFileCache(str(tmp_path / 'inventory.json'), ttl=300)
+    expect_region_calls()
+    environments = Inventory(pool, cache=cache).collect([REGION], prefix='demo-dev')
+
+    environment = environments['cn-northwest-1/demo-dev']
+    assert environment['instances']['i-0123456789abcdef0']['state'] == 'stopped'
+    assert environment['instances']['i-0fedcba9876543210'] == {'state': 'missing'}
+    assert environment['rds']['demo-dev-rds.abc.rds.cn-northwest-1.amazonaws.com.cn']['class'] == 'db.m5.large'
+    assert environment['key_pairs'] == {'demo-dev-20260101-key': {'key_pair_id': 'key-0123456789abcdef0',
+                                                                  'fingerprint': None}}
+    assert list(environments) == ['cn-northwest-1/demo-dev']
+
+    # No responses are queued, so any API call from here on would fail.
+    assert Inventory(pool, cache=cache).collect([REGION], prefix='demo-dev') == environments
+
+    expect_region_calls()
+    assert Inventory(pool, cache=cache, refresh=True).collect([REGION], prefix='demo-dev') == environments
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from utils.cache import JsonFileCache  # noqa: E402
+from utils.keypair import KeypairResolver  # noqa: E402
+
+
+class ExistingKeyPairs(object):
+    def __init__(self):
+        self.calls = []
+
+    def describe_key_pairs(self, KeyNames):
+        self.calls.append(KeyNames)
+        return {'KeyPairs': [{'KeyName': KeyNames[0]}]}
+
+
+def test_cached_key_pair_survives_the_date_changing(tmp_path):
+    client = ExistingKeyPairs()
+    cache = JsonFileCache(str(tmp_path / 'keypairs.json'))
+    resolver = KeypairResolver('123456789012', 'cn-northwest-1', cache=cache, client_factory=lambda region: client)
+
+    assert resolver.resolve('demo-dev-20260101-key', [], environment='demo-dev') == 'demo-dev-20260101-key'
+    assert resolver.resolve('demo-dev-20260102-key', [], environment='demo-dev') == 'demo-dev-20260101-key'
+    assert len(client.calls) == 1
+
+    offline = KeypairResolver('123456789012', 'cn-northwest-1', offline=True, cache=cache)
+    assert offline.resolve('demo-dev-20260109-key', [], environment='demo-dev') == 'demo-dev-20260101-key'
+    assert offline.resolve('demo-uat-20260109-key', [], environment='demo-uat') == 'demo-uat-20260109-key'
+
+
+def test_expired_key_pair_is_kept_while_it_exists(tmp_path):
+    client = ExistingKeyPairs()
+    path = tmp_path / 'keypairs.json'
+    cache_key = JsonFileCache.make_key('123456789012', 'cn-northwest-1', 'demo-dev')
+    path.write_text(json.dumps({cache_key: {'stored_at': 0, 'value': 'demo-dev-20260101-key'}}), encoding='UTF-8')
+    cache = JsonFileCache(str(path), ttl=7 * 24 * 60 * 60)
+
+    offline = KeypairResolver('123456789012', 'cn-northwest-1', offline=True, cache=cache)
+    assert offline.resolve('demo-dev-20260301-key', [], environment='demo-dev') == 'demo-dev-20260101-key'
+
+    resolver = KeypairResolver('123456789012', 'cn-northwest-1', cache=cache, client_factory=lambda region: client)
+    assert resolver.resolve('demo-dev-20260301-key', [], environment='demo-dev') == 'demo-dev-20260101-key'
+    assert client.calls == [['demo-dev-20260101-key']]
+    assert cache.get(cache_key) == 'demo-dev-20260101-key'
@@ -0,0 +1,13 @@
+import pytest
+
+pytest.importorskip('aws_cdk.core')
+
+
+def test_kms_stack_matches_snapshot(synth, snapshot, resources):
+    template = synth('kms')
+
+    key = next(iter(resources(template, 'AWS::KMS::Key').values()))
+    assert key['Properties']['EnableKeyRotation'] is True
+    assert key['DeletionPolicy'] == 'Retain'
+    assert template['Outputs']['OutputKmsKeyId']['Export']['Name'] == 'DemoTestKmsKeyId'
+    snapshot('kms', template)
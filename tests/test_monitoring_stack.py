@@ -0,0 +1,15 @@
+import pytest
+
+pytest.importorskip('aws_cdk.core')
+
+
+def test_monitoring_stack_matches_snapshot(synth, snapshot, resources):
+    template = synth('monitoring')
+
+    assert len(resources(template, 'AWS::CloudWatch::Dashboard')) == 1
+    alarms = resources(template, 'AWS::CloudWatch::Alarm').values()
+    alarm_names = {alarm['Properties']['AlarmName'] for alarm in alarms}
+    assert {'demo-test-monitoring-AppEC2CpuAlarm', 'demo-test-monitoring-AppEC2DiskQueueAlarm',
+            'demo-test-monitoring-RDSReadLatencyAlarm', 'demo-test-monitoring-RDSFreeStorageAlarm'} <= alarm_names
+    assert len(resources(template, 'AWS::SNS::Subscription')) == 1
+    snapshot('monitoring', template)
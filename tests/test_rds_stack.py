@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip('aws_cdk.core')
+
+
+def test_rds_stack_matches_snapshot(synth, snapshot, resources, config):
+    template = synth('rds')
+
+    db_instance = next(iter(resources(template, 'AWS::RDS::DBInstance').values()))
+    assert db_instance['Properties']['Engine'] == 'sqlserver-se'
+    assert db_instance['Properties']['AllocatedStorage'] == str(config.rds.storage)
+    assert db_instance['Properties']['StorageEncrypted'] is True
+    assert template['Outputs']['OutputRdsEndpointAddress']['Export']['Name'] == 'DemoTestRdsEndpointAddress'
+    snapshot('rds', template)
+
+
+def test_read_replicas_copy_the_primary_storage(config, tmp_path, resources):
+    from dataclasses import replace
+
+    from aws_cdk import core as cdk
+
+    from app import build_app
+    from tests.conftest import STUB_ZONES, StubKeypairResolver
+    from utils.config import ReadReplicaConfig
+
+    replicated = replace(config, rds=replace(
+        config.rds, edition='ee', multi_az=True, engine_version='15.00.4073.23.v1', storage_type='gp3', iops=12000,
+        storage_throughput=500, read_replicas=[ReadReplicaConfig(type='m5.large')]
+    ))
+    app = cdk.App(outdir=str(tmp_path), analytics_reporting=False, context={
+        'stacks': 'rds',
+        'availability-zones:account=123456789012:region=cn-northwest-1': STUB_ZONES
+    })
+    build_app(replicated, app, keypair_resolver=StubKeypairResolver())
+    template = app.synth().get_stack_by_name('demo-test-rds').template
+
+    instances = resources(template, 'AWS::RDS::DBInstance')
+    [replica] = [resource for resource in instances.values() if 'SourceDBInstanceIdentifier' in resource['Properties']]
+    [primary] = [resource for resource in instances.values() if resource is not replica]
+    assert primary['Properties']['Engine'] == 'sqlserver-ee'
+    assert primary['Properties']['EngineVersion'] == '15.00.4073.23.v1'
+    for instance in (primary, replica):
+        assert instance['Properties']['StorageType'] == 'gp3'
+        assert instance['Properties']['Iops'] == 12000
+        assert instance['Properties']['StorageThroughput'] == 500
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from tests.conftest import FIXTURES_DIR  # noqa: E402
+from utils.rds_instance_type import load_catalog  # noqa: E402
+from utils.rightsizing import FixtureMetrics, RightsizingReport, percentile, recommend  # noqa: E402
+
+INSTANCE_IDS = ['i-0123456789abcdef0', 'i-0fedcba9876543210', 'i-0000000000000000a']
+
+
+@pytest.fixture
+def recommendations(config):
+    report = RightsizingReport(FixtureMetrics.from_file(os.path.join(FIXTURES_DIR, 'metrics.yaml')))
+    return {recommendation.resource: recommendation for recommendation in report.run(config, INSTANCE_IDS)}
+
+
+def test_percentile_uses_nearest_rank():
+    assert percentile([], 95) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 21)), 95) == 19
+
+
+def test_idle_instance_gets_a_smaller_type(recommendations):
+    recommendation = recommendations['ec2 i-0123456789abcdef0']
+    assert recommendation.current_type == 't2.xlarge'
+    assert recommendation.suggested_type == 't2.large'
+    assert recommendation.cpu_percent == 25
+
+
+def test_busy_instance_keeps_its_type(recommendations):
+    assert recommendations['ec2 i-0fedcba9876543210'].suggested_type is None
+    assert recommendations['ec2 i-0fedcba9876543210'].reason.startswith('busy')
+
+
+def test_instance_without_metrics_is_reported(recommendations):
+    assert recommendations['ec2 i-0000000000000000a'].reason == 'no CPU data'
+
+
+def test_database_memory_comes_from_freeable_memory(recommendations):
+    recommendation = recommendations['rds demo-test-rds']
+    assert recommendation.current_type == 'm5.large'
+    assert 85 < recommendation.memory_percent < 90
+    assert recommendation.suggested_type is None
+
+
+def test_type_outside_the_catalog_is_reported():
+    recommendation = recommend(load_catalog(), 'ec2 i-0123456789abcdef0', 'm6a.large', 10, None, 60)
+    assert recommendation.suggested_type is None
+    assert recommendation.reason == 'not in the instance type catalog'
@@ -0,0 +1,14 @@
+import pytest
+
+pytest.importorskip('aws_cdk.core')
+
+
+def test_s3_bucket_stack_matches_snapshot(synth, snapshot, resources):
+    template = synth('s3')
+
+    bucket = next(iter(resources(template, 'AWS::S3::Bucket').values()))
+    rules = {rule['Id']: rule for rule in bucket['Properties']['LifecycleConfiguration']['Rules']}
+    assert rules['abort-incomplete-multipart-upload']['AbortIncompleteMultipartUpload'] == \
+        {'DaysAfterInitiation': 3}
+    assert template['Outputs']['OutputS3BucketName']['Export']['Name'] == 'DemoTestS3BucketName'
+    snapshot('s3', template)
@@ -0,0 +1,209 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('boto3')
+
+import botocore  # noqa: E402
+
+from utils import s3_transfer  # noqa: E402
+from utils.s3_transfer import MIB, S3Transfer, TransferError, composite_etag  # noqa: E402
+
+PART_SIZE = 1024
+
+
+class Paginator(object):
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, **kwargs):
+        yield self.method(**kwargs)
+
+
+class StubS3(object):
+    # Keeps objects and multipart uploads in memory and fails the listed parts and ranges once.
+    def __init__(self, fail_parts=(), fail_offsets=(), delay: float = 0):
+        self.objects = {}
+        self.uploads = {}
+        self.fail_parts = set(fail_parts)
+        self.fail_offsets = set(fail_offsets)
+        self.delay = delay
+        self.created = 0
+        self.uploaded_parts = []
+        self.ranges = []
+        self.running = 0
+        self.max_running = 0
+        self.etag_override = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _check_md5(body: bytes, content_md5: str) -> str:
+        assert base64.b64decode(content_md5) == hashlib.md5(body).digest()
+        return '"{}"'.format(hashlib.md5(body).hexdigest())
+
+    def put_object(self, Bucket, Key, Body, ContentMD5):
+        etag = self._check_md5(Body, ContentMD5)
+        self.objects[Key] = {'body': Body, 'etag': etag, 'first_part': len(Body)}
+        return {'ETag': etag}
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.created += 1
+        upload_id = 'upload-{}'.format(self.created)
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, ContentMD5):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.uploaded_parts.append(PartNumber)
+        try:
+            time.sleep(self.delay)
+            if PartNumber in self.fail_parts:
+                self.fail_parts.discard(PartNumber)
+                raise ConnectionError('connection reset during part {}'.format(PartNumber))
+            etag = self._check_md5(Body, ContentMD5)
+            self.uploads[UploadId][PartNumber] = (Body, etag)
+            return {'ETag': etag}
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def list_parts(self, Bucket, Key, UploadId):
+        if UploadId not in self.uploads:
+            raise botocore.exceptions.ClientError({'Error': {'Code': 'NoSuchUpload'}}, 'ListParts')
+        return {'Parts': [{'PartNumber': number, 'ETag': etag}
+                          for number, (body, etag) in sorted(self.uploads[UploadId].items())]}
+
+    def get_paginator(self, operation_name):
+        return Paginator(getattr(self, operation_name))
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        bodies = [parts[part['PartNumber']][0] for part in MultipartUpload['Parts']]
+        etag = '"{}"'.format(composite_etag([hashlib.md5(body).digest() for body in bodies]))
+        self.objects[Key] = {'body': b''.join(bodies), 'etag': etag, 'first_part': len(bodies[0])}
+        return {'ETag': self.etag_override or etag}
+
+    def head_object(self, Bucket, Key, PartNumber=None):
+        stored = self.objects[Key]
+        return {'ContentLength': stored['first_part'] if PartNumber else len(stored['body']), 'ETag': stored['etag']}
+
+    def get_object(self, Bucket, Key, IfMatch, Range):
+        stored = self.objects[Key]
+        assert IfMatch == stored['etag']
+        start, end = (int(value) for value in Range[len('bytes='):].split('-'))
+        self.ranges.append(start)
+        if start in self.fail_offsets:
+            self.fail_offsets.discard(start)
+            raise ConnectionError('connection reset at byte {}'.format(start))
+        return {'Body': io.BytesIO(stored['body'][start:end + 1])}
+
+
+@pytest.fixture
+def small_parts(monkeypatch):
+    monkeypatch.setattr(s3_transfer, 'MIN_PART_SIZE', PART_SIZE)
+
+
+@pytest.fixture
+def backup(tmp_path):
+    path = tmp_path / 'backup.bak'
+    path.write_bytes(os.urandom(PART_SIZE * 3 + 100))
+    return str(path)
+
+
+def transfer(client, **kwargs) -> S3Transfer:
+    return S3Transfer(client, log=lambda message: None, **dict(dict(part_size=PART_SIZE), **kwargs))
+
+
+def test_composite_etag_matches_s3():
+    digests = [hashlib.md5(b'a').digest(), hashlib.md5(b'b').digest()]
+    assert composite_etag(digests[:1]) == hashlib.md5(b'a').hexdigest()
+    assert composite_etag(digests) == hashlib.md5(digests[0] + digests[1]).hexdigest() + '-2'
+
+
+def test_part_size_is_checked_and_grows_for_large_files():
+    with pytest.raises(TransferError, match='at least 5 MiB'):
+        S3Transfer(StubS3(), part_size=MIB)
+    s3 = S3Transfer(StubS3(), part_size=5 * MIB)
+    assert s3._part_size_for(5 * MIB * 10000) == 5 * MIB
+    assert s3._part_size_for(5 * MIB * 10000 + 1) == 10 * MIB
+
+
+def test_small_file_is_a_single_put(small_parts, tmp_path):
+    client = StubS3()
+    path = tmp_path / 'small.bak'
+    path.write_bytes(b'backup')
+
+    assert transfer(client).upload(str(path), 'bucket', 'small.bak') == hashlib.md5(b'backup').hexdigest()
+    assert client.created == 0
+
+
+@pytest.mark.parametrize('concurrency', [1, 2])
+def test_parts_upload_with_bounded_concurrency(small_parts, backup, concurrency):
+    client = StubS3(delay=0.02)
+    etag = transfer(client, concurrency=concurrency).upload(backup, 'bucket', 'backup.bak')
+
+    assert etag.endswith('-4')
+    assert sorted(client.uploaded_parts) == [1, 2, 3, 4]
+    assert client.max_running == concurrency
+    with open(backup, 'rb') as file:
+        assert client.objects['backup.bak']['body'] == file.read()
+
+
+def test_interrupted_upload_resumes_with_the_missing_parts(small_parts, backup):
+    # The last part fails, so every other part has finished when the upload stops.
+    client = StubS3(fail_parts=[4])
+    with pytest.raises(ConnectionError):
+        transfer(client).upload(backup, 'bucket', 'backup.bak')
+    assert os.path.exists(backup + '.s3upload.json')
+
+    client.uploaded_parts = []
+    transfer(client).upload(backup, 'bucket', 'backup.bak')
+
+    assert client.created == 1
+    assert client.uploaded_parts == [4]
+    assert not os.path.exists(backup + '.s3upload.json')
+
+
+def test_upload_starts_over_when_the_upload_was_aborted(small_parts, backup):
+    client = StubS3(fail_parts=[2])
+    with pytest.raises(ConnectionError):
+        transfer(client).upload(backup, 'bucket', 'backup.bak')
+    client.uploads.clear()
+
+    transfer(client).upload(backup, 'bucket', 'backup.bak')
+    assert client.created == 2
+
+
+def test_upload_fails_when_the_composite_etag_differs(small_parts, backup):
+    client = StubS3()
+    client.etag_override = '"{}-4"'.format('0' * 32)
+
+    with pytest.raises(TransferError, match='checksum mismatch'):
+        transfer(client).upload(backup, 'bucket', 'backup.bak')
+
+
+def test_interrupted_download_resumes_and_checks_the_etag(small_parts, backup, tmp_path):
+    client = StubS3(fail_offsets=[PART_SIZE * 3])
+    transfer(client).upload(backup, 'bucket', 'backup.bak')
+    target = str(tmp_path / 'restored.bak')
+
+    # Downloads follow the uploader's part size even when configured differently.
+    with pytest.raises(ConnectionError):
+        transfer(client, part_size=PART_SIZE * 2).download('bucket', 'backup.bak', target)
+    client.ranges = []
+    transfer(client, part_size=PART_SIZE * 2).download('bucket', 'backup.bak', target)
+
+    assert client.ranges == [PART_SIZE * 3]
+    with open(backup, 'rb') as original, open(target, 'rb') as restored:
+        assert original.read() == restored.read()
+
+    client.objects['backup.bak']['body'] = b'x' + client.objects['backup.bak']['body'][1:]
+    with pytest.raises(TransferError, match='checksum mismatch'):
+        transfer(client).download('bucket', 'backup.bak', str(tmp_path / 'corrupt.bak'))
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+pytest.importorskip('aws_cdk.core')
+
+
+def test_schedule_stack_matches_snapshot(synth, snapshot, resources):
+    template = synth('schedule')
+
+    rules = {rule['Properties']['Name']: rule for rule in resources(template, 'AWS::Events::Rule').values()}
+    assert rules['demo-test-schedule-scale-down']['Properties']['ScheduleExpression'] == 'cron(0 12 ? * MON-FRI *)'
+    assert rules['demo-test-schedule-scale-up']['Properties']['ScheduleExpression'] == 'cron(0 0 ? * MON-FRI *)'
+    # The instance ids are imported, so the input is joined around them.
+    target_input = rules['demo-test-schedule-scale-down']['Properties']['Targets'][0]['Input']
+    target_input = ''.join(part for part in target_input['Fn::Join'][1] if isinstance(part, str))
+    assert '"scaled_down_type":"t2.large"' in target_input
+    assert '"db_instance_id":"demo-test-rds"' in target_input
+    actions = {action for policy in resources(template, 'AWS::IAM::Policy').values()
+               for statement in policy['Properties']['PolicyDocument']['Statement']
+               for action in ([statement['Action']] if isinstance(statement['Action'], str) else statement['Action'])}
+    assert {'ec2:StopInstances', 'ec2:ModifyInstanceAttribute', 'rds:StopDBInstance'} <= actions
+    snapshot('schedule', template)
+
+
+def test_disabled_schedule_is_not_checked_against_the_other_configs(config):
+    from dataclasses import replace
+
+    from tests.conftest import FIXTURES_DIR
+    from utils.config import ConfigError, load_yaml, parse_app_config
+
+    data = load_yaml(os.path.join(FIXTURES_DIR, 'config.yaml'))
+    multi_az = replace(config.rds, multi_az=True)
+    with pytest.raises(ConfigError, match='cannot be stopped'):
+        parse_app_config(data, ec2_config=config.ec2, rds_config=multi_az)
+    disabled = dict(data, schedule=dict(data['schedule'], enabled=False))
+    assert not parse_app_config(disabled, ec2_config=config.ec2, rds_config=multi_az).schedule.enabled
@@ -0,0 +1,102 @@
+import pytest
+
+from utils.config import Inbound, SecurityGroupConfig
+from utils.security_group_rules import IngressRule, RuleQuotaError, apply_ingress_plan, plan_ingress
+
+
+def office_plan():
+    return plan_ingress([
+        Inbound(ip='192.0.2.{}/32'.format(index), description='office {}'.format(index), ports=[(3389, 3389)])
+        for index in (1, 3, 5)
+    ], prefix_list_min_entries=3, name='demo-test-ec2-sg')
+
+
+def test_fixture_inbounds_compact_from_9_to_4_rules(config):
+    plan = plan_ingress(config.ec2.inbounds)
+
+    assert plan.requested == 9
+    assert plan.rules == [
+        IngressRule('127.0.0.1/32', 0, 65535, 'self'),
+        IngressRule('0.0.0.0/0', 80, 80, 'public'),
+        IngressRule('0.0.0.0/0', 443, 443, 'public'),
+        # The two office addresses form a /31, and 80 and 443 are already open to everyone.
+        IngressRule('222.126.242.202/31', 3389, 3389, 'from Shanghai office')
+    ]
+
+
+def test_overlapping_cidrs_keep_the_wider_network():
+    plan = plan_ingress([
+        Inbound(ip='10.0.0.0/16', description='vpc', ports=[(1433, 1433)]),
+        Inbound(ip='10.0.1.0/24', description='app subnet', ports=[(1433, 1433), (3389, 3389)])
+    ])
+
+    assert plan.rules == [IngressRule('10.0.0.0/16', 1433, 1433, 'vpc'),
+                          IngressRule('10.0.1.0/24', 3389, 3389, 'app subnet')]
+
+
+def test_adjacent_port_ranges_and_networks_are_merged():
+    plan = plan_ingress([
+        Inbound(ip='10.0.0.0/25', description='lower half', ports=[(8000, 8080), (8081, 8090)]),
+        Inbound(ip='10.0.0.128/25', description='upper half', ports=[(8000, 8090)])
+    ])
+
+    assert plan.requested == 3
+    assert plan.rules == [IngressRule('10.0.0.0/24', 8000, 8090, 'lower half, upper half')]
+
+
+def test_partly_overlapping_port_ranges_are_not_split():
+    plan = plan_ingress([
+        Inbound(ip='0.0.0.0/0', description='public', ports=[(443, 443)]),
+        Inbound(ip='192.0.2.10/32', description='admin', ports=[(400, 500)])
+    ])
+
+    assert plan.rules == [IngressRule('192.0.2.10/32', 400, 500, 'admin'),
+                          IngressRule('0.0.0.0/0', 443, 443, 'public')]
+
+
+def test_prefix_lists_count_their_max_entries_against_the_quota():
+    plan = office_plan()
+
+    assert plan.rules == []
+    assert [prefix_list.name for prefix_list in plan.prefix_lists] == ['demo-test-ec2-sg-3389']
+    assert plan.prefix_lists[0].max_entries == 3
+    assert plan.rule_count == 1
+    assert plan.quota_units == 3
+
+
+def test_prefix_list_is_created_with_the_max_entries_the_quota_counted(tmp_path):
+    cdk = pytest.importorskip('aws_cdk.core')
+    from aws_cdk import aws_ec2 as ec2
+
+    app = cdk.App(outdir=str(tmp_path), analytics_reporting=False)
+    stack = cdk.Stack(app, 'demo-test-ec2')
+    security_group = ec2.SecurityGroup(stack, 'AppSecurityGroup', vpc=ec2.Vpc(stack, 'VPC', max_azs=1))
+
+    with pytest.raises(RuleQuotaError, match=r'needs 4 inbound rules \(1 planned from 3 requested, 1 added by the '
+                                             r'stack\), the quota is 3'):
+        apply_ingress_plan(stack, security_group, office_plan(), SecurityGroupConfig(max_rules=3), extra_rules=1)
+    apply_ingress_plan(stack, security_group, office_plan(), SecurityGroupConfig(max_rules=4), extra_rules=1)
+    template = app.synth().get_stack_by_name('demo-test-ec2').template
+
+    [prefix_list] = [resource for resource in template['Resources'].values()
+                     if resource['Type'] == 'AWS::EC2::PrefixList']
+    assert prefix_list['Properties']['MaxEntries'] == len(prefix_list['Properties']['Entries']) == 3
+
+
+def test_rules_over_the_quota_fail_the_synth(config, tmp_path):
+    from dataclasses import replace
+
+    cdk = pytest.importorskip('aws_cdk.core')
+
+    from app import build_app
+    from tests.conftest import STUB_ZONES, StubKeypairResolver
+
+    tight = replace(config, ec2=replace(config.ec2, security_group=SecurityGroupConfig(max_rules=3)))
+    app = cdk.App(outdir=str(tmp_path), analytics_reporting=False, context={
+        'stacks': 'ec2',
+        'availability-zones:account=123456789012:region=cn-northwest-1': STUB_ZONES
+    })
+
+    with pytest.raises(RuleQuotaError, match=r'needs 4 inbound rules \(4 planned from 9 requested, 0 added by the '
+                                             r'stack\), the quota is 3'):
+        build_app(tight, app, keypair_resolver=StubKeypairResolver())
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip('aws_cdk.core')
+
+from aws_cdk import core as cdk  # noqa: E402
+
+from app import build_app  # noqa: E402
+from tests.conftest import STUB_ACCOUNT, STUB_ZONES, StubKeypairResolver  # noqa: E402
+
+
+def synth(config, outdir, stacks=None, extend=None):
+    context = {'availability-zones:account={}:region={}'.format(STUB_ACCOUNT, config.app.aws_region): STUB_ZONES}
+    if stacks:
+        context['stacks'] = stacks
+    app = build_app(config, cdk.App(outdir=str(outdir), analytics_reporting=False, context=context),
+                    keypair_resolver=StubKeypairResolver())
+    if extend is not None:
+        extend(app)
+    return app.synth()
+
+
+@pytest.mark.parametrize('stacks', ['ec2', 'cache', 'rds', 'schedule'])
+def test_producers_do_not_depend_on_the_selection(config, tmp_path, stacks):
+    full = synth(config, tmp_path / 'full')
+    partial = synth(config, tmp_path / 'partial', stacks)
+
+    producers = [stack.stack_name for stack in partial.stacks if stack.stack_name.rsplit('-', 1)[-1] in ('vpc', 'kms')]
+    assert producers
+    for stack_name in producers:
+        assert partial.get_stack_by_name(stack_name).template == full.get_stack_by_name(stack_name).template
+
+
+def test_unpinned_exports_fail_the_synth(config, tmp_path):
+    def use_default_security_group(app):
+        vpc_stack = app.node.find_child('-'.join([config.app.project, config.app.environment, 'vpc']))
+        consumer = cdk.Stack(app, 'consumer', env=cdk.Environment(account=vpc_stack.account, region=vpc_stack.region))
+        cdk.CfnOutput(consumer, 'DefaultSecurityGroup', value=vpc_stack.vpc.vpc_default_security_group)
+
+    with pytest.raises(Exception, match='does not pin'):
+        synth(config, tmp_path, 'vpc', extend=use_default_security_group)
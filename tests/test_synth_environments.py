@@ -0,0 +1,48 @@
+import copy
+import json
+import os
+
+import pytest
+import yaml
+
+from synth_environments import main
+from tests.conftest import FIXTURES_DIR
+from utils.config import load_yaml
+
+
+def write_base_config(tmp_path, **overrides) -> str:
+    data = copy.deepcopy(load_yaml(os.path.join(FIXTURES_DIR, 'config.yaml')))
+    data.update(overrides)
+    path = tmp_path / 'config.yaml'
+    path.write_text(yaml.safe_dump(data), encoding='UTF-8')
+    return str(path)
+
+
+def test_bad_environment_fails_before_any_worker_starts(tmp_path, capsys):
+    base_config = write_base_config(tmp_path, vpc_cidr='10.5.0.0/29')
+    outdir = tmp_path / 'cdk.out.environments'
+
+    with pytest.raises(SystemExit) as error:
+        main(['--base-config', base_config, '--environments', 'dev', 'uat', '--outdir', str(outdir)])
+    assert error.value.code == 2
+    assert 'vpc_cidr: prefix length /29 is outside /16-/28' in capsys.readouterr().err
+    assert not outdir.exists()
+
+
+def test_environments_are_synthesized_into_their_own_assemblies(tmp_path, stub_environment):
+    pytest.importorskip('aws_cdk.core')
+    base_config = write_base_config(tmp_path)
+    outdir = tmp_path / 'cdk.out.environments'
+
+    assert main(['--base-config', base_config, '--environments', 'dev', 'UAT', '--outdir', str(outdir),
+                 '--workers', '2', '--offline']) == 0
+    for environment, tag in (('dev', 'dev'), ('uat', 'UAT')):
+        with open(str(outdir / 'demo-{}'.format(environment) / 'manifest.json'), 'r', encoding='UTF-8') as file:
+            stack_names = {artifact_id for artifact_id, artifact in json.load(file)['artifacts'].items()
+                           if artifact['type'] == 'aws:cloudformation:stack'}
+        assert stack_names and all(name.startswith('demo-{}-'.format(environment)) for name in stack_names)
+        template_path = outdir / 'demo-{}'.format(environment) / 'demo-{}-vpc.template.json'.format(environment)
+        with open(str(template_path), 'r', encoding='UTF-8') as file:
+            vpc = next(resource for resource in json.load(file)['Resources'].values()
+                       if resource['Type'] == 'AWS::EC2::VPC')
+        assert {'Key': 'environment', 'Value': tag} in vpc['Properties']['Tags']
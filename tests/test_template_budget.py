@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from utils.template_budget import STACK_ARTIFACT_TYPE, TemplateLimits, check_assembly, main
+
+STACK_NAME = 'demo-test-ec2'
+LIMITS = TemplateLimits(bytes=1024 * 1024, resources=10, outputs=6, exports=4, parameters=3, mappings=3)
+
+
+def resource(construct: str) -> dict:
+    return {'Type': 'AWS::SNS::Topic', 'Metadata': {'aws:cdk:path': '/'.join(['', STACK_NAME, construct, 'Resource'])}}
+
+
+def template(resources: int = 0, outputs: int = 0, exports: int = 0, parameters: int = 0, mappings: int = 0) -> dict:
+    return {
+        'Resources': {'Topic{}'.format(index): resource('Topic{}'.format(index)) for index in range(resources)},
+        'Outputs': dict(
+            [('Output{}'.format(index), {'Value': 'x'}) for index in range(outputs - exports)] +
+            [('Export{}'.format(index), {'Value': 'x', 'Export': {'Name': 'X{}'.format(index)}})
+             for index in range(exports)]),
+        'Parameters': {'Parameter{}'.format(index): {'Type': 'String'} for index in range(parameters)},
+        'Mappings': {'Mapping{}'.format(index): {'a': {'b': 'c'}} for index in range(mappings)}
+    }
+
+
+def write_assembly(directory, body: dict, metadata: dict = None) -> str:
+    (directory / 'stack.template.json').write_text(json.dumps(body), encoding='UTF-8')
+    (directory / 'manifest.json').write_text(json.dumps({'artifacts': {
+        STACK_NAME: {'type': STACK_ARTIFACT_TYPE, 'properties': {'templateFile': 'stack.template.json'},
+                     'metadata': metadata or {}},
+        'Tree': {'type': 'cdk:tree'}
+    }}), encoding='UTF-8')
+    return str(directory)
+
+
+@pytest.mark.parametrize('limit', ['resources', 'outputs', 'exports', 'parameters', 'mappings'])
+def test_counts_at_the_limit_pass_and_one_more_fails(tmp_path, limit):
+    maximum = getattr(LIMITS, limit)
+    # Exports are outputs too, the outputs limit is set high enough to not get in the way.
+    counts = {limit: maximum, 'outputs': maximum} if limit == 'exports' else {limit: maximum}
+    at_limit = check_assembly(write_assembly(tmp_path, template(**counts)), LIMITS)['stacks'][STACK_NAME]
+    assert at_limit['violations'] == []
+    assert at_limit['warnings'] == ['{} {} is above 80% of the limit of {}'.format(limit, maximum, maximum)]
+
+    counts = {key: value + 1 for key, value in counts.items()}
+    over_limit = check_assembly(write_assembly(tmp_path, template(**counts)), LIMITS)['stacks'][STACK_NAME]
+    assert over_limit['violations'] == ['{} {} exceeds the limit of {}'.format(limit, maximum + 1, maximum)]
+
+
+def test_template_size_at_the_limit_passes_and_one_byte_more_fails(tmp_path):
+    assembly_dir = write_assembly(tmp_path, template(resources=1))
+    size = (tmp_path / 'stack.template.json').stat().st_size
+
+    at_limit = check_assembly(assembly_dir, TemplateLimits(bytes=size))['stacks'][STACK_NAME]
+    assert at_limit['bytes'] == size and at_limit['violations'] == []
+    over_limit = check_assembly(assembly_dir, TemplateLimits(bytes=size - 1))['stacks'][STACK_NAME]
+    assert over_limit['violations'] == ['bytes {} exceeds the limit of {}'.format(size, size - 1)]
+
+
+def test_stack_under_the_warning_threshold_gets_no_suggestions(tmp_path):
+    stack = check_assembly(write_assembly(tmp_path, template(resources=8)), LIMITS)['stacks'][STACK_NAME]
+
+    assert stack['violations'] == stack['warnings'] == stack['nested_stack_candidates'] == []
+
+
+def test_largest_constructs_are_suggested_until_the_stack_is_under_the_threshold(tmp_path):
+    body = template()
+    body['Resources'] = dict(
+        [('App{}'.format(index), resource('App')) for index in range(4)] +
+        [('Database{}'.format(index), resource('Database')) for index in range(3)] +
+        [('Cache{}'.format(index), resource('Cache')) for index in range(2)] +
+        [('Alarm{}'.format(index), resource('Alarm{}'.format(index))) for index in range(4)]
+    )
+    stack = check_assembly(write_assembly(tmp_path, body), LIMITS)['stacks'][STACK_NAME]
+
+    # 13 resources are 5 over the 80% threshold of 8: App alone is not enough, single resources are never moved.
+    assert stack['violations'] == ['resources 13 exceeds the limit of 10']
+    assert [candidate['construct'] for candidate in stack['nested_stack_candidates']] == ['App', 'Database']
+    assert [candidate['resources'] for candidate in stack['nested_stack_candidates']] == [4, 3]
+
+
+def test_constructs_without_path_metadata_come_from_the_manifest(tmp_path):
+    body = template()
+    body['Resources'] = {'Queue{}'.format(index): {'Type': 'AWS::SQS::Queue'} for index in range(9)}
+    metadata = {'/{}/Jobs/Queue{}/Resource'.format(STACK_NAME, index): [
+        {'type': 'aws:cdk:logicalId', 'data': 'Queue{}'.format(index)}] for index in range(9)}
+    stack = check_assembly(write_assembly(tmp_path, body, metadata), LIMITS)['stacks'][STACK_NAME]
+
+    assert stack['constructs']['Jobs']['resources'] == 9
+    assert [candidate['construct'] for candidate in stack['nested_stack_candidates']] == ['Jobs']
+
+
+def test_main_writes_the_report_and_fails_on_violations(tmp_path):
+    assembly_dir = write_assembly(tmp_path, template(resources=11))
+    report_path = str(tmp_path / 'report.json')
+
+    assert main(['--app', assembly_dir, '--output', report_path, '--max-resources', '11']) == 0
+    assert main(['--app', assembly_dir, '--output', report_path, '--max-resources', '10']) == 1
+    with open(report_path, 'r', encoding='UTF-8') as file:
+        report = json.load(file)
+    assert report['limits']['resources'] == 10
+    assert report['stacks'][STACK_NAME]['violations'] == ['resources 11 exceeds the limit of 10']
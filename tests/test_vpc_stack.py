@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip('aws_cdk.core')
+
+
+def test_vpc_stack_matches_snapshot(synth, snapshot, resources, config):
+    template = synth('vpc')
+
+    assert len(resources(template, 'AWS::EC2::Subnet')) == 3 * config.app.vpc.max_azs
+    assert len(resources(template, 'AWS::EC2::NatGateway')) == config.app.vpc.nat_gateways
+    endpoints = resources(template, 'AWS::EC2::VPCEndpoint').values()
+    assert sorted(endpoint['Properties'].get('VpcEndpointType', 'Gateway') for endpoint in endpoints) == \
+        ['Gateway', 'Interface']
+    interface_endpoint = next(endpoint for endpoint in endpoints
+                              if endpoint['Properties'].get('VpcEndpointType') == 'Interface')
+    assert interface_endpoint['Properties']['ServiceName'] == 'cn.com.amazonaws.cn-northwest-1.kms'
+    snapshot('vpc', template)
+
+
+def test_pinned_nat_instance_ami_needs_no_lookup(config, tmp_path, resources):
+    from dataclasses import replace
+
+    from aws_cdk import core as cdk
+
+    from stacks.vpc_stack import VPCStack
+
+    vpc_config = replace(config.app.vpc, nat_provider='instance', nat_instance_ami='ami-0123456789abcdef0')
+    app = cdk.App(outdir=str(tmp_path), analytics_reporting=False)
+    VPCStack(app, 'demo-test-vpc', cidr=config.app.vpc_cidr, vpc_config=vpc_config,
+             env=cdk.Environment(account='123456789012', region=config.app.aws_region))
+    template = app.synth().get_stack_by_name('demo-test-vpc').template
+
+    instances = resources(template, 'AWS::EC2::Instance').values()
+    assert {instance['Properties']['ImageId'] for instance in instances} == {'ami-0123456789abcdef0'}
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class JsonFileCache(object):
+    def __init__(self, path: str, ttl: int = 86400):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        return '/'.join(str(part) if part is not None else '-' for part in parts)
+
+    def get(self, key: str, include_expired: bool = False):
+        with self._lock:
+            entry = self._read().get(key)
+        if entry is None:
+            return None
+        if not include_expired and self.ttl is not None and time.time() - entry.get('stored_at', 0) > self.ttl:
+            return None
+        return entry.get('value')
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            entries = self._read()
+            entries[key] = {'stored_at': time.time(), 'value': value}
+            self._write(entries)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            entries = self._read()
+            if entries.pop(key, None) is not None:
+                self._write(entries)
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='UTF-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entries: dict) -> None:
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        # Every write gets its own temporary file, so processes sharing the cache never rename each other's half
+        # written file into place.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='UTF-8') as file:
+                json.dump(entries, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,51 @@
+import json
+
+AGENT_NAMESPACE = 'CWAgent'
+PARAMETER_PREFIX = 'AmazonCloudWatch-'
+DISK_QUEUE_METRIC = 'PhysicalDisk Avg. Disk Queue Length'
+AGENT_MSI_URL = ('https://s3.{0}.amazonaws.com.cn/amazoncloudwatch-agent-{0}/windows/amd64/latest/'
+                 'amazon-cloudwatch-agent.msi')
+AGENT_CTL = r'C:\Program Files\Amazon\AmazonCloudWatchAgent\amazon-cloudwatch-agent-ctl.ps1'
+WINDOWS_COUNTERS = {
+    'Processor': (['% Processor Time', '% Privileged Time'], ['_Total']),
+    'Memory': (['% Committed Bytes In Use', 'Available MBytes', 'Pages/sec'], None),
+    'PhysicalDisk': (['Avg. Disk Queue Length', 'Disk Reads/sec', 'Disk Writes/sec', '% Disk Time'], ['_Total']),
+    'LogicalDisk': (['% Free Space'], ['*']),
+    'Network Interface': (['Bytes Received/sec', 'Bytes Sent/sec'], ['*']),
+    'TCPv4': (['Connections Established'], None)
+}
+
+
+def parameter_name(construct_id: str) -> str:
+    # CloudWatchAgentServerPolicy only allows reading parameters with this prefix.
+    return PARAMETER_PREFIX + construct_id
+
+
+def windows_agent_config(interval: int = 60, auto_scaling: bool = False) -> dict:
+    metrics_collected = {}
+    for object_name, (measurement, resources) in WINDOWS_COUNTERS.items():
+        metrics_collected[object_name] = {'measurement': measurement}
+        if resources:
+            metrics_collected[object_name]['resources'] = resources
+    metrics = {
+        'namespace': AGENT_NAMESPACE,
+        'metrics_collected': metrics_collected,
+        'append_dimensions': {'InstanceId': '${aws:InstanceId}'}
+    }
+    if auto_scaling:
+        metrics['append_dimensions']['AutoScalingGroupName'] = '${aws:AutoScalingGroupName}'
+        metrics['aggregation_dimensions'] = [['AutoScalingGroupName']]
+    return {'agent': {'metrics_collection_interval': interval}, 'metrics': metrics}
+
+
+def windows_agent_install_commands(region: str, parameter: str) -> list:
+    return [
+        "$msi = Join-Path $env:TEMP 'amazon-cloudwatch-agent.msi'",
+        "Invoke-WebRequest -UseBasicParsing -Uri '{}' -OutFile $msi".format(AGENT_MSI_URL.format(region)),
+        "Start-Process msiexec.exe -ArgumentList '/i', $msi, '/qn' -Wait",
+        "& '{}' -a fetch-config -m ec2 -c ssm:{} -s".format(AGENT_CTL, parameter)
+    ]
+
+
+def windows_agent_config_json(interval: int = 60, auto_scaling: bool = False) -> str:
+    return json.dumps(windows_agent_config(interval, auto_scaling), sort_keys=True)
@@ -0,0 +1,772 @@
+import functools
+import ipaddress
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import yaml
+
+from utils.rds_instance_type import InstanceTypeError, load_catalog
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(ROOT_DIR, 'config.yaml')
+EC2_CONFIG_PATH = os.path.join(ROOT_DIR, 'stacks', 'ec2_config.yaml')
+RDS_CONFIG_PATH = os.path.join(ROOT_DIR, 'stacks', 'rds_config.yaml')
+
+SUBNET_TIERS = ('public', 'private', 'isolated')
+SUBNET_PREFIX_LENGTH = 24
+NAT_PROVIDERS = ('gateway', 'instance')
+GATEWAY_ENDPOINTS = ('s3', 'dynamodb')
+INTERFACE_ENDPOINTS = ('kms', 'secretsmanager', 'ssm', 'ssmmessages', 'ec2messages', 'logs', 'monitoring', 'sts')
+FLEET_MODES = ('single', 'instances', 'auto_scaling')
+LOAD_BALANCER_PROTOCOLS = {'application': ('HTTP', 'HTTPS'), 'network': ('TCP', 'TLS', 'UDP', 'TCP_UDP')}
+RDS_LOG_EXPORTS = ('agent', 'error')
+RDS_EDITIONS = ('se', 'ee')
+RDS_ENGINE_VERSION_PATTERN = re.compile(r'^(\d{2})\.00\.\d+\.\d+\.v\d+$')
+# SQL Server 2016 (13.00) is the first version RDS can create read replicas for.
+RDS_READ_REPLICA_MIN_VERSION = 13
+RDS_STORAGE_TYPES = ('gp2', 'gp3', 'io1')
+RDS_MONITORING_INTERVALS = (0, 1, 5, 10, 15, 30, 60)
+RDS_PERFORMANCE_INSIGHTS_RETENTION_DAYS = (7, 731)
+RDS_MIN_STORAGE = 20
+RDS_MAX_STORAGE = 16384
+EBS_MAX_SIZE = 16384
+EBS_VOLUME_TYPES = ('gp2', 'gp3', 'io1', 'io2', 'st1')
+EBS_ROOT_DEVICE_NAMES = ('/dev/sda1', '/dev/xvda')
+SECURITY_GROUP_MAX_RULES = 1000
+SQL_SERVER_RESERVED_PORTS = (1234, 1434, 3260, 3343, 3389, 47001) + tuple(range(49152, 49157))
+AMI_PATTERN = re.compile(r'^ami-[0-9a-f]{8,17}$')
+INSTANCE_TYPE_PATTERN = re.compile(r'^[a-z][a-z0-9-]*\.[a-z0-9]+$')
+CACHE_NODE_TYPE_PATTERN = re.compile(r'^cache\.[a-z0-9]+\.[a-z0-9]+$')
+CACHE_SUBNET_TIERS = ('private', 'isolated')
+CACHE_MAX_REPLICAS = 5
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+SCHEDULE_ACTIONS = ('none', 'stop', 'resize')
+CRON_FIELD_PATTERN = re.compile(r'^[0-9A-Z*,/-]+$')
+BACKUP_WINDOW_PATTERN = re.compile(r'^([01]\d|2[0-3]):([0-5]\d)-([01]\d|2[0-3]):([0-5]\d)$')
+
+
+class ConfigError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Inbound:
+    ip: str
+    description: str
+    ports: List[Tuple[int, int]] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class SecurityGroupConfig:
+    max_rules: int = 60
+    prefix_list_min_entries: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class BlockDeviceConfig:
+    name: str
+    size: int
+    volume_type: str = 'gp2'
+    iops: Optional[int] = None
+    throughput: Optional[int] = None
+    encrypted: bool = False
+    kms: bool = False
+    delete_on_termination: bool = True
+
+
+@dataclass(frozen=True)
+class ListenerConfig:
+    port: int
+    protocol: str
+    target_port: int
+    target_protocol: str = 'HTTP'
+    certificate_arn: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class LoadBalancerConfig:
+    enabled: bool = False
+    type: str = 'application'
+    internet_facing: bool = True
+    health_check_path: str = '/'
+    listeners: List[ListenerConfig] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class FleetConfig:
+    mode: str = 'single'
+    count: int = 1
+    subnets: List[str] = field(default_factory=lambda: ['public'])
+    min_capacity: int = 1
+    max_capacity: int = 1
+    desired_capacity: Optional[int] = None
+    cpu_target_utilization: Optional[int] = None
+    load_balancer: LoadBalancerConfig = field(default_factory=LoadBalancerConfig)
+
+
+@dataclass(frozen=True)
+class EC2Config:
+    ami: str
+    type: str
+    block_devices: List[BlockDeviceConfig]
+    inbounds: List[Inbound]
+    fleet: FleetConfig = field(default_factory=FleetConfig)
+    ebs_optimized: Optional[bool] = None
+    instance_store_volumes: int = 0
+    security_group: SecurityGroupConfig = field(default_factory=SecurityGroupConfig)
+
+    @property
+    def uses_kms(self) -> bool:
+        return any(device.kms for device in self.block_devices)
+
+    @property
+    def uses_throughput(self) -> bool:
+        return any(device.throughput for device in self.block_devices)
+
+    @property
+    def instance_store_devices(self) -> List[str]:
+        # Windows AMIs expect instance store volumes at xvdca onwards.
+        return ['xvdc' + chr(ord('a') + index) for index in range(self.instance_store_volumes)]
+
+
+@dataclass(frozen=True)
+class MasterUserConfig:
+    name: str
+    secret_id: str
+    json_field: str
+
+
+@dataclass(frozen=True)
+class PerformanceInsightsConfig:
+    enabled: bool = False
+    retention_days: int = 7
+
+
+@dataclass(frozen=True)
+class ReadReplicaConfig:
+    type: str
+
+
+@dataclass(frozen=True)
+class RDSConfig:
+    master_user: MasterUserConfig
+    rds_port: int
+    type: str
+    storage: int
+    max_storage: Optional[int]
+    collation: str
+    timezone: str
+    backup_retention_days: int
+    backup_window: str
+    cloudwatch_logs_exports: List[str]
+    inbounds: List[Inbound]
+    edition: str = 'se'
+    engine_version: str = '12.00.5571.0.v1'
+    storage_type: str = 'gp2'
+    iops: Optional[int] = None
+    storage_throughput: Optional[int] = None
+    multi_az: bool = False
+    performance_insights: PerformanceInsightsConfig = field(default_factory=PerformanceInsightsConfig)
+    monitoring_interval: int = 0
+    read_replicas: List[ReadReplicaConfig] = field(default_factory=list)
+    security_group: SecurityGroupConfig = field(default_factory=SecurityGroupConfig)
+
+    @property
+    def engine_major_version(self) -> str:
+        return '.'.join(self.engine_version.split('.')[:2])
+
+
+@dataclass(frozen=True)
+class VPCConfig:
+    max_azs: int = 2
+    nat_gateways: Optional[int] = None
+    nat_provider: str = 'gateway'
+    nat_instance_type: str = 't3.small'
+    nat_instance_ami: Optional[str] = None
+    gateway_endpoints: List[str] = field(default_factory=list)
+    interface_endpoints: List[str] = field(default_factory=list)
+    interface_endpoint_prefix: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    enabled: bool = False
+    node_type: str = 'cache.t3.micro'
+    engine_version: str = '6.x'
+    replicas: int = 0
+    port: int = 6379
+    subnets: str = 'isolated'
+    at_rest_encryption: bool = True
+    transit_encryption: bool = False
+
+
+@dataclass(frozen=True)
+class MonitoringConfig:
+    enabled: bool = False
+    alarm_email: Optional[str] = None
+    agent_interval: int = 60
+    cpu_percent: int = 80
+    cpu_credit_balance: int = 20
+    disk_queue_length: float = 4
+    rds_latency_ms: int = 20
+    rds_burst_balance_percent: int = 20
+    rds_free_storage_percent: int = 10
+    rds_connections: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class ScheduleTargetConfig:
+    action: str = 'none'
+    type: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ScheduleConfig:
+    enabled: bool = False
+    scale_down: str = '0 12 * * MON-FRI'
+    scale_up: str = '0 0 * * MON-FRI'
+    ec2: ScheduleTargetConfig = field(default_factory=ScheduleTargetConfig)
+    rds: ScheduleTargetConfig = field(default_factory=ScheduleTargetConfig)
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    project: str
+    environment: str
+    vpc_cidr: str
+    aws_region: str
+    aws_tags: dict
+    vpc: VPCConfig = field(default_factory=VPCConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    monitoring: MonitoringConfig = field(default_factory=MonitoringConfig)
+    schedule: ScheduleConfig = field(default_factory=ScheduleConfig)
+
+
+@dataclass(frozen=True)
+class Config:
+    app: AppConfig
+    ec2: EC2Config
+    rds: RDSConfig
+
+
+class _Section(object):
+    def __init__(self, source: str, data, path: str = ''):
+        self.source = source
+        self.data = data
+        self.path = path
+        if not isinstance(data, dict):
+            self.fail('expected a mapping, got {!r}'.format(data))
+
+    def fail(self, message: str, key: str = None):
+        location = '.'.join(part for part in (self.path, key) if part) or '<root>'
+        raise ConfigError('{}: {}: {}'.format(self.source, location, message))
+
+    def child(self, key: str, default=None) -> '_Section':
+        value = self.data.get(key)
+        if value is None:
+            value = {} if default is None else default
+        return _Section(self.source, value, '.'.join(part for part in (self.path, key) if part))
+
+    def items(self, key: str, required: bool = True) -> list:
+        value = self.data.get(key)
+        if value is None and not required:
+            return []
+        if not isinstance(value, list) or (required and not value):
+            self.fail('expected a non-empty list', key)
+        return [_Section(self.source, item, '{}.{}[{}]'.format(self.path, key, index).lstrip('.'))
+                for index, item in enumerate(value)]
+
+    def get(self, key: str, kind=str, default=None, required: bool = False):
+        value = self.data.get(key)
+        if value is None:
+            if required:
+                self.fail('is required', key)
+            return default
+        if kind in (int, float) and not isinstance(value, bool):
+            if kind is int and isinstance(value, float) and not value.is_integer():
+                self.fail('expected an integer, got {!r}'.format(value), key)
+            try:
+                return kind(value)
+            except (TypeError, ValueError):
+                self.fail('expected a number, got {!r}'.format(value), key)
+        if kind is bool and isinstance(value, bool):
+            return value
+        if kind is str and isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            return str(value)
+        self.fail('expected {}, got {!r}'.format(kind.__name__, value), key)
+
+    def int_in_range(self, key: str, minimum: int, maximum: int, default=None, required: bool = None):
+        if required is None:
+            required = default is None
+        value = self.get(key, int, default=default, required=required)
+        if value is not None and not minimum <= value <= maximum:
+            self.fail('{} is outside {}-{}'.format(value, minimum, maximum), key)
+        return value
+
+    def choice(self, key: str, choices: tuple, default=None):
+        value = self.get(key, str, default=default, required=default is None)
+        if value not in choices:
+            self.fail('{!r} is not one of {}'.format(value, ', '.join(choices)), key)
+        return value
+
+    def cidr(self, key: str) -> str:
+        value = self.get(key, required=True)
+        try:
+            ipaddress.IPv4Network(value)
+        except ValueError as error:
+            self.fail('{!r} is not a valid IPv4 CIDR ({})'.format(value, error), key)
+        return value
+
+
+def parse_port_range(value) -> Tuple[int, int]:
+    if isinstance(value, bool):
+        raise ValueError('{!r} is not a port'.format(value))
+    parts = [part.strip() for part in str(value).split('-')]
+    if len(parts) not in (1, 2) or not all(part.isdigit() for part in parts):
+        raise ValueError('{!r} is not a port or a from-to port range'.format(value))
+    from_port, to_port = int(parts[0]), int(parts[-1])
+    if not 0 <= from_port <= to_port <= 65535:
+        raise ValueError('{!r} is not a valid port range within 0-65535'.format(value))
+    return from_port, to_port
+
+
+def _parse_inbound(section: _Section, with_ports: bool) -> Inbound:
+    ports = []
+    if with_ports:
+        raw_ports = section.data.get('port')
+        if not isinstance(raw_ports, list) or not raw_ports:
+            section.fail('expected a non-empty list of ports', 'port')
+        for index, port in enumerate(raw_ports):
+            try:
+                ports.append(parse_port_range(port))
+            except ValueError as error:
+                section.fail(str(error), 'port[{}]'.format(index))
+    return Inbound(ip=section.cidr('ip'), description=section.get('description', required=True), ports=ports)
+
+
+def _parse_security_group(section: _Section) -> SecurityGroupConfig:
+    return SecurityGroupConfig(
+        max_rules=section.int_in_range('max_rules', 1, SECURITY_GROUP_MAX_RULES, default=60),
+        prefix_list_min_entries=section.int_in_range('prefix_list_min_entries', 2, SECURITY_GROUP_MAX_RULES,
+                                                     required=False)
+    )
+
+
+def _resolve_instance_type(section: _Section, key: str, rds: bool = False) -> str:
+    catalog = load_catalog()
+    try:
+        if isinstance(section.data.get(key), dict):
+            requirement = section.child(key)
+            classes = requirement.data.get('classes')
+            spec = catalog.smallest(
+                min_vcpu=requirement.get('min_vcpu', int, default=0),
+                min_memory_gib=requirement.get('min_memory_gib', float, default=0),
+                classes=[str(instance_class) for instance_class in classes] if classes else None,
+                rds=rds,
+                burstable=requirement.get('burstable', bool, default=False)
+            )
+        else:
+            type_str = str(section.get(key, required=True))
+            if not rds and INSTANCE_TYPE_PATTERN.match(type_str) and type_str.split('.')[0] not in catalog.classes():
+                # The catalog lists every size of its families only, EC2 takes types of other families as they are.
+                return type_str
+            spec = catalog.get(type_str, rds=rds)
+    except InstanceTypeError as error:
+        section.fail(str(error), key)
+    return spec.name
+
+
+def _parse_fleet(section: _Section) -> FleetConfig:
+    load_balancer = section.child('load_balancer')
+    load_balancer_type = load_balancer.choice('type', tuple(LOAD_BALANCER_PROTOCOLS), default='application')
+    listeners = []
+    enabled = load_balancer.get('enabled', bool, default=False)
+    for listener in load_balancer.items('listeners', required=enabled):
+        port = listener.int_in_range('port', 1, 65535)
+        protocol = listener.choice('protocol', LOAD_BALANCER_PROTOCOLS[load_balancer_type],
+                                   default=LOAD_BALANCER_PROTOCOLS[load_balancer_type][0])
+        certificate_arn = listener.get('certificate_arn')
+        if protocol in ('HTTPS', 'TLS') and not certificate_arn:
+            listener.fail('is required for {} listeners'.format(protocol), 'certificate_arn')
+        listeners.append(ListenerConfig(
+            port=port, protocol=protocol,
+            target_port=listener.int_in_range('target_port', 1, 65535, default=port),
+            target_protocol=listener.choice('target_protocol', ('HTTP', 'HTTPS'), default='HTTP'),
+            certificate_arn=certificate_arn
+        ))
+
+    mode = section.choice('mode', FLEET_MODES, default='single')
+    subnets = section.data.get('subnets') or ['public']
+    for subnet in subnets:
+        if subnet not in SUBNET_TIERS:
+            section.fail('{!r} is not one of {}'.format(subnet, ', '.join(SUBNET_TIERS)), 'subnets')
+    min_capacity = section.int_in_range('min_capacity', 0, 1000, default=1)
+    max_capacity = section.int_in_range('max_capacity', 1, 1000, default=max(min_capacity, 1))
+    desired_capacity = section.int_in_range('desired_capacity', 0, 1000, required=False)
+    if min_capacity > max_capacity:
+        section.fail('min_capacity {} is greater than max_capacity {}'.format(min_capacity, max_capacity))
+    if desired_capacity is not None and not min_capacity <= desired_capacity <= max_capacity:
+        section.fail('{} is outside min_capacity-max_capacity'.format(desired_capacity), 'desired_capacity')
+    return FleetConfig(
+        mode=mode,
+        count=section.int_in_range('count', 1, 100, default=1),
+        subnets=list(subnets),
+        min_capacity=min_capacity,
+        max_capacity=max_capacity,
+        desired_capacity=desired_capacity,
+        cpu_target_utilization=section.int_in_range('cpu_target_utilization', 1, 100, required=False),
+        load_balancer=LoadBalancerConfig(
+            enabled=enabled,
+            type=load_balancer_type,
+            internet_facing=load_balancer.get('internet_facing', bool, default=True),
+            health_check_path=load_balancer.get('health_check_path', default='/'),
+            listeners=listeners
+        )
+    )
+
+
+def _parse_block_device(section: _Section) -> BlockDeviceConfig:
+    name = section.get('name', required=True)
+    volume_type = section.choice('volume_type', EBS_VOLUME_TYPES, default='gp2')
+    iops = section.get('iops', int)
+    throughput = section.get('throughput', int)
+    if volume_type in ('gp2', 'st1'):
+        size = section.int_in_range('size', 125 if volume_type == 'st1' else 1, EBS_MAX_SIZE)
+        if iops is not None or throughput is not None:
+            section.fail('iops and throughput are not supported by {}'.format(volume_type), 'volume_type')
+        if volume_type == 'st1' and name in EBS_ROOT_DEVICE_NAMES:
+            section.fail('st1 cannot be used as a boot volume', 'volume_type')
+    elif volume_type == 'gp3':
+        size = section.int_in_range('size', 1, EBS_MAX_SIZE)
+        iops = section.int_in_range('iops', 3000, 16000, required=False)
+        throughput = section.int_in_range('throughput', 125, 1000, required=False)
+        if throughput is not None and throughput > (iops or 3000) / 4:
+            section.fail('gp3 throughput {} MiB/s exceeds a quarter of the iops'.format(throughput), 'throughput')
+    else:
+        size = section.int_in_range('size', 4, EBS_MAX_SIZE)
+        iops = section.int_in_range('iops', 100, 64000)
+        max_ratio = 50 if volume_type == 'io1' else 500
+        if iops > size * max_ratio:
+            section.fail('{} allows at most {} iops per GiB, got {} for {} GiB'.format(
+                volume_type, max_ratio, iops, size), 'iops')
+        if throughput is not None:
+            section.fail('is only supported by gp3', 'throughput')
+    kms = section.get('kms', bool, default=False)
+    return BlockDeviceConfig(
+        name=name,
+        size=size,
+        volume_type=volume_type,
+        iops=iops,
+        throughput=throughput,
+        encrypted=section.get('encrypted', bool, default=False) or kms,
+        kms=kms,
+        delete_on_termination=section.get('delete_on_termination', bool, default=True)
+    )
+
+
+def parse_ec2_config(data, source: str = 'ec2_config.yaml') -> EC2Config:
+    section = _Section(source, data)
+    ami = section.get('ami', required=True)
+    if not AMI_PATTERN.match(ami):
+        section.fail('{!r} is not an AMI id'.format(ami), 'ami')
+    block_devices = [_parse_block_device(device) for device in section.items('block_devices')]
+    names = [device.name for device in block_devices]
+    if len(set(names)) != len(names):
+        section.fail('device names must be unique, got {}'.format(names), 'block_devices')
+    instance_type = _resolve_instance_type(section, 'type')
+    spec = load_catalog().find(instance_type)
+    ebs_optimized = section.get('ebs_optimized', bool)
+    if ebs_optimized and spec is not None and spec.ebs_optimized_support == 'unsupported':
+        section.fail('{} does not support EBS optimization'.format(instance_type), 'ebs_optimized')
+    instance_store = section.get('instance_store', bool, default=False)
+    if instance_store and spec is None:
+        section.fail('{} is not in the instance type catalog, its instance store is unknown'.format(instance_type),
+                     'instance_store')
+    if instance_store and not spec.instance_store_disks:
+        section.fail('{} has no instance store volumes'.format(instance_type), 'instance_store')
+    instance_store_volumes = spec.instance_store_disks if instance_store else 0
+    if instance_store_volumes and any(re.match(r'^xvdc[a-z]$', name) for name in names):
+        section.fail('xvdca to xvdcz are kept for the instance store volumes, got {}'.format(names), 'block_devices')
+    fleet = _parse_fleet(section.child('fleet'))
+    if fleet.mode == 'auto_scaling' and any(device.kms for device in block_devices):
+        section.fail('launch configurations cannot use the KMS stack key, use encrypted without kms',
+                     'block_devices')
+    return EC2Config(
+        ami=ami,
+        type=instance_type,
+        block_devices=block_devices,
+        inbounds=[_parse_inbound(inbound, with_ports=True) for inbound in section.items('inbounds')],
+        fleet=fleet,
+        ebs_optimized=ebs_optimized,
+        instance_store_volumes=instance_store_volumes,
+        security_group=_parse_security_group(section.child('security_group'))
+    )
+
+
+def _parse_rds_storage(section: _Section, storage: int) -> tuple:
+    storage_type = section.choice('storage_type', RDS_STORAGE_TYPES, default='gp2')
+    iops = section.get('iops', int)
+    storage_throughput = section.get('storage_throughput', int)
+    if storage_type == 'gp2':
+        if iops is not None or storage_throughput is not None:
+            section.fail('iops and storage_throughput are not supported by gp2', 'storage_type')
+    elif storage_type == 'io1':
+        if storage < 100:
+            section.fail('io1 needs at least 100 GiB, got {}'.format(storage), 'storage')
+        iops = section.int_in_range('iops', 1000, 64000)
+        if not storage <= iops <= storage * 50:
+            section.fail('io1 iops must be 1-50 times the storage size {}, got {}'.format(storage, iops), 'iops')
+        if storage_throughput is not None:
+            section.fail('is only supported by gp3', 'storage_throughput')
+    else:
+        iops = section.int_in_range('iops', 3000, 16000, required=False)
+        storage_throughput = section.int_in_range('storage_throughput', 125, 1000, required=False)
+        if storage_throughput is not None and storage_throughput > (iops or 3000) / 4:
+            section.fail('gp3 throughput {} MiB/s exceeds a quarter of the iops'.format(storage_throughput),
+                         'storage_throughput')
+    return storage_type, iops, storage_throughput
+
+
+def parse_rds_config(data, source: str = 'rds_config.yaml') -> RDSConfig:
+    section = _Section(source, data)
+    master_user = section.child('master_user')
+    password = master_user.child('password')
+    rds_port = section.int_in_range('rds_port', 1150, 65535)
+    if rds_port in SQL_SERVER_RESERVED_PORTS:
+        section.fail('{} is reserved by SQL Server on RDS'.format(rds_port), 'rds_port')
+    storage = section.int_in_range('storage', RDS_MIN_STORAGE, RDS_MAX_STORAGE)
+    max_storage = section.int_in_range('max_storage', RDS_MIN_STORAGE, RDS_MAX_STORAGE, required=False)
+    if max_storage is not None and max_storage <= storage:
+        section.fail('{} must be greater than storage {}'.format(max_storage, storage), 'max_storage')
+    backup_window = section.get('backup_window', required=True)
+    match = BACKUP_WINDOW_PATTERN.match(backup_window)
+    if not match:
+        section.fail('{!r} is not a window such as 19:00-19:30'.format(backup_window), 'backup_window')
+    start_hour, start_minute, end_hour, end_minute = (int(part) for part in match.groups())
+    if ((end_hour * 60 + end_minute) - (start_hour * 60 + start_minute)) % (24 * 60) < 30:
+        section.fail('{!r} must be at least 30 minutes long'.format(backup_window), 'backup_window')
+    storage_type, iops, storage_throughput = _parse_rds_storage(section, storage)
+    edition = section.choice('edition', RDS_EDITIONS, default='se')
+    engine_version = section.get('engine_version', default='12.00.5571.0.v1')
+    engine_version_match = RDS_ENGINE_VERSION_PATTERN.match(engine_version)
+    if not engine_version_match:
+        section.fail('{!r} is not a SQL Server version such as 15.00.4073.23.v1'.format(engine_version),
+                     'engine_version')
+    multi_az = section.get('multi_az', bool, default=False)
+    monitoring_interval = section.get('monitoring_interval', int, default=0)
+    if monitoring_interval not in RDS_MONITORING_INTERVALS:
+        section.fail('{} is not one of {}'.format(monitoring_interval, RDS_MONITORING_INTERVALS),
+                     'monitoring_interval')
+    performance_insights = section.child('performance_insights')
+    retention_days = performance_insights.get('retention_days', int, default=7)
+    if retention_days not in RDS_PERFORMANCE_INSIGHTS_RETENTION_DAYS:
+        performance_insights.fail(
+            '{} is not one of {}'.format(retention_days, RDS_PERFORMANCE_INSIGHTS_RETENTION_DAYS), 'retention_days')
+    read_replicas = [ReadReplicaConfig(type=_resolve_instance_type(replica, 'type', rds=True))
+                     for replica in section.items('read_replicas', required=False)]
+    if read_replicas and (edition != 'ee' or not multi_az):
+        section.fail('SQL Server read replicas need edition ee and multi_az', 'read_replicas')
+    if read_replicas and int(engine_version_match.group(1)) < RDS_READ_REPLICA_MIN_VERSION:
+        section.fail('SQL Server read replicas need engine_version {}.00 or later, got {!r}'.format(
+            RDS_READ_REPLICA_MIN_VERSION, engine_version), 'read_replicas')
+    log_exports = section.data.get('cloudwatch_logs_exports') or []
+    for log_export in log_exports:
+        if log_export not in RDS_LOG_EXPORTS:
+            section.fail('{!r} is not one of {}'.format(log_export, ', '.join(RDS_LOG_EXPORTS)),
+                         'cloudwatch_logs_exports')
+    return RDSConfig(
+        master_user=MasterUserConfig(
+            name=master_user.get('name', required=True),
+            secret_id=password.get('secret_id', required=True),
+            json_field=password.get('json_field', required=True)
+        ),
+        rds_port=rds_port,
+        type=_resolve_instance_type(section, 'type', rds=True),
+        storage=storage,
+        max_storage=max_storage,
+        collation=section.get('collation', required=True),
+        timezone=section.get('timezone', required=True),
+        backup_retention_days=section.int_in_range('backup_retention_days', 0, 35),
+        backup_window=backup_window,
+        cloudwatch_logs_exports=list(log_exports),
+        inbounds=[_parse_inbound(inbound, with_ports=False) for inbound in section.items('inbounds', required=False)],
+        edition=edition,
+        engine_version=engine_version,
+        storage_type=storage_type,
+        iops=iops,
+        storage_throughput=storage_throughput,
+        multi_az=multi_az,
+        performance_insights=PerformanceInsightsConfig(
+            enabled=performance_insights.get('enabled', bool, default=False),
+            retention_days=retention_days
+        ),
+        monitoring_interval=monitoring_interval,
+        read_replicas=read_replicas,
+        security_group=_parse_security_group(section.child('security_group'))
+    )
+
+
+def _parse_vpc(section: _Section, prefix_length: int, aws_region: str) -> VPCConfig:
+    max_azs = section.int_in_range('max_azs', 1, 6, default=2)
+    subnet_count = len(SUBNET_TIERS) * max_azs
+    if subnet_count > 2 ** max(SUBNET_PREFIX_LENGTH - prefix_length, 0):
+        section.fail('{} /{} subnets do not fit in a /{} vpc_cidr'.format(
+            subnet_count, SUBNET_PREFIX_LENGTH, prefix_length), 'max_azs')
+    nat_gateways = section.int_in_range('nat_gateways', 1, max_azs, required=False)
+    nat_provider = section.choice('nat_provider', NAT_PROVIDERS, default='gateway')
+    nat_instance_type = _resolve_instance_type(section, 'nat_instance_type') \
+        if section.data.get('nat_instance_type') else 't3.small'
+    nat_instance_ami = section.get('nat_instance_ami')
+    if nat_instance_ami is not None and not AMI_PATTERN.match(nat_instance_ami):
+        section.fail('{!r} is not an AMI id'.format(nat_instance_ami), 'nat_instance_ami')
+    endpoints = {}
+    for key, choices in (('gateway_endpoints', GATEWAY_ENDPOINTS), ('interface_endpoints', INTERFACE_ENDPOINTS)):
+        endpoints[key] = [str(name) for name in section.data.get(key) or []]
+        for name in endpoints[key]:
+            if name not in choices:
+                section.fail('{!r} is not one of {}'.format(name, ', '.join(choices)), key)
+    return VPCConfig(
+        max_azs=max_azs,
+        nat_gateways=nat_gateways,
+        nat_provider=nat_provider,
+        nat_instance_type=nat_instance_type,
+        nat_instance_ami=nat_instance_ami,
+        gateway_endpoints=endpoints['gateway_endpoints'],
+        interface_endpoints=endpoints['interface_endpoints'],
+        # Interface endpoints in the China regions are named cn.com.amazonaws.<region>.<service>.
+        interface_endpoint_prefix=section.get('interface_endpoint_prefix') or (
+            'cn.com.amazonaws' if aws_region.startswith('cn-') else None)
+    )
+
+
+def _parse_cache(section: _Section) -> CacheConfig:
+    node_type = section.get('node_type', default='cache.t3.micro')
+    if not CACHE_NODE_TYPE_PATTERN.match(node_type):
+        section.fail('{!r} is not a node type such as cache.t3.micro'.format(node_type), 'node_type')
+    return CacheConfig(
+        enabled=section.get('enabled', bool, default=False),
+        node_type=node_type,
+        engine_version=section.get('engine_version', default='6.x'),
+        replicas=section.int_in_range('replicas', 0, CACHE_MAX_REPLICAS, default=0),
+        port=section.int_in_range('port', 1024, 65535, default=6379),
+        subnets=section.choice('subnets', CACHE_SUBNET_TIERS, default='isolated'),
+        at_rest_encryption=section.get('at_rest_encryption', bool, default=True),
+        transit_encryption=section.get('transit_encryption', bool, default=False)
+    )
+
+
+def _parse_monitoring(section: _Section) -> MonitoringConfig:
+    alarm_email = section.get('alarm_email')
+    if alarm_email is not None and not EMAIL_PATTERN.match(alarm_email):
+        section.fail('{!r} is not an email address'.format(alarm_email), 'alarm_email')
+    disk_queue_length = section.get('disk_queue_length', float, default=4)
+    if disk_queue_length <= 0:
+        section.fail('must be greater than 0', 'disk_queue_length')
+    return MonitoringConfig(
+        enabled=section.get('enabled', bool, default=False),
+        alarm_email=alarm_email,
+        agent_interval=section.int_in_range('agent_interval', 1, 3600, default=60),
+        cpu_percent=section.int_in_range('cpu_percent', 1, 100, default=80),
+        cpu_credit_balance=section.int_in_range('cpu_credit_balance', 0, 10000, default=20),
+        disk_queue_length=disk_queue_length,
+        rds_latency_ms=section.int_in_range('rds_latency_ms', 1, 60000, default=20),
+        rds_burst_balance_percent=section.int_in_range('rds_burst_balance_percent', 1, 100, default=20),
+        rds_free_storage_percent=section.int_in_range('rds_free_storage_percent', 1, 99, default=10),
+        rds_connections=section.int_in_range('rds_connections', 1, 100000, required=False)
+    )
+
+
+def _parse_cron(section: _Section, key: str, default: str) -> str:
+    value = section.get(key, default=default)
+    fields = value.upper().split()
+    if len(fields) != 5 or not all(CRON_FIELD_PATTERN.match(part) for part in fields):
+        section.fail('{!r} is not a cron expression such as {!r}'.format(value, default), key)
+    if fields[4] != '*' and any(character.isdigit() for character in fields[4]):
+        # EventBridge counts week days from 1 and unix cron from 0, names mean the same to both.
+        section.fail('use day names such as MON-FRI for the week day, got {!r}'.format(fields[4]), key)
+    if fields[2] != '*' and fields[4] != '*':
+        section.fail('{!r} sets both the day of month and the week day'.format(value), key)
+    return ' '.join(fields)
+
+
+def _parse_schedule_target(section: _Section, base_type: Optional[str], rds: bool) -> ScheduleTargetConfig:
+    action = section.choice('action', SCHEDULE_ACTIONS, default='none')
+    if action != 'resize':
+        return ScheduleTargetConfig(action=action)
+    instance_type = _resolve_instance_type(section, 'type', rds=rds)
+    catalog = load_catalog()
+    spec, base_spec = catalog.find(instance_type), catalog.find(base_type) if base_type is not None else None
+    # Types outside the catalog can only be told apart by name.
+    if instance_type == base_type or (spec is not None and base_spec is not None and (
+            spec.vcpu > base_spec.vcpu or spec.memory_gib > base_spec.memory_gib)):
+        section.fail('{} is not smaller than {}'.format(instance_type, base_type), 'type')
+    return ScheduleTargetConfig(action=action, type=instance_type)
+
+
+def _parse_schedule(section: _Section, ec2_config: Optional[EC2Config],
+                    rds_config: Optional[RDSConfig]) -> ScheduleConfig:
+    enabled = section.get('enabled', bool, default=False)
+    if not enabled:
+        # A disabled schedule acts on nothing, so it is not held to the EC2 and RDS configs.
+        ec2_config = rds_config = None
+    scale_down = _parse_cron(section, 'scale_down', ScheduleConfig.scale_down)
+    scale_up = _parse_cron(section, 'scale_up', ScheduleConfig.scale_up)
+    if scale_down == scale_up:
+        section.fail('scale_down and scale_up are both {!r}'.format(scale_down))
+    ec2 = _parse_schedule_target(section.child('ec2'), ec2_config.type if ec2_config else None, rds=False)
+    if ec2.action == 'resize' and ec2_config is not None and ec2_config.fleet.mode == 'auto_scaling':
+        section.child('ec2').fail('auto_scaling fleets can only be stopped, resize them in ec2_config.yaml', 'action')
+    rds = _parse_schedule_target(section.child('rds'), rds_config.type if rds_config else None, rds=True)
+    if rds.action == 'stop' and rds_config is not None and (rds_config.multi_az or rds_config.read_replicas):
+        section.child('rds').fail('SQL Server instances with multi_az or read replicas cannot be stopped', 'action')
+    return ScheduleConfig(
+        enabled=enabled,
+        scale_down=scale_down,
+        scale_up=scale_up,
+        ec2=ec2,
+        rds=rds
+    )
+
+
+def parse_app_config(data, source: str = 'config.yaml', ec2_config: EC2Config = None,
+                     rds_config: RDSConfig = None) -> AppConfig:
+    section = _Section(source, data)
+    vpc_cidr = section.cidr('vpc_cidr')
+    prefix_length = ipaddress.IPv4Network(vpc_cidr).prefixlen
+    if not 16 <= prefix_length <= 28:
+        section.fail('prefix length /{} is outside /16-/28'.format(prefix_length), 'vpc_cidr')
+    return AppConfig(
+        project=section.get('project', required=True).lower().replace(' ', '-'),
+        environment=section.get('environment', required=True),
+        vpc_cidr=vpc_cidr,
+        aws_region=section.get('aws_region', required=True),
+        aws_tags=dict(section.child('aws_tags').data),
+        vpc=_parse_vpc(section.child('vpc'), prefix_length, section.get('aws_region', required=True)),
+        cache=_parse_cache(section.child('cache')),
+        monitoring=_parse_monitoring(section.child('monitoring')),
+        schedule=_parse_schedule(section.child('schedule'), ec2_config, rds_config)
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def load_yaml(path: str):
+    with open(path, 'r', encoding='UTF-8') as file:
+        return yaml.load(file, Loader=SafeLoader)
+
+
+def build_config(app_data: dict, ec2_path: str = EC2_CONFIG_PATH, rds_path: str = RDS_CONFIG_PATH) -> Config:
+    ec2 = parse_ec2_config(load_yaml(ec2_path), source=os.path.relpath(ec2_path, ROOT_DIR))
+    rds = parse_rds_config(load_yaml(rds_path), source=os.path.relpath(rds_path, ROOT_DIR))
+    return Config(app=parse_app_config(app_data, ec2_config=ec2, rds_config=rds), ec2=ec2, rds=rds)
+
+
+@functools.lru_cache(maxsize=None)
+def load_config(path: str = CONFIG_PATH, ec2_path: str = EC2_CONFIG_PATH, rds_path: str = RDS_CONFIG_PATH) -> Config:
+    return build_config(load_yaml(path), ec2_path, rds_path)
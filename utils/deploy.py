@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Set
+
+STACK_ARTIFACT_TYPE = 'aws:cloudformation:stack'
+
+
+class DeployError(Exception):
+    pass
+
+
+@dataclass
+class StackInfo:
+    name: str
+    exports: Set[str] = field(default_factory=set)
+    imports: Set[str] = field(default_factory=set)
+    dependencies: Set[str] = field(default_factory=set)
+
+
+def _find_imports(node, found: set) -> set:
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == 'Fn::ImportValue' and isinstance(value, str):
+                found.add(value)
+            else:
+                _find_imports(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            _find_imports(item, found)
+    return found
+
+
+def read_assembly(assembly_dir: str) -> dict:
+    with open(os.path.join(assembly_dir, 'manifest.json'), 'r', encoding='UTF-8') as file:
+        manifest = json.load(file)
+    artifacts = manifest.get('artifacts', {})
+    stacks = {}
+    for artifact_id, artifact in artifacts.items():
+        if artifact.get('type') != STACK_ARTIFACT_TYPE:
+            continue
+        properties = artifact.get('properties', {})
+        with open(os.path.join(assembly_dir, properties['templateFile']), 'r', encoding='UTF-8') as file:
+            template = json.load(file)
+        stack_name = properties.get('stackName', artifact_id)
+        stacks[stack_name] = StackInfo(
+            name=stack_name,
+            exports={output['Export']['Name'] for output in template.get('Outputs', {}).values()
+                     if isinstance(output.get('Export', {}).get('Name'), str)},
+            imports=_find_imports(template.get('Resources', {}), set()) | _find_imports(template.get('Outputs', {}),
+                                                                                         set()),
+            dependencies={
+                artifacts[dependency].get('properties', {}).get('stackName', dependency)
+                for dependency in artifact.get('dependencies', [])
+                if artifacts.get(dependency, {}).get('type') == STACK_ARTIFACT_TYPE
+            }
+        )
+    return stacks
+
+
+def dependency_graph(stacks: dict) -> dict:
+    exporters = {}
+    for stack in stacks.values():
+        for export_name in stack.exports:
+            exporters[export_name] = stack.name
+    graph = {}
+    for stack in stacks.values():
+        graph[stack.name] = set(stack.dependencies)
+        for import_name in stack.imports:
+            exporter = exporters.get(import_name)
+            if exporter and exporter != stack.name:
+                graph[stack.name].add(exporter)
+    return graph
+
+
+def external_imports(stacks: dict) -> dict:
+    exports = {export_name for stack in stacks.values() for export_name in stack.exports}
+    return {stack.name: sorted(stack.imports - exports) for stack in stacks.values() if stack.imports - exports}
+
+
+def select(graph: dict, names: list) -> dict:
+    selected = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in graph:
+            raise DeployError('Unknown stack {!r}, expected one of {}'.format(name, ', '.join(sorted(graph))))
+        if name not in selected:
+            selected.add(name)
+            pending.extend(graph[name])
+    return {name: graph[name] & selected for name in selected}
+
+
+def levels(graph: dict) -> list:
+    remaining = {name: set(dependencies) for name, dependencies in graph.items()}
+    result = []
+    while remaining:
+        ready = sorted(name for name, dependencies in remaining.items() if not dependencies)
+        if not ready:
+            raise DeployError('Dependency cycle between stacks: {}'.format(', '.join(sorted(remaining))))
+        result.append(ready)
+        for name in ready:
+            del remaining[name]
+        for dependencies in remaining.values():
+            dependencies.difference_update(ready)
+    return result
+
+
+class CdkDeployer(object):
+    def __init__(self, assembly_dir: str, extra_args: list = None):
+        self.assembly_dir = assembly_dir
+        self.extra_args = extra_args or []
+
+    def deploy(self, stack_name: str) -> None:
+        command = ['cdk', 'deploy', stack_name, '--app', self.assembly_dir, '--exclusively',
+                   '--require-approval', 'never'] + self.extra_args
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        if completed.returncode != 0:
+            raise DeployError('{} failed:\n{}'.format(' '.join(command), completed.stdout.decode(errors='replace')))
+
+
+class LocalDeployer(object):
+    def __init__(self, delay: float = 0, failures: dict = None):
+        self.delay = delay
+        self.failures = dict(failures or {})
+        self.deployed = []
+        self._lock = threading.Lock()
+
+    def deploy(self, stack_name: str) -> None:
+        time.sleep(self.delay)
+        with self._lock:
+            if self.failures.get(stack_name, 0) > 0:
+                self.failures[stack_name] -= 1
+                raise DeployError('{} failed'.format(stack_name))
+            self.deployed.append(stack_name)
+
+
+class Orchestrator(object):
+    def __init__(self, deployer, max_workers: int = 3, retries: int = 2, retry_delay: float = 30, log=print):
+        self.deployer = deployer
+        self.max_workers = max_workers
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.log = log
+
+    def _deploy_with_retries(self, stack_name: str) -> float:
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                self.deployer.deploy(stack_name)
+                return time.perf_counter() - start
+            except Exception as error:
+                if attempt == self.retries:
+                    raise
+                self.log('{} attempt {} failed, retrying: {}'.format(stack_name, attempt + 1, error))
+                time.sleep(self.retry_delay * (2 ** attempt))
+
+    def run(self, graph: dict) -> dict:
+        levels(graph)
+        pending = {name: set(dependencies) for name, dependencies in graph.items()}
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                for name in sorted(name for name, dependencies in pending.items() if not dependencies):
+                    if len(running) >= self.max_workers:
+                        break
+                    del pending[name]
+                    self.log('deploying {}'.format(name))
+                    running[executor.submit(self._deploy_with_retries, name)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        seconds = future.result()
+                        results[name] = {'status': 'deployed', 'seconds': seconds}
+                        self.log('deployed {} in {:.1f}s'.format(name, seconds))
+                        for dependencies in pending.values():
+                            dependencies.discard(name)
+                    except Exception as error:
+                        results[name] = {'status': 'failed', 'error': str(error)}
+                        self.log('failed {}: {}'.format(name, error))
+                        self._skip_dependents(name, pending, results)
+        return results
+
+    def _skip_dependents(self, failed: str, pending: dict, results: dict) -> None:
+        blocked = [failed]
+        while blocked:
+            name = blocked.pop()
+            for dependent in [dependent for dependent, dependencies in pending.items() if name in dependencies]:
+                del pending[dependent]
+                results[dependent] = {'status': 'skipped', 'error': 'depends on {}'.format(name)}
+                blocked.append(dependent)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Deploy the stacks of a cloud assembly in dependency order.')
+    parser.add_argument('stacks', nargs='*', help='stacks to deploy with their dependencies, default all')
+    parser.add_argument('--app', default='cdk.out', help='synthesized cloud assembly directory')
+    parser.add_argument('--workers', type=int, default=3, help='stacks deployed at the same time')
+    parser.add_argument('--retries', type=int, default=2, help='retries per stack after a failure')
+    parser.add_argument('--retry-delay', type=float, default=30, help='seconds before the first retry')
+    parser.add_argument('--dry-run', action='store_true', help='print the deployment waves and exit')
+    args = parser.parse_args(argv)
+
+    stacks = read_assembly(args.app)
+    graph = dependency_graph(stacks)
+    if args.stacks:
+        graph = select(graph, args.stacks)
+    for stack_name, import_names in sorted(external_imports(stacks).items()):
+        if stack_name in graph:
+            print('{} imports exports from outside the assembly: {}'.format(stack_name, ', '.join(import_names)))
+    for index, wave in enumerate(levels(graph)):
+        print('wave {}: {}'.format(index + 1, ', '.join(wave)))
+    if args.dry_run:
+        return 0
+
+    orchestrator = Orchestrator(CdkDeployer(args.app), max_workers=args.workers, retries=args.retries,
+                                retry_delay=args.retry_delay)
+    results = orchestrator.run(graph)
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return 0 if all(result['status'] == 'deployed' for result in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import argparse
+import os
+
+import boto3
+
+OUTPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance_types.yaml')
+FAMILIES = ['t2', 't3', 'm4', 'm5', 'm5d', 'm6i', 'r5', 'r5d', 'r6i', 'x1e', 'c5']
+HEADER = '---\n# Instance types the config may name, refresh with utils/generate_instance_types.py.\n'
+
+
+def describe_instance_types(client, families: list) -> list:
+    paginator = client.get_paginator('describe_instance_types')
+    instance_types = []
+    for page in paginator.paginate(Filters=[{'Name': 'instance-type', 'Values': [f + '.*' for f in families]}]):
+        instance_types.extend(page['InstanceTypes'])
+    return instance_types
+
+
+def orderable_db_instance_classes(client, engine: str) -> set:
+    paginator = client.get_paginator('describe_orderable_db_instance_options')
+    classes = set()
+    for page in paginator.paginate(Engine=engine):
+        for option in page['OrderableDBInstanceOptions']:
+            classes.add(option['DBInstanceClass'][len('db.'):])
+    return classes
+
+
+def render(instance_types: list, rds_classes: set) -> str:
+    def sort_key(instance_type):
+        family = instance_type['InstanceType'].split('.')[0]
+        return (FAMILIES.index(family), instance_type['VCpuInfo']['DefaultVCpus'],
+                instance_type['MemoryInfo']['SizeInMiB'], instance_type.get('BareMetal', False))
+
+    lines = [HEADER]
+    for instance_type in sorted(instance_types, key=sort_key):
+        name = instance_type['InstanceType']
+        memory_gib = instance_type['MemoryInfo']['SizeInMiB'] / 1024
+        lines.append(
+            "{}:\n  vcpu: {}\n  memory_gib: {:g}\n  network_performance: '{}'\n  burstable: {}\n"
+            "  ebs_optimized_support: '{}'\n  nvme_support: '{}'\n  instance_store_gib: {}\n"
+            "  instance_store_disks: {}\n  rds_sql_server: {}\n".format(
+                name,
+                instance_type['VCpuInfo']['DefaultVCpus'],
+                memory_gib,
+                instance_type['NetworkInfo']['NetworkPerformance'],
+                str(instance_type.get('BurstablePerformanceSupported', False)).lower(),
+                instance_type['EbsInfo']['EbsOptimizedSupport'],
+                instance_type['EbsInfo'].get('NvmeSupport', 'unsupported'),
+                instance_type.get('InstanceStorageInfo', {}).get('TotalSizeInGB', 0),
+                sum(disk['Count'] for disk in instance_type.get('InstanceStorageInfo', {}).get('Disks', [])),
+                str(name in rds_classes).lower()
+            )
+        )
+    return ''.join(lines)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Regenerate the instance type catalog from the EC2 and RDS APIs.')
+    parser.add_argument('--region', default=os.getenv('AWS_DEFAULT_REGION'))
+    parser.add_argument('--engine', default='sqlserver-se', help='RDS engine whose orderable classes are marked')
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    args = parser.parse_args(argv)
+
+    instance_types = describe_instance_types(boto3.client('ec2', region_name=args.region), FAMILIES)
+    rds_classes = orderable_db_instance_classes(boto3.client('rds', region_name=args.region), args.engine)
+    with open(args.output, 'w', encoding='UTF-8') as file:
+        file.write(render(instance_types, rds_classes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+import argparse
+import dataclasses
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(ROOT_DIR, '.cache', 'synth')
+CACHE_FORMAT_VERSION = 1
+STACK_ARTIFACT_TYPE = 'aws:cloudformation:stack'
+COMMON_SOURCES = ['app.py', 'cdk.json', 'requirements.txt', 'utils/config.py']
+STACK_SOURCES = {
+    'vpc': ['stacks/vpc_stack.py', 'utils/pinned_exports.py'],
+    'ec2': ['stacks/ec2_stack.py', 'utils/keypair.py', 'utils/rds_instance_type.py', 'utils/instance_types.yaml',
+            'utils/security_group_rules.py', 'utils/cloudwatch_agent.py'],
+    'kms': ['stacks/kms_stack.py', 'utils/pinned_exports.py'],
+    'rds': ['stacks/rds_stack.py', 'utils/rds_instance_type.py', 'utils/instance_types.yaml',
+            'utils/security_group_rules.py'],
+    's3': ['stacks/s3_bucket_stack.py'],
+    'cache': ['stacks/cache_stack.py'],
+    'monitoring': ['stacks/monitoring_stack.py', 'utils/cloudwatch_agent.py', 'utils/rds_instance_type.py',
+                   'utils/instance_types.yaml'],
+    'schedule': ['stacks/schedule_stack.py', 'functions/scheduler/index.py']
+}
+
+
+class StaleCacheError(Exception):
+    pass
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _file_digest(path: str) -> str:
+    with open(os.path.join(ROOT_DIR, path), 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def config_inputs(config, name: str) -> dict:
+    inputs = {
+        'project': config.app.project,
+        'environment': config.app.environment,
+        'aws_region': config.app.aws_region,
+        'aws_tags': config.app.aws_tags,
+        'account': os.getenv('CDK_DEFAULT_ACCOUNT')
+    }
+    if name == 'vpc':
+        inputs.update(vpc_cidr=config.app.vpc_cidr, vpc=dataclasses.asdict(config.app.vpc))
+    elif name == 'ec2':
+        # The key pair name carries the synth date, see app.build_app.
+        inputs.update(ec2=dataclasses.asdict(config.ec2), monitoring=dataclasses.asdict(config.app.monitoring),
+                      date=datetime.datetime.now().strftime("%Y%m%d"))
+    elif name == 'rds':
+        inputs.update(rds=dataclasses.asdict(config.rds))
+    elif name == 'cache':
+        inputs.update(cache=dataclasses.asdict(config.app.cache))
+    elif name == 'monitoring':
+        inputs.update(monitoring=dataclasses.asdict(config.app.monitoring), ec2=dataclasses.asdict(config.ec2),
+                      rds=dataclasses.asdict(config.rds))
+    elif name == 'schedule':
+        inputs.update(schedule=dataclasses.asdict(config.app.schedule), ec2=dataclasses.asdict(config.ec2),
+                      rds=dataclasses.asdict(config.rds))
+    return inputs
+
+
+def stack_hashes(config, stack_names: list, upstream: dict) -> dict:
+    common = {path: _file_digest(path) for path in COMMON_SOURCES}
+    hashes = {}
+
+    def stack_hash(name):
+        if name not in hashes:
+            if name not in STACK_SOURCES:
+                raise KeyError('Stack {!r} has no entry in STACK_SOURCES'.format(name))
+            hashes[name] = _digest({
+                'version': CACHE_FORMAT_VERSION,
+                'common': common,
+                'sources': {path: _file_digest(path) for path in STACK_SOURCES[name]},
+                'config': config_inputs(config, name),
+                'upstream': {dependency: stack_hash(dependency) for dependency in sorted(upstream[name])}
+            })
+        return hashes[name]
+
+    for stack_name in stack_names:
+        stack_hash(stack_name)
+    return hashes
+
+
+def synth_stacks(config, outdir: str, stack_names: list) -> None:
+    from aws_cdk import core as cdk
+    from app import build_app
+
+    context = {'stacks': ','.join(stack_names)} if stack_names else {}
+    build_app(config, cdk.App(outdir=outdir, context=context)).synth()
+
+
+class TemplateCache(object):
+    def __init__(self, path: str = CACHE_DIR):
+        self.path = path
+
+    def _entry_path(self, stack_hash: str) -> str:
+        return os.path.join(self.path, stack_hash + '.json')
+
+    def get(self, stack_hash: str):
+        try:
+            with open(self._entry_path(stack_hash), 'r', encoding='UTF-8') as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            raise StaleCacheError('unreadable cache entry {}: {}'.format(stack_hash, error))
+        if entry.get('version') != CACHE_FORMAT_VERSION or entry.get('template_sha256') != _digest(entry['template']):
+            raise StaleCacheError('cache entry {} does not match its checksum'.format(stack_hash))
+        return entry
+
+    def set(self, stack_hash: str, artifact_id: str, artifact: dict, template: dict) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        entry = {'version': CACHE_FORMAT_VERSION, 'artifact_id': artifact_id, 'artifact': artifact,
+                 'template': template, 'template_sha256': _digest(template)}
+        tmp_path = self._entry_path(stack_hash) + '.tmp'
+        with open(tmp_path, 'w', encoding='UTF-8') as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, self._entry_path(stack_hash))
+
+
+def _cacheable(artifact: dict) -> bool:
+    # Stacks with file or image assets also need their asset directories, so they are always synthesized.
+    return not any(entry.get('type') == 'aws:cdk:asset'
+                   for entries in artifact.get('metadata', {}).values() for entry in entries)
+
+
+class IncrementalSynth(object):
+    def __init__(self, config, outdir: str = 'cdk.out', cache: TemplateCache = None, synth=synth_stacks, log=print):
+        import app
+
+        self.config = config
+        self.outdir = outdir
+        self.cache = cache or TemplateCache()
+        self.synth = synth
+        self.log = log
+        self.stack_names = list(app.STACK_NAMES)
+        self.upstream = {name: set(app.STACK_REFERENCES[name]) | set(app.STACK_IMPORTS[name])
+                         for name in self.stack_names}
+        self.imports = app.STACK_IMPORTS
+        self.consumers = {name: [consumer for consumer in self.stack_names if name in app.STACK_REFERENCES[consumer]]
+                          for name in self.stack_names}
+
+    def artifact_id(self, name: str) -> str:
+        return '-'.join([self.config.app.project, self.config.app.environment, name])
+
+    def run(self, full: bool = False) -> dict:
+        hashes = stack_hashes(self.config, self.stack_names, self.upstream)
+        cached = {}
+        if not full:
+            try:
+                for name in self.stack_names:
+                    entry = self.cache.get(hashes[name])
+                    if entry is not None:
+                        cached[name] = entry
+            except StaleCacheError as error:
+                self.log('{}, falling back to a full synth'.format(error))
+                cached = {}
+        # A rebuilt producer is synthesized with all of its consumers, so their references agree.
+        pending = [name for name in self.stack_names if name not in cached]
+        while pending:
+            for consumer in self.consumers[pending.pop()]:
+                if cached.pop(consumer, None) is not None:
+                    pending.append(consumer)
+        changed = [name for name in self.stack_names if name not in cached]
+
+        with tempfile.TemporaryDirectory() as synth_dir:
+            if changed:
+                self.synth(self.config, synth_dir, None if len(changed) == len(self.stack_names) else changed)
+                manifest = self._read_json(os.path.join(synth_dir, 'manifest.json'))
+            else:
+                manifest = self.cache_manifest()
+            artifacts = manifest.setdefault('artifacts', {})
+            for name in self.stack_names:
+                artifact_id = self.artifact_id(name)
+                artifact = artifacts.get(artifact_id)
+                if name not in changed:
+                    # A producer rebuilt only to resolve references is swapped for its cached copy, so cdk.out and the
+                    # cache only take templates whose inputs changed.
+                    artifacts.pop(artifact_id, None)
+                    entry = cached[name]
+                    if entry['artifact'] is not None:
+                        artifacts[artifact_id] = entry['artifact']
+                        self._write_json(os.path.join(synth_dir, entry['artifact']['properties']['templateFile']),
+                                         entry['template'])
+                elif artifact is not None and artifact.get('type') == STACK_ARTIFACT_TYPE:
+                    if _cacheable(artifact):
+                        template = self._read_json(os.path.join(synth_dir, artifact['properties']['templateFile']))
+                        self.cache.set(hashes[name], artifact_id, artifact, template)
+                else:
+                    # Disabled stacks are not synthesized; remember that so they do not force a synth next time.
+                    self.cache.set(hashes[name], artifact_id, None, None)
+            self._restore_import_dependencies(artifacts)
+            self._write_json(os.path.join(synth_dir, 'manifest.json'), manifest)
+            self._write_json(os.path.join(synth_dir, 'cdk.out'), {'version': manifest.get('version')})
+            if os.path.isdir(self.outdir):
+                shutil.rmtree(self.outdir)
+            shutil.copytree(synth_dir, self.outdir)
+        self.cache_manifest(manifest)
+        return {'synthesized': changed, 'reused': [name for name in self.stack_names if name not in changed]}
+
+    def _restore_import_dependencies(self, artifacts: dict) -> None:
+        # A partial synth only records dependencies between the stacks it built.
+        for name, dependencies in self.imports.items():
+            artifact = artifacts.get(self.artifact_id(name))
+            if artifact is None:
+                continue
+            for dependency in dependencies:
+                dependency_id = self.artifact_id(dependency)
+                if dependency_id in artifacts and dependency_id not in artifact.setdefault('dependencies', []):
+                    artifact['dependencies'].append(dependency_id)
+
+    def cache_manifest(self, manifest: dict = None) -> dict:
+        path = os.path.join(self.cache.path, 'manifest-{}.json'.format(self.artifact_id('base')))
+        if manifest is not None:
+            base = dict({key: value for key, value in manifest.items() if key != 'artifacts'}, artifacts={})
+            os.makedirs(self.cache.path, exist_ok=True)
+            self._write_json(path, base)
+            return base
+        try:
+            return self._read_json(path)
+        except (OSError, ValueError):
+            raise StaleCacheError('cached manifest {} is missing'.format(path))
+
+    @staticmethod
+    def _read_json(path: str):
+        with open(path, 'r', encoding='UTF-8') as file:
+            return json.load(file)
+
+    @staticmethod
+    def _write_json(path: str, value) -> None:
+        with open(path, 'w', encoding='UTF-8') as file:
+            json.dump(value, file, indent=1)
+
+
+def main(argv=None) -> int:
+    from utils.config import load_config
+
+    parser = argparse.ArgumentParser(description='Synthesize only the stacks whose inputs changed.')
+    parser.add_argument('--outdir', default='cdk.out', help='cloud assembly directory')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='content-addressed template cache')
+    parser.add_argument('--full', action='store_true', help='ignore the cache and synthesize every stack')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    incremental = IncrementalSynth(load_config(), outdir=args.outdir, cache=TemplateCache(args.cache_dir))
+    try:
+        result = incremental.run(full=args.full)
+    except StaleCacheError as error:
+        print('{}, falling back to a full synth'.format(error))
+        result = incremental.run(full=True)
+    print('synthesized: {}'.format(', '.join(result['synthesized']) or '-'))
+    print('reused: {}'.format(', '.join(result['reused']) or '-'))
+    print('{:.2f}s'.format(time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
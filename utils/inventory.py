@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import botocore
+
+from utils.cache import JsonFileCache
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'inventory.json')
+CACHE_TTL_SECONDS = 5 * 60
+FILTER_BATCH_SIZE = 200
+STACK_NAME_PATTERN = re.compile(r'^stack/(?P<name>[^/]+)/')
+EXPORT_PATTERN = re.compile(r'^(?P<output>InstanceId|InstancePublicIP|EndpointAddress|KeyId|BucketName)\d*$')
+EXPORT_FIELDS = {
+    ('ec2', 'InstanceId'): 'instance_ids',
+    ('ec2', 'InstancePublicIP'): 'public_ips',
+    ('rds', 'EndpointAddress'): 'rds_endpoints',
+    ('kms', 'KeyId'): 'kms_key_ids',
+    ('s3', 'BucketName'): 'buckets'
+}
+
+
+class ClientPool(object):
+    def __init__(self, session: boto3.session.Session = None, max_pool_connections: int = 50, client_factory=None):
+        self.session = session or boto3.session.Session()
+        self.config = botocore.config.Config(max_pool_connections=max_pool_connections,
+                                             retries={'max_attempts': 10, 'mode': 'adaptive'})
+        self.client_factory = client_factory or (
+            lambda service, region: self.session.client(service, region_name=region, config=self.config))
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, service: str, region: str):
+        with self._lock:
+            if (service, region) not in self._clients:
+                self._clients[(service, region)] = self.client_factory(service, region)
+            return self._clients[(service, region)]
+
+
+def _batches(values: list, size: int = FILTER_BATCH_SIZE):
+    values = sorted(set(values))
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def list_exports(client) -> list:
+    exports = []
+    for page in client.get_paginator('list_exports').paginate():
+        exports.extend(page['Exports'])
+    return exports
+
+
+def group_exports(exports: list, region: str) -> dict:
+    environments = {}
+    for export in exports:
+        match = STACK_NAME_PATTERN.match(export['ExportingStackId'].split(':', 5)[-1])
+        if match is None or '-' not in match.group('name'):
+            continue
+        stack_name = match.group('name')
+        environment_name, stack_suffix = stack_name.rsplit('-', 1)
+        prefix = stack_name.title().replace('-', '')
+        output = EXPORT_PATTERN.match(export['Name'][len(prefix):]) if export['Name'].startswith(prefix) else None
+        if output is None or (stack_suffix, output.group('output')) not in EXPORT_FIELDS:
+            continue
+        environment = environments.setdefault(environment_name, dict(
+            {field: [] for field in EXPORT_FIELDS.values()}, name=environment_name, region=region))
+        environment[EXPORT_FIELDS[(stack_suffix, output.group('output'))]].append(export['Value'])
+    return environments
+
+
+def describe_instances(client, instance_ids: list) -> dict:
+    instances = {}
+    paginator = client.get_paginator('describe_instances')
+    for batch in _batches(instance_ids):
+        for page in paginator.paginate(Filters=[{'Name': 'instance-id', 'Values': batch}]):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    instances[instance['InstanceId']] = {
+                        'state': instance['State']['Name'],
+                        'type': instance['InstanceType'],
+                        'key_name': instance.get('KeyName'),
+                        'private_ip': instance.get('PrivateIpAddress'),
+                        'public_ip': instance.get('PublicIpAddress')
+                    }
+    return instances
+
+
+def describe_db_instances(client, endpoint_addresses: list) -> dict:
+    identifiers = {address.split('.')[0]: address for address in endpoint_addresses}
+    db_instances = {}
+    paginator = client.get_paginator('describe_db_instances')
+    for batch in _batches(identifiers, size=100):
+        for page in paginator.paginate(Filters=[{'Name': 'db-instance-id', 'Values': batch}]):
+            for db_instance in page['DBInstances']:
+                address = db_instance.get('Endpoint', {}).get('Address') or identifiers.get(
+                    db_instance['DBInstanceIdentifier'])
+                db_instances[address] = {
+                    'identifier': db_instance['DBInstanceIdentifier'],
+                    'status': db_instance['DBInstanceStatus'],
+                    'class': db_instance['DBInstanceClass'],
+                    'multi_az': db_instance.get('MultiAZ', False),
+                    'allocated_storage': db_instance.get('AllocatedStorage')
+                }
+    return db_instances
+
+
+def describe_key_pairs(client, key_names: list) -> dict:
+    key_pairs = {}
+    for batch in _batches(key_names):
+        response = client.describe_key_pairs(Filters=[{'Name': 'key-name', 'Values': batch}])
+        for key_pair in response['KeyPairs']:
+            key_pairs[key_pair['KeyName']] = {'key_pair_id': key_pair.get('KeyPairId'),
+                                              'fingerprint': key_pair.get('KeyFingerprint')}
+    return key_pairs
+
+
+def region_inventory(pool: ClientPool, region: str) -> dict:
+    environments = group_exports(list_exports(pool.client('cloudformation', region)), region)
+    instance_ids = [value for environment in environments.values() for value in environment['instance_ids']]
+    endpoints = [value for environment in environments.values() for value in environment['rds_endpoints']]
+    instances = describe_instances(pool.client('ec2', region), instance_ids) if instance_ids else {}
+    db_instances = describe_db_instances(pool.client('rds', region), endpoints) if endpoints else {}
+    key_names = [instance['key_name'] for instance in instances.values() if instance['key_name']]
+    key_pairs = describe_key_pairs(pool.client('ec2', region), key_names) if key_names else {}
+    for environment in environments.values():
+        environment['instances'] = {instance_id: instances.get(instance_id, {'state': 'missing'})
+                                    for instance_id in environment.pop('instance_ids')}
+        environment['rds'] = {address: db_instances.get(address, {'status': 'missing'})
+                              for address in environment.pop('rds_endpoints')}
+        environment['key_pairs'] = {
+            instance['key_name']: key_pairs.get(instance['key_name'], {'key_pair_id': None})
+            for instance in environment['instances'].values() if instance.get('key_name')
+        }
+    return environments
+
+
+class Inventory(object):
+    def __init__(self, pool: ClientPool = None, cache: JsonFileCache = None, max_workers: int = 8,
+                 refresh: bool = False):
+        self.pool = pool or ClientPool()
+        self.cache = cache if cache is not None else JsonFileCache(CACHE_PATH, ttl=CACHE_TTL_SECONDS)
+        self.max_workers = max_workers
+        self.refresh = refresh
+
+    def _region(self, region: str) -> dict:
+        cache_key = JsonFileCache.make_key(self.pool.session.profile_name, region)
+        cached = None if self.refresh else self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        environments = region_inventory(self.pool, region)
+        self.cache.set(cache_key, environments)
+        return environments
+
+    def collect(self, regions: list, prefix: str = None) -> dict:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._region, regions))
+        environments = {}
+        for region, region_environments in zip(regions, results):
+            for name, environment in region_environments.items():
+                if prefix is None or name.startswith(prefix):
+                    environments['/'.join([region, name])] = environment
+        return environments
+
+
+def _format_table(environments: dict) -> str:
+    lines = []
+    for key, environment in sorted(environments.items()):
+        lines.append(key)
+        for instance_id, instance in sorted(environment['instances'].items()):
+            lines.append('  ec2 {} {} {} {}'.format(instance_id, instance.get('type', '-'), instance['state'],
+                                                   instance.get('public_ip') or instance.get('private_ip') or '-'))
+        for address, db_instance in sorted(environment['rds'].items()):
+            lines.append('  rds {} {} {}'.format(address, db_instance.get('class', '-'), db_instance['status']))
+        for key_name, key_pair in sorted(environment['key_pairs'].items()):
+            lines.append('  key pair {} {}'.format(key_name, key_pair['key_pair_id'] or 'missing'))
+        for key_id in environment['kms_key_ids']:
+            lines.append('  kms {}'.format(key_id))
+        for bucket in environment['buckets']:
+            lines.append('  s3 {}'.format(bucket))
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='List the resources of every deployed project environment.')
+    parser.add_argument('--region', action='append', dest='regions',
+                        help='region to scan, repeat for several, default AWS_DEFAULT_REGION')
+    parser.add_argument('--prefix', help='only environments whose stack names start with this, e.g. demo-dev')
+    parser.add_argument('--workers', type=int, default=8, help='regions scanned at the same time')
+    parser.add_argument('--refresh', action='store_true', help='ignore cached results')
+    parser.add_argument('--json', action='store_true', help='print JSON instead of a table')
+    args = parser.parse_args(argv)
+
+    regions = args.regions or [os.getenv('AWS_DEFAULT_REGION')]
+    inventory = Inventory(ClientPool(max_pool_connections=max(10, args.workers * 3)), max_workers=args.workers,
+                          refresh=args.refresh)
+    environments = inventory.collect(regions, prefix=args.prefix)
+    print(json.dumps(environments, indent=2, sort_keys=True) if args.json else _format_table(environments))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,28 +3,73 @@ import os
 import boto3
 import botocore
 
+from utils.cache import JsonFileCache
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'keypairs.json')
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
 
 class Keypair(object):
     def __init__(self, keypair_name: str, aws_tags: list):
         self.keypair = self.create_keypair(keypair_name, aws_tags)
 
     @staticmethod
-    def create_keypair(keypair_name: str, aws_tags: list):
+    def create_keypair(keypair_name: str, aws_tags: list, client=None):
+        ec2 = client or boto3.client('ec2')
         try:
-            ec2 = boto3.client('ec2')
             response = ec2.describe_key_pairs(KeyNames=[keypair_name])
             return response['KeyPairs'][0].get('KeyName')
         except botocore.exceptions.ClientError as error:
             if error.response['Error']['Code'] == "InvalidKeyPair.NotFound":
                 print("Creating Key Pair...")
-                ec2_resource = boto3.resource('ec2')
-                keypair = ec2_resource.create_key_pair(
+                keypair = ec2.create_key_pair(
                     KeyName=keypair_name, KeyType='rsa',
                     TagSpecifications=[{'ResourceType': 'key-pair', 'Tags': aws_tags}]
                 )
                 keypair_path = '/tmp/' + keypair_name + '.pem'
                 with open(keypair_path, 'w') as file:
-                    file.write(keypair.key_material)
+                    file.write(keypair['KeyMaterial'])
                 os.chmod(keypair_path, 0o600)
                 print("New Key Pair", keypair_name, "created successfully and is stored in the path:", keypair_path)
                 return keypair_name
+            raise
+
+    @staticmethod
+    def exists(keypair_name: str, client=None) -> bool:
+        ec2 = client or boto3.client('ec2')
+        try:
+            ec2.describe_key_pairs(KeyNames=[keypair_name])
+            return True
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] == "InvalidKeyPair.NotFound":
+                return False
+            raise
+
+
+class KeypairResolver(object):
+    def __init__(self, account: str, region: str, offline: bool = False, cache: JsonFileCache = None,
+                 client_factory=None):
+        self.account = account
+        self.region = region
+        self.offline = offline
+        self.cache = cache if cache is not None else JsonFileCache(CACHE_PATH, ttl=CACHE_TTL_SECONDS)
+        self.client_factory = client_factory or (lambda region: boto3.client('ec2', region_name=region))
+
+    def resolve(self, keypair_name: str, aws_tags: list, environment: str = None) -> str:
+        # The key pair name carries the creation date, so an environment is cached under its own name instead.
+        cache_key = JsonFileCache.make_key(self.account, self.region, environment or keypair_name)
+        cached_name = self.cache.get(cache_key)
+        if cached_name:
+            return cached_name
+        # The TTL only decides when EC2 is asked again. A key pair that still exists is kept, because a new name
+        # would replace the instance.
+        expired_name = self.cache.get(cache_key, include_expired=True)
+        if self.offline:
+            return expired_name or keypair_name
+        client = self.client_factory(self.region)
+        if expired_name and Keypair.exists(expired_name, client=client):
+            self.cache.set(cache_key, expired_name)
+            return expired_name
+        resolved_name = Keypair.create_keypair(keypair_name, aws_tags, client=client)
+        self.cache.set(cache_key, resolved_name)
+        return resolved_name
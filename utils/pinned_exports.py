@@ -0,0 +1,29 @@
+import jsii
+from aws_cdk import core as cdk
+from constructs import IValidation
+
+EXPORTS_SCOPE_ID = 'Exports'
+
+
+@jsii.implements(IValidation)
+class PinnedExportsValidation(object):
+    def __init__(self, stack: cdk.Stack, pinned: set):
+        self.stack = stack
+        self.pinned = pinned
+
+    def validate(self) -> list:
+        exports = self.stack.node.try_find_child(EXPORTS_SCOPE_ID)
+        unpinned = sorted({child.node.id for child in exports.node.children} - self.pinned) if exports else []
+        if not unpinned:
+            return []
+        # An automatic export only exists while its consumer is built, so the template would depend on the selection.
+        return ['{} exports {} that {} does not pin, add the value to pin_exports'.format(
+            self.stack.stack_name, ', '.join(unpinned), type(self.stack).__name__)]
+
+
+def pin_exports(stack: cdk.Stack, values: list) -> None:
+    for value in values:
+        stack.export_value(value)
+    exports = stack.node.try_find_child(EXPORTS_SCOPE_ID)
+    stack.node.add_validation(PinnedExportsValidation(
+        stack, {child.node.id for child in exports.node.children} if exports else set()))
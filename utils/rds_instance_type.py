@@ -1,39 +1,110 @@
-from enum import Enum
+import functools
+import os
+from dataclasses import dataclass
+from typing import Optional
 
-from aws_cdk import aws_ec2 as ec2
+import yaml
 
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance_types.yaml')
 
-class InstanceClass(Enum):
-    t2 = ec2.InstanceClass.BURSTABLE2
-    m4 = ec2.InstanceClass.STANDARD4
-    m5 = ec2.InstanceClass.STANDARD5
 
+class InstanceTypeError(ValueError):
+    pass
 
-class InstanceSize(Enum):
-    nano = ec2.InstanceSize.NANO
-    micro = ec2.InstanceSize.MICRO
-    small = ec2.InstanceSize.SMALL
-    medium = ec2.InstanceSize.MEDIUM
-    large = ec2.InstanceSize.LARGE
-    xlarge = ec2.InstanceSize.XLARGE
-    xlarge2 = ec2.InstanceSize.XLARGE2
-    xlarge3 = ec2.InstanceSize.XLARGE3
-    xlarge4 = ec2.InstanceSize.XLARGE4
-    xlarge8 = ec2.InstanceSize.XLARGE8
-    metal = ec2.InstanceSize.METAL
 
+@dataclass(frozen=True)
+class InstanceTypeSpec:
+    name: str
+    vcpu: int
+    memory_gib: float
+    network_performance: str
+    burstable: bool
+    ebs_optimized_support: str
+    nvme_support: str
+    instance_store_gib: int
+    instance_store_disks: int
+    rds_sql_server: bool
 
-class RDSInstanceType(object):
+    @property
+    def instance_class(self) -> str:
+        return self.name.split('.')[0]
 
-    def get_instance_type(self, type_str: str):
-        class_str, size_str = type_str.split('.')
-        instance_class = InstanceClass[class_str].value
-        instance_size = InstanceSize[self.format(size_str)].value
-        return ec2.InstanceType.of(instance_class, instance_size)
+    @property
+    def size(self) -> str:
+        return self.name.split('.')[1]
+
+
+class InstanceTypeCatalog(object):
+    def __init__(self, specs: list):
+        self.specs = {spec.name: spec for spec in specs}
+
+    @classmethod
+    def from_yaml(cls, path: str = CATALOG_PATH) -> 'InstanceTypeCatalog':
+        with open(path, 'r', encoding='UTF-8') as file:
+            entries = yaml.load(file, Loader=yaml.SafeLoader)
+        return cls([InstanceTypeSpec(name=name, **attributes) for name, attributes in entries.items()])
+
+    def __iter__(self):
+        return iter(self.specs.values())
+
+    def classes(self) -> list:
+        return sorted({spec.instance_class for spec in self})
+
+    def find(self, type_str: str) -> Optional[InstanceTypeSpec]:
+        parts = str(type_str).split('.')
+        if parts[0] == 'db' and len(parts) == 3:
+            parts = parts[1:]
+        return self.specs.get('.'.join(parts))
+
+    def get(self, type_str: str, rds: bool = False) -> InstanceTypeSpec:
+        parts = str(type_str).split('.')
+        if parts[0] == 'db' and len(parts) == 3:
+            parts = parts[1:]
+        if len(parts) != 2:
+            raise InstanceTypeError('{!r} is not an instance type such as m5.large'.format(type_str))
+        class_str, size_str = parts
+        spec = self.find(type_str)
+        if spec is None:
+            sizes = sorted((s.size for s in self if s.instance_class == class_str), key=self._size_order)
+            if not sizes:
+                raise InstanceTypeError('Unknown instance class {!r}, expected one of {}'.format(
+                    class_str, ', '.join(self.classes())))
+            raise InstanceTypeError('{!r} has no size {!r}, expected one of {}'.format(
+                class_str, size_str, ', '.join(sizes)))
+        if rds and not spec.rds_sql_server:
+            raise InstanceTypeError('{!r} is not available for RDS SQL Server'.format(spec.name))
+        return spec
+
+    def smallest(self, min_vcpu: int = 0, min_memory_gib: float = 0, classes: list = None, rds: bool = False,
+                 burstable: bool = False) -> InstanceTypeSpec:
+        candidates = [
+            spec for spec in self
+            if spec.vcpu >= min_vcpu and spec.memory_gib >= min_memory_gib
+            and (classes is None or spec.instance_class in classes)
+            and (not rds or spec.rds_sql_server)
+            and (burstable or classes is not None or not spec.burstable)
+            and spec.size != 'metal'
+        ]
+        if not candidates:
+            raise InstanceTypeError('No instance type has at least {} vCPU and {} GiB{}'.format(
+                min_vcpu, min_memory_gib, ' in ' + ', '.join(classes) if classes else ''))
+        class_order = classes or []
+        return min(candidates, key=lambda spec: (
+            spec.vcpu, spec.memory_gib,
+            class_order.index(spec.instance_class) if spec.instance_class in class_order else len(class_order),
+            spec.name
+        ))
 
     @staticmethod
-    def format(string):
-        if string[0].isdigit():
-            return string[1:] + string[0]
-        else:
-            return string
+    def _size_order(size: str):
+        named = ['nano', 'micro', 'small', 'medium', 'large', 'xlarge']
+        if size in named:
+            return named.index(size)
+        if size == 'metal':
+            return 1000
+        return len(named) + int(size[:-len('xlarge')])
+
+
+@functools.lru_cache(maxsize=None)
+def load_catalog(path: str = CATALOG_PATH) -> InstanceTypeCatalog:
+    return InstanceTypeCatalog.from_yaml(path)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+import argparse
+import datetime
+import json
+import math
+import os
+import re
+import sys
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import boto3
+import yaml
+
+from utils.config import Config, load_config
+from utils.inventory import list_exports
+from utils.rds_instance_type import InstanceTypeCatalog, InstanceTypeError, load_catalog
+
+GIB = 1024 * 1024 * 1024
+PERIOD_SECONDS = 3600
+INSTANCE_ID_EXPORT_PATTERN = re.compile(r'^(?P<prefix>.+)Ec2InstanceId\d*$')
+
+
+class CloudWatchMetrics(object):
+    def __init__(self, client):
+        self.client = client
+
+    def series(self, namespace: str, metric_name: str, dimensions: dict, statistic: str,
+               start: datetime.datetime, end: datetime.datetime) -> list:
+        datapoints = []
+        # One call returns at most 1440 datapoints, which is 60 days of hourly values.
+        window = datetime.timedelta(seconds=PERIOD_SECONDS * 1440)
+        while start < end:
+            response = self.client.get_metric_statistics(
+                Namespace=namespace, MetricName=metric_name,
+                Dimensions=[{'Name': name, 'Value': value} for name, value in sorted(dimensions.items())],
+                StartTime=start, EndTime=min(start + window, end), Period=PERIOD_SECONDS, Statistics=[statistic]
+            )
+            datapoints.extend(response['Datapoints'])
+            start += window
+        return [datapoint[statistic] for datapoint in sorted(datapoints, key=lambda datapoint: datapoint['Timestamp'])]
+
+
+class FixtureMetrics(object):
+    def __init__(self, series_by_key: dict):
+        self.series_by_key = series_by_key
+
+    @classmethod
+    def from_file(cls, path: str) -> 'FixtureMetrics':
+        with open(path, 'r', encoding='UTF-8') as file:
+            return cls(yaml.safe_load(file) or {})
+
+    @staticmethod
+    def key(namespace: str, metric_name: str, dimensions: dict, statistic: str) -> str:
+        return '{}/{}/{}/{}'.format(namespace, metric_name, ','.join(
+            '{}={}'.format(name, value) for name, value in sorted(dimensions.items())), statistic)
+
+    def series(self, namespace: str, metric_name: str, dimensions: dict, statistic: str,
+               start: datetime.datetime, end: datetime.datetime) -> list:
+        return [float(value) for value in self.series_by_key.get(
+            self.key(namespace, metric_name, dimensions, statistic), [])]
+
+
+@dataclass(frozen=True)
+class Recommendation:
+    resource: str
+    current_type: str
+    suggested_type: Optional[str]
+    cpu_percent: Optional[float]
+    memory_percent: Optional[float]
+    reason: str
+
+
+def percentile(values: list, percent: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))]
+
+
+def recommend(catalog: InstanceTypeCatalog, resource: str, current_type: str, cpu_percent: Optional[float],
+              memory_percent: Optional[float], target_percent: float, rds: bool = False) -> Recommendation:
+    if not rds and catalog.find(current_type) is None:
+        return Recommendation(resource, current_type, None, cpu_percent, memory_percent,
+                              'not in the instance type catalog')
+    spec = catalog.get(current_type, rds=rds)
+    if cpu_percent is None:
+        return Recommendation(resource, spec.name, None, None, memory_percent, 'no CPU data')
+    min_vcpu = max(1, math.ceil(spec.vcpu * cpu_percent / target_percent))
+    # Without a memory metric the memory size is kept.
+    min_memory_gib = spec.memory_gib if memory_percent is None else spec.memory_gib * memory_percent / target_percent
+    try:
+        suggested = catalog.smallest(min_vcpu=min_vcpu, min_memory_gib=min_memory_gib,
+                                     classes=[spec.instance_class], rds=rds)
+    except InstanceTypeError:
+        return Recommendation(resource, spec.name, None, cpu_percent, memory_percent,
+                              'needs more than the largest {}'.format(spec.instance_class))
+    if suggested.vcpu > spec.vcpu or suggested.memory_gib > spec.memory_gib:
+        return Recommendation(resource, spec.name, None, cpu_percent, memory_percent,
+                              'busy, {} would keep it under {:g}%'.format(suggested.name, target_percent))
+    if suggested.name == spec.name:
+        return Recommendation(resource, spec.name, None, cpu_percent, memory_percent, 'no smaller {} fits{}'.format(
+            spec.instance_class, '' if memory_percent is not None else ' without memory data'))
+    return Recommendation(resource, spec.name, suggested.name, cpu_percent, memory_percent,
+                          'needs {} vCPU and {:g} GiB at {:g}% utilization'.format(
+                              min_vcpu, round(min_memory_gib, 1), target_percent))
+
+
+class RightsizingReport(object):
+    def __init__(self, metrics, catalog: InstanceTypeCatalog = None, days: int = 14, percent: float = 95,
+                 target_percent: float = 60, now: datetime.datetime = None):
+        self.metrics = metrics
+        self.catalog = catalog or load_catalog()
+        self.end = now or datetime.datetime.now(datetime.timezone.utc)
+        self.start = self.end - datetime.timedelta(days=days)
+        self.percent = percent
+        self.target_percent = target_percent
+
+    def _percentile(self, namespace: str, metric_name: str, dimensions: dict, statistic: str) -> Optional[float]:
+        return percentile(self.metrics.series(namespace, metric_name, dimensions, statistic, self.start, self.end),
+                          self.percent)
+
+    def ec2(self, instance_id: str, instance_type: str) -> Recommendation:
+        cpu_percent = self._percentile('AWS/EC2', 'CPUUtilization', {'InstanceId': instance_id}, 'Maximum')
+        # Published by the CloudWatch agent when monitoring is enabled.
+        memory_percent = self._percentile('CWAgent', 'Memory % Committed Bytes In Use',
+                                          {'InstanceId': instance_id, 'objectname': 'Memory'}, 'Maximum')
+        return recommend(self.catalog, 'ec2 ' + instance_id, instance_type, cpu_percent, memory_percent,
+                         self.target_percent)
+
+    def rds(self, db_instance_id: str, instance_type: str) -> Recommendation:
+        dimensions = {'DBInstanceIdentifier': db_instance_id}
+        spec = self.catalog.get(instance_type, rds=True)
+        cpu_percent = self._percentile('AWS/RDS', 'CPUUtilization', dimensions, 'Maximum')
+        free_memory = self.metrics.series('AWS/RDS', 'FreeableMemory', dimensions, 'Minimum', self.start, self.end)
+        memory_percent = percentile([max(0.0, 100 - 100 * value / (spec.memory_gib * GIB)) for value in free_memory],
+                                    self.percent)
+        return recommend(self.catalog, 'rds ' + db_instance_id, instance_type, cpu_percent, memory_percent,
+                         self.target_percent, rds=True)
+
+    def run(self, config: Config, instance_ids: list) -> list:
+        db_instance_id = '-'.join([config.app.project, config.app.environment, 'rds'])
+        recommendations = [self.ec2(instance_id, config.ec2.type) for instance_id in instance_ids]
+        recommendations.append(self.rds(db_instance_id, config.rds.type))
+        for index, replica in enumerate(config.rds.read_replicas):
+            recommendations.append(self.rds('-'.join([db_instance_id, 'replica', str(index + 1)]), replica.type))
+        return recommendations
+
+
+def exported_instance_ids(client, project: str, environment: str) -> list:
+    prefix = '-'.join([project, environment]).title().replace('-', '')
+    instance_ids = []
+    for export in list_exports(client):
+        match = INSTANCE_ID_EXPORT_PATTERN.match(export['Name'])
+        if match and match.group('prefix') == prefix:
+            instance_ids.append(export['Value'])
+    return sorted(instance_ids)
+
+
+def _format_table(recommendations: list) -> str:
+    lines = []
+    for recommendation in recommendations:
+        lines.append('{:<40} {:<14} {:<14} cpu {:>6} memory {:>6}  {}'.format(
+            recommendation.resource, recommendation.current_type, recommendation.suggested_type or '-',
+            '-' if recommendation.cpu_percent is None else '{:.1f}%'.format(recommendation.cpu_percent),
+            '-' if recommendation.memory_percent is None else '{:.1f}%'.format(recommendation.memory_percent),
+            recommendation.reason))
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Suggest smaller instance types from utilization metrics.')
+    parser.add_argument('--days', type=int, default=14, help='days of metrics to read')
+    parser.add_argument('--percentile', type=float, default=95, help='percentile of the hourly maximums to size for')
+    parser.add_argument('--target', type=float, default=60,
+                        help='CPU and memory utilization percent the suggested type should run at')
+    parser.add_argument('--instance-id', action='append', dest='instance_ids',
+                        help='app server to check, repeat for several, default the InstanceId exports')
+    parser.add_argument('--fixture', help='read metrics from this YAML or JSON file instead of CloudWatch')
+    parser.add_argument('--region', default=os.getenv('AWS_DEFAULT_REGION'))
+    parser.add_argument('--json', action='store_true', help='print JSON instead of a table')
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    instance_ids = args.instance_ids or []
+    if args.fixture:
+        metrics = FixtureMetrics.from_file(args.fixture)
+    else:
+        session = boto3.session.Session(region_name=args.region)
+        metrics = CloudWatchMetrics(session.client('cloudwatch'))
+        instance_ids = instance_ids or exported_instance_ids(session.client('cloudformation'), config.app.project,
+                                                             config.app.environment)
+    report = RightsizingReport(metrics, days=args.days, percent=args.percentile, target_percent=args.target)
+    recommendations = report.run(config, instance_ids)
+    if args.json:
+        print(json.dumps([asdict(recommendation) for recommendation in recommendations], indent=2))
+    else:
+        print(_format_table(recommendations))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
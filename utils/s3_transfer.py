@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import botocore
+
+MIB = 1024 * 1024
+MIN_PART_SIZE = 5 * MIB
+MAX_PARTS = 10000
+# S3BucketStack aborts incomplete multipart uploads after 3 days, so older uploads cannot be resumed.
+ABORT_INCOMPLETE_MULTIPART_SECONDS = 3 * 24 * 60 * 60
+RESUME_MARGIN_SECONDS = 60 * 60
+
+
+class TransferError(Exception):
+    pass
+
+
+def bucket_export_name(project: str, environment: str) -> str:
+    return '-'.join([project, environment, 's3']).title().replace('-', '') + 'BucketName'
+
+
+def bucket_from_export(cloudformation_client, project: str, environment: str) -> str:
+    export_name = bucket_export_name(project, environment)
+    for page in cloudformation_client.get_paginator('list_exports').paginate():
+        for export in page['Exports']:
+            if export['Name'] == export_name:
+                return export['Value']
+    raise TransferError('Export {} not found, is the S3 stack deployed?'.format(export_name))
+
+
+def composite_etag(md5_digests: list) -> str:
+    if len(md5_digests) == 1:
+        return md5_digests[0].hex()
+    return '{}-{}'.format(hashlib.md5(b''.join(md5_digests)).hexdigest(), len(md5_digests))
+
+
+def _read_range(path: str, offset: int, length: int) -> bytes:
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        return file.read(length)
+
+
+class _State(object):
+    def __init__(self, path: str):
+        self.path = path
+        self.data = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='UTF-8') as file:
+                self.data = json.load(file)
+        except (OSError, ValueError):
+            self.data = {}
+        return self.data
+
+    def save(self) -> None:
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='UTF-8') as file:
+                json.dump(self.data, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def update_part(self, part_number: int, value: dict) -> None:
+        with self._lock:
+            self.data.setdefault('parts', {})[str(part_number)] = value
+        self.save()
+
+    def remove(self) -> None:
+        for path in (self.path, self.path + '.tmp'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class S3Transfer(object):
+    def __init__(self, client, part_size: int = 64 * MIB, concurrency: int = 8, log=print):
+        if part_size < MIN_PART_SIZE:
+            raise TransferError('part size must be at least {} MiB'.format(MIN_PART_SIZE // MIB))
+        self.client = client
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.log = log
+
+    def _part_size_for(self, size: int) -> int:
+        part_size = self.part_size
+        while size > part_size * MAX_PARTS:
+            part_size *= 2
+        return part_size
+
+    def upload(self, path: str, bucket: str, key: str, state_path: str = None) -> str:
+        size = os.path.getsize(path)
+        part_size = self._part_size_for(size)
+        if size <= part_size:
+            body = _read_range(path, 0, size)
+            digest = hashlib.md5(body).digest()
+            response = self.client.put_object(Bucket=bucket, Key=key, Body=body,
+                                              ContentMD5=base64.b64encode(digest).decode())
+            return self._verify(response['ETag'], [digest])
+
+        state = _State(state_path or path + '.s3upload.json')
+        identity = {'bucket': bucket, 'key': key, 'size': size, 'mtime': os.path.getmtime(path),
+                    'part_size': part_size}
+        data = state.load()
+        upload_id = self._resumable_upload_id(data, identity, bucket, key)
+        if upload_id is None:
+            upload_id = self.client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+            state.data = dict(identity, upload_id=upload_id, created_at=time.time(), parts={})
+            state.save()
+        else:
+            self.log('resuming upload {} with {} of {} parts done'.format(
+                upload_id, len(state.data['parts']), -(-size // part_size)))
+
+        part_count = -(-size // part_size)
+
+        def upload_part(part_number):
+            offset = (part_number - 1) * part_size
+            body = _read_range(path, offset, min(part_size, size - offset))
+            digest = hashlib.md5(body).digest()
+            response = self.client.upload_part(
+                Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body,
+                ContentMD5=base64.b64encode(digest).decode()
+            )
+            state.update_part(part_number, {'etag': response['ETag'], 'md5': digest.hex()})
+
+        missing = [number for number in range(1, part_count + 1) if str(number) not in state.data['parts']]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(upload_part, missing))
+
+        parts = [{'PartNumber': number, 'ETag': state.data['parts'][str(number)]['etag']}
+                 for number in range(1, part_count + 1)]
+        response = self.client.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+        )
+        etag = self._verify(response['ETag'], [bytes.fromhex(state.data['parts'][str(number)]['md5'])
+                                               for number in range(1, part_count + 1)])
+        state.remove()
+        return etag
+
+    def _resumable_upload_id(self, data: dict, identity: dict, bucket: str, key: str):
+        if not data or any(data.get(name) != value for name, value in identity.items()):
+            return None
+        if time.time() - data.get('created_at', 0) > ABORT_INCOMPLETE_MULTIPART_SECONDS - RESUME_MARGIN_SECONDS:
+            self.log('upload {} is close to the bucket abort rule, starting over'.format(data['upload_id']))
+            return None
+        uploaded = {}
+        try:
+            for page in self.client.get_paginator('list_parts').paginate(
+                    Bucket=bucket, Key=key, UploadId=data['upload_id']):
+                for part in page.get('Parts', []):
+                    uploaded[str(part['PartNumber'])] = part['ETag']
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] == 'NoSuchUpload':
+                return None
+            raise
+        data['parts'] = {number: part for number, part in data.get('parts', {}).items()
+                         if uploaded.get(number) == part['etag']}
+        return data['upload_id']
+
+    def download(self, bucket: str, key: str, path: str, state_path: str = None) -> str:
+        head = self.client.head_object(Bucket=bucket, Key=key)
+        size = head['ContentLength']
+        etag = head['ETag'].strip('"')
+        part_size = self.part_size
+        if '-' in etag:
+            # Download in the uploader's part boundaries so the multipart ETag can be recomputed.
+            part_size = self.client.head_object(Bucket=bucket, Key=key, PartNumber=1)['ContentLength']
+        chunk_count = max(-(-size // part_size), 1)
+        partial_path = path + '.part'
+        state = _State(state_path or path + '.s3download.json')
+        data = state.load()
+        identity = {'bucket': bucket, 'key': key, 'etag': etag, 'size': size, 'part_size': part_size}
+        if any(data.get(name) != value for name, value in identity.items()) or not os.path.exists(partial_path):
+            state.data = dict(identity, parts={})
+            with open(partial_path, 'wb') as file:
+                file.truncate(size)
+            state.save()
+
+        def download_chunk(index):
+            offset = index * part_size
+            end = min(offset + part_size, size) - 1
+            response = self.client.get_object(Bucket=bucket, Key=key, IfMatch=head['ETag'],
+                                              Range='bytes={}-{}'.format(offset, end))
+            body = response['Body'].read()
+            if len(body) != end - offset + 1:
+                raise TransferError('short read for bytes {}-{} of {}'.format(offset, end, key))
+            with open(partial_path, 'r+b') as file:
+                file.seek(offset)
+                file.write(body)
+            state.update_part(index + 1, {'md5': hashlib.md5(body).hexdigest()})
+
+        missing = [index for index in range(chunk_count) if str(index + 1) not in state.data['parts']]
+        if size:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                list(executor.map(download_chunk, missing))
+
+        if len(etag) == 32 or '-' in etag:
+            digests = [bytes.fromhex(state.data['parts'][str(number)]['md5']) for number in range(1, chunk_count + 1)]
+            if size == 0:
+                digests = [hashlib.md5(b'').digest()]
+            self._verify(etag, digests)
+        else:
+            self.log('ETag of {} is not an MD5 digest, skipping checksum verification'.format(key))
+        os.replace(partial_path, path)
+        state.remove()
+        return etag
+
+    @staticmethod
+    def _verify(etag: str, md5_digests: list) -> str:
+        etag = etag.strip('"')
+        expected = composite_etag(md5_digests)
+        if etag != expected:
+            raise TransferError('checksum mismatch: S3 reports {}, local data gives {}'.format(etag, expected))
+        return etag
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Parallel, resumable S3 transfer for RDS native backup files.')
+    parser.add_argument('command', choices=['upload', 'download'])
+    parser.add_argument('source', help='local file for upload, object key for download')
+    parser.add_argument('destination', help='object key for upload, local file for download')
+    bucket = parser.add_mutually_exclusive_group(required=True)
+    bucket.add_argument('--bucket', help='bucket name')
+    bucket.add_argument('--stack', nargs=2, metavar=('PROJECT', 'ENVIRONMENT'),
+                        help='read the bucket name from the S3 stack export')
+    parser.add_argument('--part-size', type=int, default=64, help='part size in MiB')
+    parser.add_argument('--concurrency', type=int, default=8, help='parts transferred at the same time')
+    parser.add_argument('--region', default=os.getenv('AWS_DEFAULT_REGION'))
+    parser.add_argument('--endpoint-url', help='S3 endpoint, for example a local S3 stand-in')
+    args = parser.parse_args(argv)
+
+    session = boto3.session.Session(region_name=args.region)
+    client = session.client('s3', endpoint_url=args.endpoint_url,
+                            config=botocore.config.Config(max_pool_connections=args.concurrency * 2))
+    bucket_name = args.bucket or bucket_from_export(session.client('cloudformation'), *args.stack)
+    transfer = S3Transfer(client, part_size=args.part_size * MIB, concurrency=args.concurrency)
+    start = time.perf_counter()
+    if args.command == 'upload':
+        etag = transfer.upload(args.source, bucket_name, args.destination)
+        size = os.path.getsize(args.source)
+    else:
+        etag = transfer.download(bucket_name, args.source, args.destination)
+        size = os.path.getsize(args.destination)
+    seconds = time.perf_counter() - start
+    print('{} {} bytes in {:.1f}s ({:.1f} MiB/s), ETag {}'.format(
+        args.command, size, seconds, size / MIB / max(seconds, 1e-9), etag))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
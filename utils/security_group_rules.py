@@ -0,0 +1,159 @@
+import ipaddress
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from utils.config import Inbound, SecurityGroupConfig
+
+MAX_DESCRIPTION_LENGTH = 255
+
+
+class RuleQuotaError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class IngressRule:
+    cidr: str
+    from_port: int
+    to_port: int
+    description: str
+
+
+@dataclass(frozen=True)
+class PrefixListPlan:
+    name: str
+    from_port: int
+    to_port: int
+    entries: List[Tuple[str, str]]
+    max_entries: int
+
+
+@dataclass(frozen=True)
+class RulePlan:
+    requested: int
+    rules: List[IngressRule]
+    prefix_lists: List[PrefixListPlan] = field(default_factory=list)
+
+    @property
+    def rule_count(self) -> int:
+        return len(self.rules) + len(self.prefix_lists)
+
+    @property
+    def quota_units(self) -> int:
+        # A rule that references a prefix list counts against the quota with the list's maximum entries.
+        return len(self.rules) + sum(prefix_list.max_entries for prefix_list in self.prefix_lists)
+
+
+def _port_segments(ranges: list) -> list:
+    bounds = sorted({from_port for from_port, _ in ranges} | {to_port + 1 for _, to_port in ranges})
+    return [(start, end - 1) for start, end in zip(bounds, bounds[1:])
+            if any(from_port <= start and end - 1 <= to_port for from_port, to_port in ranges)]
+
+
+def _describe(inbounds: list, network, from_port: int, to_port: int) -> str:
+    matches = [(inbound_network, description) for inbound_network, description, ports in inbounds
+               if inbound_network.subnet_of(network)
+               and any(start <= to_port and from_port <= end for start, end in ports)]
+    exact = [description for inbound_network, description in matches if inbound_network == network]
+    descriptions = []
+    for description in exact or [description for _, description in matches]:
+        if description not in descriptions:
+            descriptions.append(description)
+    return ', '.join(descriptions)[:MAX_DESCRIPTION_LENGTH]
+
+
+def plan_ingress(inbounds: List[Inbound], ports: list = None, prefix_list_min_entries: int = None,
+                 name: str = 'rules') -> RulePlan:
+    entries = [(ipaddress.IPv4Network(inbound.ip, strict=False), inbound.description, ports or inbound.ports)
+               for inbound in inbounds]
+    requested = sum(len(entry_ports) for _, _, entry_ports in entries)
+    segments = _port_segments([port_range for _, _, entry_ports in entries for port_range in entry_ports])
+
+    collapsed = {}
+    for start, end in segments:
+        collapsed[(start, end)] = list(ipaddress.collapse_addresses(
+            network for network, _, entry_ports in entries
+            if any(from_port <= start and end <= to_port for from_port, to_port in entry_ports)
+        ))
+
+    port_networks = {}
+    for network in sorted({network for networks in collapsed.values() for network in networks}):
+        # A range may run through segments that a wider network already allows, so it is not split around them.
+        runs = []
+        previous = None
+        for segment in segments:
+            if not any(allowed.supernet_of(network) for allowed in collapsed[segment]):
+                previous = None
+                continue
+            if previous is None or previous[1] + 1 != segment[0]:
+                runs.append([])
+            runs[-1].append((segment, network in collapsed[segment]))
+            previous = segment
+        for run in runs:
+            required = [segment for segment, is_required in run if is_required]
+            if required:
+                port_networks.setdefault((required[0][0], required[-1][1]), []).append(network)
+
+    rules = []
+    prefix_lists = []
+    for (from_port, to_port), networks in sorted(port_networks.items()):
+        networks = sorted(networks)
+        if prefix_list_min_entries and len(networks) >= prefix_list_min_entries:
+            prefix_lists.append(PrefixListPlan(
+                name='-'.join([name, str(from_port) if from_port == to_port else '{}-{}'.format(from_port, to_port)]),
+                from_port=from_port,
+                to_port=to_port,
+                entries=[(str(network), _describe(entries, network, from_port, to_port)) for network in networks],
+                max_entries=len(networks)
+            ))
+            continue
+        rules.extend(IngressRule(cidr=str(network), from_port=from_port, to_port=to_port,
+                                 description=_describe(entries, network, from_port, to_port))
+                     for network in networks)
+    return RulePlan(requested=requested, rules=rules, prefix_lists=prefix_lists)
+
+
+def apply_ingress_plan(scope: 'cdk.Construct', security_group: 'ec2.SecurityGroup', plan: RulePlan,
+                       config: SecurityGroupConfig, extra_rules: int = 0) -> None:
+    # Imported here so the planning above can be used without the CDK installed.
+    from aws_cdk import aws_ec2 as ec2, core as cdk
+
+    quota_units = plan.quota_units + extra_rules
+    if quota_units > config.max_rules:
+        raise RuleQuotaError('{} needs {} inbound rules ({} planned from {} requested, {} added by the stack), '
+                             'the quota is {}'.format(security_group.node.path, quota_units, plan.rule_count,
+                                                      plan.requested, extra_rules, config.max_rules))
+    cdk.Annotations.of(security_group).add_info('{} inbound rules planned from {} requested, {} prefix lists'.format(
+        plan.rule_count, plan.requested, len(plan.prefix_lists)))
+
+    for rule in plan.rules:
+        security_group.add_ingress_rule(
+            peer=ec2.Peer.ipv4(rule.cidr),
+            connection=ec2.Port(
+                protocol=ec2.Protocol.TCP,
+                string_representation=rule.description,
+                from_port=rule.from_port,
+                to_port=rule.to_port
+            ),
+            description=rule.description
+        )
+    for prefix_list in plan.prefix_lists:
+        cfn_prefix_list = ec2.CfnPrefixList(
+            scope, 'PrefixList' + prefix_list.name.title().replace('-', ''),
+            prefix_list_name=prefix_list.name,
+            address_family='IPv4',
+            max_entries=prefix_list.max_entries,
+            entries=[ec2.CfnPrefixList.EntryProperty(cidr=cidr, description=description)
+                     for cidr, description in prefix_list.entries]
+        )
+        description = 'prefix list {}'.format(prefix_list.name)
+        security_group.add_ingress_rule(
+            peer=ec2.Peer.prefix_list(cfn_prefix_list.attr_prefix_list_id),
+            connection=ec2.Port(
+                protocol=ec2.Protocol.TCP,
+                string_representation=description,
+                from_port=prefix_list.from_port,
+                to_port=prefix_list.to_port
+            ),
+            description=description
+        )
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass, fields
+
+STACK_ARTIFACT_TYPE = 'aws:cloudformation:stack'
+PATH_METADATA = 'aws:cdk:path'
+DEFAULT_REPORT_PATH = 'template_budget.json'
+
+
+@dataclass(frozen=True)
+class TemplateLimits:
+    # CloudFormation quotas; templates larger than 51,200 bytes must be uploaded through S3, which cdk deploy does.
+    bytes: int = 1024 * 1024
+    resources: int = 500
+    outputs: int = 200
+    exports: int = 200
+    parameters: int = 200
+    mappings: int = 200
+
+
+def _construct_of(stack_name: str, logical_id: str, resource: dict, logical_paths: dict) -> str:
+    path = resource.get('Metadata', {}).get(PATH_METADATA) or logical_paths.get(logical_id, '')
+    parts = path.strip('/').split('/')
+    if len(parts) > 1 and parts[0] == stack_name:
+        return parts[1]
+    return logical_id
+
+
+def _logical_paths(artifact: dict) -> dict:
+    return {entry['data']: path for path, entries in artifact.get('metadata', {}).items() for entry in entries
+            if entry.get('type') == 'aws:cdk:logicalId'}
+
+
+def measure_template(stack_name: str, template_path: str, artifact: dict = None) -> dict:
+    with open(template_path, 'r', encoding='UTF-8') as file:
+        template = json.load(file)
+    outputs = template.get('Outputs', {})
+    constructs = {}
+    logical_paths = _logical_paths(artifact or {})
+    for logical_id, resource in template.get('Resources', {}).items():
+        construct = constructs.setdefault(_construct_of(stack_name, logical_id, resource, logical_paths),
+                                          {'resources': 0, 'bytes': 0})
+        construct['resources'] += 1
+        construct['bytes'] += len(json.dumps({logical_id: resource}, separators=(',', ':')))
+    return {
+        'bytes': os.path.getsize(template_path),
+        'minified_bytes': len(json.dumps(template, separators=(',', ':'))),
+        'resources': len(template.get('Resources', {})),
+        'outputs': len(outputs),
+        'exports': sum(1 for output in outputs.values() if 'Export' in output),
+        'parameters': len(template.get('Parameters', {})),
+        'mappings': len(template.get('Mappings', {})),
+        'constructs': constructs
+    }
+
+
+def nested_stack_candidates(measurement: dict, limits: TemplateLimits, warn_ratio: float) -> list:
+    # Largest top-level constructs first, until the stack would be back under the warning threshold.
+    over_resources = measurement['resources'] - int(limits.resources * warn_ratio)
+    over_bytes = measurement['bytes'] - int(limits.bytes * warn_ratio)
+    candidates = []
+    for name, construct in sorted(measurement['constructs'].items(),
+                                  key=lambda item: (item[1]['resources'], item[1]['bytes']), reverse=True):
+        if over_resources <= 0 and over_bytes <= 0:
+            break
+        if construct['resources'] < 2:
+            continue
+        candidates.append(dict(construct, construct=name))
+        over_resources -= construct['resources']
+        over_bytes -= construct['bytes']
+    return candidates
+
+
+def check_assembly(assembly_dir: str, limits: TemplateLimits = TemplateLimits(), warn_ratio: float = 0.8) -> dict:
+    with open(os.path.join(assembly_dir, 'manifest.json'), 'r', encoding='UTF-8') as file:
+        manifest = json.load(file)
+    stacks = {}
+    for artifact_id, artifact in sorted(manifest.get('artifacts', {}).items()):
+        if artifact.get('type') != STACK_ARTIFACT_TYPE:
+            continue
+        properties = artifact.get('properties', {})
+        stack_name = properties.get('stackName', artifact_id)
+        measurement = measure_template(stack_name, os.path.join(assembly_dir, properties['templateFile']), artifact)
+        violations = []
+        warnings = []
+        for limit in fields(TemplateLimits):
+            value = measurement[limit.name]
+            maximum = getattr(limits, limit.name)
+            if value > maximum:
+                violations.append('{} {} exceeds the limit of {}'.format(limit.name, value, maximum))
+            elif value > maximum * warn_ratio:
+                warnings.append('{} {} is above {:.0%} of the limit of {}'.format(limit.name, value, warn_ratio,
+                                                                                  maximum))
+        measurement['violations'] = violations
+        measurement['warnings'] = warnings
+        measurement['nested_stack_candidates'] = nested_stack_candidates(measurement, limits, warn_ratio) \
+            if violations or warnings else []
+        stacks[stack_name] = measurement
+    return {'limits': asdict(limits), 'warn_ratio': warn_ratio, 'stacks': stacks}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Check synthesized templates against CloudFormation limits.')
+    parser.add_argument('--app', default='cdk.out', help='synthesized cloud assembly directory')
+    parser.add_argument('--output', default=DEFAULT_REPORT_PATH, help='where to write the JSON report')
+    parser.add_argument('--warn-ratio', type=float, default=0.8, help='share of a limit that triggers a warning')
+    for limit in fields(TemplateLimits):
+        parser.add_argument('--max-' + limit.name, type=int, default=limit.default, dest=limit.name,
+                            help='default {}'.format(limit.default))
+    args = parser.parse_args(argv)
+
+    limits = TemplateLimits(**{limit.name: getattr(args, limit.name) for limit in fields(TemplateLimits)})
+    report = check_assembly(args.app, limits, args.warn_ratio)
+    with open(args.output, 'w', encoding='UTF-8') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+    failed = False
+    for stack_name, stack in report['stacks'].items():
+        print('{:<40} {:>9} bytes {:>4} resources {:>4} outputs {:>4} exports {:>4} parameters'.format(
+            stack_name, stack['bytes'], stack['resources'], stack['outputs'], stack['exports'], stack['parameters']))
+        for message in stack['violations']:
+            print('  error: ' + message)
+        for message in stack['warnings']:
+            print('  warning: ' + message)
+        for candidate in stack['nested_stack_candidates']:
+            print('  nested stack candidate: {} ({} resources, {} bytes)'.format(
+                candidate['construct'], candidate['resources'], candidate['bytes']))
+        failed = failed or bool(stack['violations'])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())